@@ -4,6 +4,11 @@ This is configuration file. Its purpose is to provide other python modules
 with required initialization information.
 
 """
+import fnmatch
+import functools
+import os
+import re
+from types import MappingProxyType
 
 
 def get_config():
@@ -46,3 +51,145 @@ def get_config():
     
     cfg = (dir_dict, mask_dict, issue_dict, format_dict)
     return cfg
+
+
+class MaskMatcher:
+    """
+    The class is purposed to match names with shell-style masks (like fnmatch.fnmatch), the masks are translated
+    to regular expressions once. Names are case insensitive where the file system is (as in fnmatch).
+
+    Attributes
+    ----------
+    masks : tuple
+
+    Methods
+    -------
+    match(name: str)
+        Checks whether the name matches any of the masks.
+    """
+    __slots__ = ('masks', '__regex')
+
+    def __init__(self, *masks):
+        self.masks = masks
+        flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+        self.__regex = re.compile('|'.join('(?:{})'.format(fnmatch.translate(mask)) for mask in masks), flags)
+
+    def match(self, name: str):
+        """
+        Checks whether the name matches any of the masks.
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        bool
+        """
+        return self.__regex.match(name) is not None
+
+    def __repr__(self):
+        return 'MaskMatcher({})'.format(', '.join(repr(mask) for mask in self.masks))
+
+
+class ProjectConfig:
+    """
+    The class is purposed to keep project configuration built once per process. It is immutable and is pickled
+    as a reference, so objects may keep it without storing a copy.
+
+    Attributes
+    ----------
+    formats : MappingProxyType
+        Page format names mapped to tuples of sizes (width, height) in inches.
+    format_table : tuple
+        Tuples (format name, width, height) in order of formats.
+    ifr_list : tuple
+        Supplier revisions for review.
+    ifu_list : tuple
+        Supplier revisions for use.
+    pdf_matcher : MaskMatcher
+        Matches pdf-files of documents.
+    process_dir : str
+    received_trm_mask : str
+    received_trm_matcher : MaskMatcher
+    send_trm_mask : str
+    send_trm_matcher : MaskMatcher
+    subfolder_matcher : MaskMatcher
+        Matches folders named after documents.
+    templates_dir : str
+    vdr_mask : str
+    vdr_matcher : MaskMatcher
+
+    Methods
+    -------
+    vdr_phase_matcher(phase: str)
+        Gets matcher of VDR of the phase.
+    """
+    __slots__ = ('templates_dir', 'process_dir', 'send_trm_mask', 'received_trm_mask', 'vdr_mask',
+                 'send_trm_matcher', 'received_trm_matcher', 'vdr_matcher', 'pdf_matcher', 'subfolder_matcher',
+                 'ifr_list', 'ifu_list', 'formats', 'format_table', '__phase_matchers')
+
+    def __init__(self, cfg: tuple):
+        dir_dict, mask_dict, issue_dict, format_dict = cfg
+        set_ = functools.partial(object.__setattr__, self)
+
+        set_('templates_dir', dir_dict['templates_dir'])
+        set_('process_dir', dir_dict['process_dir'])
+
+        set_('send_trm_mask', mask_dict['send_trm_mask'])
+        set_('received_trm_mask', mask_dict['received_trm_mask'])
+        set_('vdr_mask', mask_dict['vdr_mask'])
+        set_('send_trm_matcher', MaskMatcher(self.send_trm_mask))
+        set_('received_trm_matcher', MaskMatcher(self.received_trm_mask))
+        set_('vdr_matcher', MaskMatcher(self.vdr_mask))
+        # Имена документов начинаются так же, как имена VDR
+        doc_prefix = self.vdr_mask.split('*')[0]
+        set_('pdf_matcher', MaskMatcher(doc_prefix + '*.pdf', doc_prefix + '*.PDF'))
+        set_('subfolder_matcher', MaskMatcher(self.vdr_mask.split('.xlsx')[0]))
+
+        set_('ifr_list', tuple(issue_dict['ifr_list']))
+        set_('ifu_list', tuple(issue_dict['ifu_list']))
+
+        set_('formats', MappingProxyType({name: tuple(sizes) for name, sizes in format_dict.items()}))
+        set_('format_table', tuple((name, w, h) for name, sizes in format_dict.items() for w, h in sizes))
+        set_('_ProjectConfig__phase_matchers', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ProjectConfig is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('ProjectConfig is immutable')
+
+    def __reduce__(self):
+        # Конфигурация не сохраняется вместе с объектами, при загрузке берётся текущая
+        return get_project_config, ()
+
+    def vdr_phase_matcher(self, phase: str):
+        """
+        Gets matcher of VDR of the phase.
+
+        Parameters
+        ----------
+        phase : str
+
+        Returns
+        -------
+        MaskMatcher
+        """
+        matcher = self.__phase_matchers.get(phase)
+        if matcher is None:
+            matcher = MaskMatcher(self.vdr_mask.split('*')[0] + phase + '*')
+            self.__phase_matchers[phase] = matcher
+        return matcher
+
+
+@functools.lru_cache(maxsize=None)
+def get_project_config():
+    """
+    Gets project configuration, it is built once per process.
+
+    Returns
+    -------
+    ProjectConfig
+    """
+    return ProjectConfig(get_config())
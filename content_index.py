@@ -0,0 +1,137 @@
+import hashlib
+import os
+
+from copy_engine import CHUNK_SIZE, CopyEngine
+from file_cache import FileCache
+
+HASH_NAME = 'sha256'
+
+
+class ContentIndex:
+    """
+    The class is purposed to identify files by their content.
+    Digests are cached by file size and modification time, so a file is hashed only once (usually while it is
+    being copied, see CopyEngine.hash_name). The index is used to keep one physical copy of identical files
+    (the others are hard links) and to detect files with the same name but different content.
+
+    Attributes
+    ----------
+    hash_name : str
+        Name of hashlib algorithm.
+
+    Methods
+    -------
+    deduplicate(file_digests: dict)
+        Replaces files with identical content by hard links to one copy.
+    get_digest(path: str)
+        Gets cached digest of the file.
+    hash_file(path: str)
+        Gets digest of the file, hashes the file if its digest is not cached.
+    save()
+        Backing up the index.
+    set_digest(path: str, digest: str)
+        Puts digest of the file into the index.
+    """
+    def __init__(self, cache_path: str, hash_name=HASH_NAME):
+        self.hash_name = hash_name
+        self.__cache = FileCache(cache_path)
+
+    def get_digest(self, path: str):
+        """
+        Gets cached digest of the file.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        digest : str
+            Hex digest or None if the file has not been hashed since it was changed.
+        """
+        return self.__cache.get(path)
+
+    def set_digest(self, path: str, digest: str):
+        """
+        Puts digest of the file into the index.
+
+        Parameters
+        ----------
+        path : str
+        digest : str
+
+        Returns
+        -------
+        None
+        """
+        self.__cache.set(path, digest)
+
+    def hash_file(self, path: str):
+        """
+        Gets digest of the file, hashes the file if its digest is not cached.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        digest : str
+        """
+        digest = self.get_digest(path)
+        if digest is not None:
+            return digest
+        hasher = hashlib.new(self.hash_name)
+        with open(path, 'rb') as f:
+            while True:
+                buf = f.read(CHUNK_SIZE)
+                if not buf:
+                    break
+                hasher.update(buf)
+        digest = hasher.hexdigest()
+        self.set_digest(path, digest)
+        return digest
+
+    @staticmethod
+    def deduplicate(file_digests: dict):
+        """
+        Replaces files with identical content by hard links to the first one of them.
+
+        Parameters
+        ----------
+        file_digests : dict
+            Digest of each file (files with unknown digest are skipped).
+
+        Returns
+        -------
+        count : int
+            Number of files replaced by links.
+        size : int
+            Disk space freed in bytes.
+        """
+        stored = {}
+        count = 0
+        size = 0
+        for path, digest in file_digests.items():
+            if digest is None or not os.path.exists(path):
+                continue
+            if digest not in stored:
+                stored[digest] = path
+                continue
+            if os.path.samefile(stored[digest], path):
+                continue
+            file_size = os.path.getsize(path)
+            if CopyEngine.link_file(stored[digest], path):
+                count += 1
+                size += file_size
+        return count, size
+
+    def save(self):
+        """
+        Backing up the index.
+
+        Returns
+        -------
+        None
+        """
+        self.__cache.save()
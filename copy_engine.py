@@ -0,0 +1,294 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 8 * 1024 ** 2
+# Точность хранения времени изменения файла на FAT составляет 2 секунды
+MTIME_TOLERANCE = 2.0
+
+
+class CopyResult:
+    """
+    The class is purposed to keep statistics of copying files.
+
+    Attributes
+    ----------
+    bytes_copied : int
+        Number of bytes actually copied (hard links and skipped files are not counted).
+    copied : int
+    elapsed : float
+        Copying time in seconds.
+    failed : int
+    linked : int
+    skipped : int
+        Number of files which were already up to date.
+    """
+    __slots__ = ('copied', 'linked', 'skipped', 'failed', 'bytes_copied', 'elapsed')
+
+    def __init__(self):
+        self.copied = 0
+        self.linked = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_copied = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        """
+        Copying speed in bytes per second.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.bytes_copied / self.elapsed
+
+    def __str__(self):
+        mb = 1024 ** 2
+        return 'copied: {}, linked: {}, skipped: {}, failed: {}; {:.2f} MB in {:.1f} s ({:.2f} MB/s)'.format(
+            self.copied, self.linked, self.skipped, self.failed, self.bytes_copied / mb, self.elapsed,
+            self.rate / mb)
+
+
+class CopyEngine:
+    """
+    The class is purposed for copying files in parallel.
+    Data is copied by the kernel (copy_file_range or sendfile) where available, otherwise by chunks.
+    Each file is written to a temporary '.part' file which replaces the target only when it is complete,
+    so an interrupted copy never looks like a complete file. Files with the same size and modification time
+    as the source are skipped. If hashing is enabled, data of files whose digest is needed is copied by chunks
+    and hashed on the way, so the file is read only once; other files are still copied by the kernel.
+
+    Attributes
+    ----------
+    hard_link : bool
+        Whether to create hard links instead of copies when the source and the target share a file system.
+    hash_name : str
+        Name of hashlib algorithm to hash copied data with (None if hashing is disabled).
+    max_workers : int
+        Maximum number of files copied at the same time.
+
+    Methods
+    -------
+    copy_file(src: str, dst: str, on_bytes=None, on_hashed=None)
+        Copies one file.
+    copy_files(pairs, stage=None, on_done=None, on_hashed=None, hash_filter=None)
+        Copies files on a thread pool.
+    link_file(src: str, dst: str)
+        Replaces the target with a hard link to the source.
+    """
+    def __init__(self, max_workers=4, hard_link=False, hash_name=None):
+        self.max_workers = max_workers
+        self.hard_link = hard_link
+        self.hash_name = hash_name
+
+    @staticmethod
+    def is_up_to_date(src_stat: os.stat_result, dst: str):
+        """
+        Checks whether the target file has the same size and modification time as the source.
+
+        Parameters
+        ----------
+        src_stat : os.stat_result
+        dst : str
+
+        Returns
+        -------
+        bool
+        """
+        try:
+            dst_stat = os.stat(dst)
+        except OSError:
+            return False
+        return (dst_stat.st_size == src_stat.st_size
+                and abs(dst_stat.st_mtime - src_stat.st_mtime) < MTIME_TOLERANCE)
+
+    @staticmethod
+    def __copy_data(fsrc, fdst, on_bytes, hasher=None):
+        """
+        Copies file content using the fastest method available (by chunks if the data is to be hashed).
+        """
+        in_fd = fsrc.fileno()
+        out_fd = fdst.fileno()
+        copied = 0
+
+        if hasher is not None:
+            while True:
+                buf = fsrc.read(CHUNK_SIZE)
+                if not buf:
+                    return
+                hasher.update(buf)
+                fdst.write(buf)
+                on_bytes(len(buf))
+
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while True:
+                    n = os.copy_file_range(in_fd, out_fd, CHUNK_SIZE)
+                    if not n:
+                        return
+                    copied += n
+                    on_bytes(n)
+            except OSError:
+                # Файловые системы не поддерживают копирование ядром, продолжим другим способом
+                pass
+
+        if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+            try:
+                while True:
+                    n = os.sendfile(out_fd, in_fd, copied, CHUNK_SIZE)
+                    if not n:
+                        return
+                    copied += n
+                    on_bytes(n)
+            except OSError:
+                pass
+
+        fsrc.seek(copied)
+        fdst.seek(copied)
+        while True:
+            buf = fsrc.read(CHUNK_SIZE)
+            if not buf:
+                return
+            fdst.write(buf)
+            on_bytes(len(buf))
+
+    @staticmethod
+    def link_file(src: str, dst: str):
+        """
+        Replaces the target with a hard link to the source (the target is not changed if it is not possible).
+
+        Parameters
+        ----------
+        src : str
+            Path to the existing file.
+        dst : str
+            Path to the link.
+
+        Returns
+        -------
+        bool
+            Whether the link has been created.
+        """
+        part_path = dst + '.part'
+        try:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            os.link(src, part_path)
+            os.replace(part_path, dst)
+            return True
+        except OSError:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            return False
+
+    def copy_file(self, src: str, dst: str, on_bytes=None, on_hashed=None):
+        """
+        Copies one file with its modification time. A hard link is created instead if it is enabled
+        and possible.
+
+        Parameters
+        ----------
+        src : str
+            Path to the source file.
+        dst : str
+            Path to the target file.
+        on_bytes : callable, default=None
+            Called with number of bytes copied by each chunk.
+        on_hashed : callable, default=None
+            Called with source path and hex digest of the data when the file is copied with hashing enabled
+            (the data is not hashed if None).
+
+        Returns
+        -------
+        action : str
+            'copied', 'linked' or 'skipped'.
+        """
+        src_stat = os.stat(src)
+        if self.is_up_to_date(src_stat, dst):
+            return 'skipped'
+
+        part_path = dst + '.part'
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+        if self.hard_link:
+            try:
+                same_device = os.stat(os.path.dirname(os.path.abspath(dst))).st_dev == src_stat.st_dev
+            except OSError:
+                same_device = False
+            if same_device and self.link_file(src, dst):
+                return 'linked'
+
+        hasher = hashlib.new(self.hash_name) if self.hash_name and on_hashed is not None else None
+        try:
+            with open(src, 'rb') as fsrc, open(part_path, 'wb') as fdst:
+                self.__copy_data(fsrc, fdst, on_bytes or (lambda n: None), hasher)
+            shutil.copystat(src, part_path)
+            os.replace(part_path, dst)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        if hasher is not None:
+            on_hashed(src, hasher.hexdigest())
+        return 'copied'
+
+    def copy_files(self, pairs, stage=None, on_done=None, on_hashed=None, hash_filter=None):
+        """
+        Copies files on a thread pool.
+
+        Parameters
+        ----------
+        pairs : Iterable
+            Pairs of paths (source, target).
+        stage : ProgressStage, default=None
+            Progress stage advanced by each file and by each copied chunk.
+            It has to be created with the total size of the files to be byte-aware.
+        on_done : callable, default=None
+            Called with source and target paths when the file is up to date (it is called from worker threads).
+        on_hashed : callable, default=None
+            Called with source path and hex digest of each copied file if hashing is enabled
+            (it is called from worker threads).
+        hash_filter : callable, default=None
+            Called with source path, returns whether the file is to be hashed (e.g. its digest is not known yet);
+            all the files are hashed if None.
+
+        Returns
+        -------
+        CopyResult
+        """
+        result = CopyResult()
+        lock = threading.Lock()
+        start = time.perf_counter()
+
+        def on_bytes(n):
+            with lock:
+                result.bytes_copied += n
+            if stage is not None:
+                stage.advance(0, n)
+
+        def copy_one(src, dst):
+            try:
+                hash_needed = hash_filter is None or hash_filter(src)
+                action = self.copy_file(src, dst, on_bytes, on_hashed if hash_needed else None)
+            except OSError as e:
+                print('ERROR: cannot copy {}: {}'.format(os.path.split(src)[1], e), file=sys.stderr)
+                action = 'failed'
+            with lock:
+                setattr(result, action, getattr(result, action) + 1)
+            if stage is not None:
+                # Данные связанных и пропущенных файлов не копируются, но входят в общий объём
+                stage.advance(1, os.path.getsize(dst) if action in ('linked', 'skipped') else 0)
+            if action != 'failed' and on_done is not None:
+                on_done(src, dst)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(copy_one, src, dst) for src, dst in pairs]:
+                future.result()
+
+        result.elapsed = time.perf_counter() - start
+        return result
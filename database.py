@@ -4,6 +4,7 @@ import sys
 from typing import Union
 
 from document import Document
+from fs_index import FsIndex
 from transmittal import Transmittal
 
 
@@ -34,7 +35,7 @@ class DataBase:
         If file doesn't exist it creates new database as a dictionary.
     save_db()
         Backing up the database.
-    update_db(update_docs=False)
+    update_db(update_docs=False, fs_index=None)
         Refreshes the database and documents (as an option).
     """
 
@@ -110,23 +111,37 @@ class DataBase:
         else:
             return False
 
-    def update_db(self, update_docs=False):
+    def update_db(self, update_docs=False, fs_index=None):
         """
         Refreshes the database and documents (as an option).
 
         Parameters
         ----------
         update_docs : bool, default=False
+        fs_index : FsIndex, default=None
+            Cache of directory listings shared between items.
 
         Returns
         -------
         None
         """
+        if fs_index is None:
+            fs_index = FsIndex()
+
+        # Папки трансмиттелов находятся в общей директории: прочитаем её один раз
+        # и обновим пути всех трансмиттелов по общему словарю
+        trm_dirs_dict = {}
         for item in self.__db.values():
-            try:
-                item.update(update_docs)
-            except AttributeError:
-                pass
+            if isinstance(item, Transmittal):
+                directory = os.path.split(item.path)[0]
+                if directory not in trm_dirs_dict:
+                    try:
+                        trm_dirs_dict[directory] = Transmittal.map_trm_dirs(fs_index.scan(directory))
+                    except FileNotFoundError:
+                        print('ERROR: {} was not found!'.format(directory), file=sys.stderr)
+                        trm_dirs_dict[directory] = None
+                if trm_dirs_dict[directory] is not None:
+                    item.update(update_docs, fs_index, trm_dirs_dict[directory])
         self.save_db()
 
     def load_db(self):
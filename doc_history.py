@@ -0,0 +1,334 @@
+import datetime
+import os
+import pickle
+import sys
+import threading
+from array import array
+
+from xlsx_stream_reader import from_excel_date
+
+# Поля события: ревизия, дата и трансмиттел отправки, дата и трансмиттел получения, код CRS
+EVENT_FIELDS = 6
+# Смещения столбцов получения относительно столбца даты выпуска ревизии (для ревизии A1 - отдельная группа)
+RECEIVE_OFFSET = 4
+RECEIVE_OFFSET_A1 = 28
+# Версия формата истории; история другой версии строится заново
+FORMAT_VERSION = 2
+
+
+def to_ordinal(value):
+    """
+    Converts date (datetime, date, Excel date serial or string 'dd.mm.yyyy') to its ordinal (0 if it is not a date).
+    """
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.toordinal()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Даты из описей .xls читаются xlrd как числа Excel
+        return from_excel_date(value).toordinal() if value > 0 else 0
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.strptime(value.strip(), r'%d.%m.%Y').toordinal()
+        except ValueError:
+            return 0
+    return 0
+
+
+def _get_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class HistoryEvent:
+    """
+    The class is purposed to keep sending and receiving of one document revision.
+
+    Attributes
+    ----------
+    crs_code : str
+        Comment review sheet code (None if the document has not been received).
+    received_date : datetime.date
+    received_trm : str
+        Name of the transmittal the document was received with.
+    revision : str
+    sent_date : datetime.date
+    sent_trm : str
+        Name of the transmittal the document was sent with.
+    """
+    __slots__ = ('revision', 'sent_date', 'sent_trm', 'received_date', 'received_trm', 'crs_code')
+
+    def __init__(self, revision, sent_date, sent_trm, received_date, received_trm, crs_code):
+        self.revision = revision
+        self.sent_date = sent_date
+        self.sent_trm = sent_trm
+        self.received_date = received_date
+        self.received_trm = received_trm
+        self.crs_code = crs_code
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+
+class DocHistory:
+    """
+    The class is purposed to keep history of each document: every revision sent and received with transmittal
+    names, dates and CRS code.
+    History of a document is stored as a compact array of integers (EVENT_FIELDS per revision): dates are ordinals,
+    strings are indices in the common table of strings. History is rebuilt from VDR only if VDR has been changed
+    and is updated in place when new data is written into VDR.
+
+    Attributes
+    ----------
+    path : str
+        The history location path.
+
+    Methods
+    -------
+    find_by_trm(trm_name: str)
+        Gets events of all documents sent or received with the transmittal.
+    get(number: str)
+        Gets history of the document.
+    is_source_current(vdr_path: str)
+        Checks whether history has been built from the current version of VDR.
+    mark_source(vdr_path: str)
+        Records the current version of VDR as the source of history.
+    save()
+        Backing up the history if it has been changed.
+    set_received(number: str, revision: str, date_, trm_name: str, crs_code)
+        Records receiving of the document revision.
+    update_from_vdr(vdr_path: str, sheet_data, ifr_cols: list, ifu_cols: list, ifr_list, ifu_list)
+        Rebuilds history of documents from VDR values.
+    """
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.__strings = [None]
+        self.__string_ids = {None: 0}
+        self.__docs = {}
+        self.__sources = {}
+        self.__is_changed = False
+        self.__lock = threading.Lock()
+        self.__load()
+
+    def __load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print('WARNING: history {} cannot be read ({}), it will be rebuilt'.format(self.path, e))
+            return
+        if state.get('version') != FORMAT_VERSION:
+            # Ранее даты получения из описей .xls не сохранялись
+            return
+        self.__strings = state['strings']
+        self.__string_ids = {s: i for i, s in enumerate(self.__strings)}
+        self.__docs = {number: array('i', data) for number, data in state['docs'].items()}
+        self.__sources = state['sources']
+
+    def save(self):
+        """
+        Backing up the history if it has been changed.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            if not self.__is_changed:
+                return
+            state = {
+                'version': FORMAT_VERSION,
+                'strings': self.__strings,
+                'docs': {number: data.tobytes() for number, data in self.__docs.items()},
+                'sources': self.__sources
+            }
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(state, f)
+                os.replace(tmp_path, self.path)
+                self.__is_changed = False
+            except OSError as e:
+                print('ERROR: history {} cannot be saved ({})'.format(self.path, e), file=sys.stderr)
+
+    def __intern(self, value):
+        if value is not None:
+            value = str(value).strip() or None
+        string_id = self.__string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.__strings)
+            self.__strings.append(value)
+            self.__string_ids[value] = string_id
+        return string_id
+
+    def __to_event(self, data: array, i: int):
+        rev_id, sent_date, sent_trm, received_date, received_trm, crs_code = data[i:i + EVENT_FIELDS]
+        return HistoryEvent(
+            self.__strings[rev_id],
+            datetime.date.fromordinal(sent_date) if sent_date else None,
+            self.__strings[sent_trm],
+            datetime.date.fromordinal(received_date) if received_date else None,
+            self.__strings[received_trm],
+            self.__strings[crs_code]
+        )
+
+    def is_source_current(self, vdr_path: str):
+        """
+        Checks whether history has been built from the current version of VDR.
+
+        Parameters
+        ----------
+        vdr_path : str
+
+        Returns
+        -------
+        bool
+        """
+        with self.__lock:
+            signature = self.__sources.get(os.path.abspath(vdr_path))
+        return signature is not None and signature == _get_signature(vdr_path)
+
+    def mark_source(self, vdr_path: str):
+        """
+        Records the current version of VDR as the source of history (e.g. after writing into VDR the data
+        which has been also recorded in history).
+
+        Parameters
+        ----------
+        vdr_path : str
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            self.__sources[os.path.abspath(vdr_path)] = _get_signature(vdr_path)
+            self.__is_changed = True
+
+    def update_from_vdr(self, vdr_path: str, sheet_data, ifr_cols: list, ifu_cols: list, ifr_list, ifu_list):
+        """
+        Rebuilds history of documents from VDR values: sending and receiving columns of each issue.
+
+        Parameters
+        ----------
+        vdr_path : str
+            Path to VDR file.
+        sheet_data : SheetValues
+            Values of VDR worksheet.
+        ifr_cols : list
+            Columns of issues for review (A1, B1, ...).
+        ifu_cols : list
+            Columns of issues for use (00, 01, ...).
+        ifr_list : Iterable
+            Revisions for review.
+        ifu_list : Iterable
+            Revisions for use.
+
+        Returns
+        -------
+        count : int
+            Number of documents.
+        """
+        issues = list(zip(ifr_list, ifr_cols)) + list(zip(ifu_list, ifu_cols))
+        docs = {}
+        with self.__lock:
+            for row in range(1, sheet_data.max_row + 1):
+                number = sheet_data.cell(row=row, column=41).value
+                if not isinstance(number, str) or '0055' not in number:
+                    continue
+                data = array('i')
+                for revision, col in issues:
+                    offset = RECEIVE_OFFSET_A1 if revision == 'A1' else RECEIVE_OFFSET
+                    values = [sheet_data.cell(row=row, column=col + i).value for i in (0, 1)]
+                    values += [sheet_data.cell(row=row, column=col + offset + i).value for i in (0, 1, 2)]
+                    if all(value is None for value in values):
+                        continue
+                    sent_date, sent_trm, received_date, received_trm, crs_code = values
+                    data.extend((self.__intern(revision), to_ordinal(sent_date), self.__intern(sent_trm),
+                                 to_ordinal(received_date), self.__intern(received_trm), self.__intern(crs_code)))
+                docs[number.strip()] = data
+            self.__docs.update(docs)
+            self.__sources[os.path.abspath(vdr_path)] = _get_signature(vdr_path)
+            self.__is_changed = True
+        return len(docs)
+
+    def set_received(self, number: str, revision: str, date_, trm_name: str, crs_code):
+        """
+        Records receiving of the document revision.
+
+        Parameters
+        ----------
+        number : str
+            Document number.
+        revision : str
+        date_
+            Receiving date (datetime, date or string 'dd.mm.yyyy').
+        trm_name : str
+            Name of the received transmittal.
+        crs_code
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            data = self.__docs.setdefault(number, array('i'))
+            rev_id = self.__intern(revision)
+            for i in range(0, len(data), EVENT_FIELDS):
+                if data[i] == rev_id:
+                    break
+            else:
+                i = len(data)
+                data.extend((rev_id, 0, 0, 0, 0, 0))
+            data[i + 3] = to_ordinal(date_)
+            data[i + 4] = self.__intern(trm_name)
+            data[i + 5] = self.__intern(crs_code)
+            self.__is_changed = True
+
+    def get(self, number: str):
+        """
+        Gets history of the document.
+
+        Parameters
+        ----------
+        number : str
+            Document number.
+
+        Returns
+        -------
+        events : list
+            List of HistoryEvent in the order of issues (empty if the document is unknown).
+        """
+        with self.__lock:
+            data = self.__docs.get(number)
+            if data is None:
+                return []
+            return [self.__to_event(data, i) for i in range(0, len(data), EVENT_FIELDS)]
+
+    def find_by_trm(self, trm_name: str):
+        """
+        Gets events of all documents sent or received with the transmittal.
+
+        Parameters
+        ----------
+        trm_name : str
+
+        Returns
+        -------
+        events : list
+            Pairs (document number, HistoryEvent).
+        """
+        with self.__lock:
+            trm_id = self.__string_ids.get(trm_name)
+            if trm_id is None:
+                return []
+            return [
+                (number, self.__to_event(data, i))
+                for number, data in self.__docs.items()
+                for i in range(0, len(data), EVENT_FIELDS)
+                if trm_id in (data[i + 2], data[i + 4])
+            ]
@@ -0,0 +1,291 @@
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+
+from file_cache import FileCache
+
+# Область титульного листа (доли ширины и высоты страницы: x0, y0, x1, y1), в которой находится штамп
+TITLE_BLOCK = (0.0, 0.5, 1.0, 1.0)
+QUARANTINE_FILE = 'pdf_quarantine.json'
+
+
+def find_title_names(file_path: str, pattern1: str, pattern2: str, title_block=TITLE_BLOCK):
+    """
+    Finds document names in the title page of pdf-file.
+    The text is extracted from the title block region first, the whole page is read only if the full file name
+    was not found there (the document number found in the title block takes precedence).
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the target file.
+    pattern1 : str
+        Pattern of full file name (e.g. '0055-CPC-GA1-4.2-ER-...-0001_00_EN.pdf').
+    pattern2 : str
+        Pattern of document number (e.g. '0055-CPC-GA1-4.2-...-0001').
+    title_block : tuple, default=TITLE_BLOCK
+        Title block region in fractions of page width and height.
+
+    Returns
+    -------
+    find1 : str or None
+        First name matched by pattern1.
+    find2 : str or None
+        First name matched by pattern2.
+    """
+    with fitz.open(file_path) as f:
+        page = f.loadPage(0)
+        rect = page.rect
+        clip = fitz.Rect(rect.x0 + rect.width * title_block[0], rect.y0 + rect.height * title_block[1],
+                         rect.x0 + rect.width * title_block[2], rect.y0 + rect.height * title_block[3])
+        try:
+            text = page.getText('text', clip=clip)
+        except TypeError:
+            # Старые версии PyMuPDF не поддерживают извлечение текста из области
+            text = ''
+        find1 = re.findall(pattern1, text)
+        find2 = re.findall(pattern2, text)
+        if not find1:
+            text = page.getText('text')
+            find1 = re.findall(pattern1, text)
+            find2 = find2 or re.findall(pattern2, text)
+    return (find1[0] if find1 else None), (find2[0] if find2 else None)
+
+
+def read_title_text(file_path: str):
+    """
+    Gets text of the title page of pdf-file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the target file.
+
+    Returns
+    -------
+    text : str
+        Text of the first page or empty string if the file has no pages.
+    """
+    with fitz.open(file_path) as f:
+        if f.pageCount == 0:
+            return ''
+        return f.loadPage(0).getText('text')
+
+
+def get_checked_name(file_name: str, find1, find2):
+    """
+    Gets correct file name using names found in the title page.
+
+    Parameters
+    ----------
+    file_name : str
+        Current file name.
+    find1 : str or None
+        Full file name found in the title page.
+    find2 : str or None
+        Document number found in the title page.
+
+    Returns
+    -------
+    str
+        Correct file name (equal to file_name if the name is correct or cannot be checked).
+    """
+    if find1:
+        return find1
+    elif find2:
+        s = re.sub(r'_.*$', '', file_name)
+        s = re.sub(r'-(?=[\w\d]{2}-[\d]{4})', r'.', s)
+        if s == find2:
+            return file_name
+        sub1 = re.sub(r'\.(?=[\w\d]{2}-[\d]{4})', r'-', find2)
+        sub2 = re.findall(r'_\d\d_\w\w.*$', file_name)
+        if not sub2:
+            print('WARNING: cannot build correct name for {} from {}!'.format(file_name, find2))
+            return file_name
+        return sub1 + sub2[0]
+    return file_name
+
+
+class DocNameChecker:
+    """
+    The class is purposed for checking documents name against their title pages.
+    Title pages are parsed in worker processes of PdfInspector (with its timeout, memory limit and quarantine),
+    verdicts are cached by file size and modification time, so unchanged files are not opened again on the next runs.
+
+    Attributes
+    ----------
+    dry_run : bool, default=False
+        If True, incorrect names are only reported and files are not renamed.
+    inspector : PdfInspector, default=None
+        Inspector parsing title pages; if None, the inspector shared by the process is used.
+    quarantine_path : str, default=None
+        Quarantine list of the shared inspector (next to the cache if None).
+
+    Methods
+    -------
+    check(file_dir: str, file_names: list)
+        Finds files which name does not match the title page.
+    check_and_rename(file_dir: str, file_names: list)
+        Checks files name, reports incorrect ones and renames them (unless dry run).
+    print_report(file_dir: str, report: list)
+        Prints report of incorrect names.
+    rename(file_dir: str, report: list)
+        Renames files with incorrect names.
+    """
+    def __init__(self, vdr_mask: str, cache_path=None, dry_run=False, inspector=None, quarantine_path=None):
+        self.dry_run = dry_run
+        self.inspector = inspector
+        if quarantine_path is None:
+            quarantine_path = os.path.join(os.path.dirname(cache_path or ''), QUARANTINE_FILE)
+        self.quarantine_path = quarantine_path
+
+        self.__pattern1 = vdr_mask.split('.')[0] + r'.*ER.*\.\w{3}'
+        self.__pattern2 = vdr_mask.split('.')[0] + r'.*-\d{4}'
+        self.__cache = FileCache(cache_path) if cache_path else None
+
+    def __find_names(self, inspector, file_dir: str, file_names: list):
+        """
+        Parses title pages in worker processes of the inspector.
+
+        Returns
+        -------
+        verdicts : dict
+            Pair of names found in the title page of each file (files which failed are omitted).
+        """
+        def find(file_name: str):
+            try:
+                return inspector.get_title_names(os.path.join(file_dir, file_name), self.__pattern1, self.__pattern2)
+            except FileNotFoundError as e:
+                print('ERROR: cannot read title page of {} ({})!'.format(file_name, e), file=sys.stderr)
+                return None
+
+        with ThreadPoolExecutor(max_workers=inspector.max_workers) as executor:
+            results = executor.map(find, file_names)
+            return {file_name: verdict for file_name, verdict in zip(file_names, results) if verdict is not None}
+
+    def check(self, file_dir: str, file_names: list):
+        """
+        Finds files which name does not match the title page.
+
+        Parameters
+        ----------
+        file_dir : str
+            Path to folder containing target files.
+        file_names : list
+            Names of the files to be checked.
+
+        Returns
+        -------
+        report : list
+            List of pairs (current name, correct name) for files with incorrect names.
+        """
+        verdicts = {}
+        to_parse = []
+        for file_name in file_names:
+            file_path = os.path.join(file_dir, file_name)
+            verdict = self.__cache.get(file_path) if self.__cache else None
+            if verdict is None:
+                to_parse.append(file_name)
+            else:
+                verdicts[file_name] = verdict
+
+        if to_parse:
+            inspector = self.inspector
+            if inspector is None:
+                # Импорт здесь: модуль pdf_inspector сам использует функции этого модуля
+                from pdf_inspector import get_shared_inspector
+                inspector = get_shared_inspector(self.quarantine_path)
+            found = self.__find_names(inspector, file_dir, to_parse)
+            for file_name, verdict in found.items():
+                verdicts[file_name] = tuple(verdict)
+                if self.__cache:
+                    self.__cache.set(os.path.join(file_dir, file_name), verdicts[file_name])
+            if self.__cache:
+                self.__cache.save()
+
+        report = []
+        for file_name in file_names:
+            if file_name not in verdicts:
+                continue
+            new_name = get_checked_name(file_name, *verdicts[file_name])
+            if new_name != file_name:
+                report.append((file_name, new_name))
+        return report
+
+    @staticmethod
+    def print_report(file_dir: str, report: list):
+        """
+        Prints report of incorrect names.
+
+        Parameters
+        ----------
+        file_dir : str
+        report : list
+            List of pairs (current name, correct name).
+
+        Returns
+        -------
+        None
+        """
+        if not report:
+            return
+        print('WARNING: {} file names are not correct in {}:'.format(len(report), file_dir))
+        for file_name, new_name in report:
+            print('    {} -> {}'.format(file_name, new_name))
+
+    @staticmethod
+    def rename(file_dir: str, report: list):
+        """
+        Renames files with incorrect names.
+
+        Parameters
+        ----------
+        file_dir : str
+        report : list
+            List of pairs (current name, correct name).
+
+        Returns
+        -------
+        renamed : dict
+            Current names mapped to new names of successfully renamed files.
+        """
+        renamed = {}
+        for file_name, new_name in report:
+            src = os.path.join(file_dir, file_name)
+            dst = os.path.join(file_dir, new_name)
+            try:
+                os.rename(src, dst)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print('ERROR: cannot rename {} to {} ({})!'.format(file_name, new_name, e), file=sys.stderr)
+                continue
+            renamed[file_name] = new_name
+        if renamed:
+            print('{} file names were successfully changed'.format(len(renamed)))
+        return renamed
+
+    def check_and_rename(self, file_dir: str, file_names: list):
+        """
+        Checks files name, reports incorrect ones and renames them (unless dry run).
+
+        Parameters
+        ----------
+        file_dir : str
+        file_names : list
+
+        Returns
+        -------
+        names : dict
+            Names of all the files mapped to their current names after renaming.
+        """
+        report = self.check(file_dir, file_names)
+        self.print_report(file_dir, report)
+
+        names = {file_name: file_name for file_name in file_names}
+        if not self.dry_run:
+            names.update(self.rename(file_dir, report))
+        return names
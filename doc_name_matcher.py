@@ -0,0 +1,66 @@
+class DocNameMatcher:
+    """
+    The class is purposed to match document names from TRM inventory file with names of files in transmittal folder.
+    Names are compared by the part before the first '_' (document number), the index is built once per transmittal.
+
+    Attributes
+    ----------
+    ambiguous : set
+        Prefixes shared by several files.
+
+    Methods
+    -------
+    match(doc_name: str)
+        Gets name of the file corresponding to the document name.
+    """
+    def __init__(self, doc_names):
+        self.__names = set()
+        self.__prefixes = {}
+        self.ambiguous = set()
+
+        for doc_name in doc_names:
+            self.__names.add(doc_name)
+            prefix = self.get_prefix(doc_name)
+            if prefix in self.__prefixes:
+                self.ambiguous.add(prefix)
+            else:
+                self.__prefixes[prefix] = doc_name
+
+    @staticmethod
+    def get_prefix(doc_name: str):
+        """
+        Gets part of the document name before the first '_'.
+
+        Parameters
+        ----------
+        doc_name : str
+
+        Returns
+        -------
+        str
+        """
+        return doc_name.split('_')[0]
+
+    def match(self, doc_name: str):
+        """
+        Gets name of the file corresponding to the document name.
+        If several files have the same prefix, the file with exactly the same name is preferred,
+        otherwise the first one is returned with a warning.
+
+        Parameters
+        ----------
+        doc_name : str
+            Document name from TRM inventory file.
+
+        Returns
+        -------
+        str
+            File name or empty string if there is no corresponding file.
+        """
+        prefix = self.get_prefix(doc_name)
+        file_name = self.__prefixes.get(prefix, '')
+        if file_name and prefix in self.ambiguous:
+            if doc_name in self.__names:
+                return doc_name
+            print('WARNING: several files correspond to {}, {} was chosen'.format(doc_name, file_name))
+        return file_name
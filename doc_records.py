@@ -0,0 +1,211 @@
+def encode_runs(values):
+    """
+    Encodes sequence with run-length encoding, e.g. ['A4', 'A4', 'A3'] -> ('A4', 2, 'A3', 1).
+
+    Parameters
+    ----------
+    values : Iterable
+
+    Returns
+    -------
+    tuple
+        Values followed by their repetition counts.
+    """
+    runs = []
+    for value in values:
+        if runs and runs[-2] == value:
+            runs[-1] += 1
+        else:
+            runs.extend((value, 1))
+    return tuple(runs)
+
+
+def decode_runs(runs):
+    """
+    Decodes sequence encoded by encode_runs.
+
+    Parameters
+    ----------
+    runs : Iterable
+        Values followed by their repetition counts.
+
+    Returns
+    -------
+    list
+    """
+    runs = list(runs)
+    values = []
+    for value, count in zip(runs[::2], runs[1::2]):
+        values.extend([value] * count)
+    return values
+
+
+class SentDocRecord:
+    """
+    The class is purposed to keep properties of the document to be sent, parsed from VDR.
+
+    Attributes
+    ----------
+    dates : tuple
+        Dates of sending all the revisions up to the current one (format 'dd.mm.yyyy').
+    discipline_code : str
+        Discipline code (set code).
+    doc_class : str
+        Document class.
+    issue : str
+        Issue purpose.
+    name_en : str
+        Document name in English.
+    name_ru : str
+        Document name in Russian.
+    number : str
+        Document number.
+    revision : str
+        Supplier revision.
+    type_code : str
+        Document type code.
+
+    Methods
+    -------
+    from_state(state)
+        Creates the record from its compact state.
+    to_state()
+        Gets compact state of the record.
+    """
+    __slots__ = ('issue', 'doc_class', 'name_ru', 'name_en', 'revision', 'number', 'dates', 'discipline_code',
+                 'type_code')
+
+    def __init__(self, issue, doc_class, name_ru, name_en, revision, number, dates, discipline_code, type_code):
+        self.issue = issue
+        self.doc_class = doc_class
+        self.name_ru = name_ru
+        self.name_en = name_en
+        self.revision = revision
+        self.number = number
+        self.dates = tuple(dates)
+        self.discipline_code = discipline_code
+        self.type_code = type_code
+
+    @property
+    def last_date(self):
+        """
+        Date of sending the current revision.
+        """
+        return self.dates[-1]
+
+    def to_state(self):
+        """
+        Gets compact state of the record.
+
+        Returns
+        -------
+        tuple
+        """
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates the record from its compact state.
+
+        Parameters
+        ----------
+        state : Iterable
+            State returned by to_state.
+
+        Returns
+        -------
+        SentDocRecord
+        """
+        return cls(*state)
+
+    def __getstate__(self):
+        return self.to_state()
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(repr(value) for value in self.to_state()))
+
+
+class ReceivedDocRecord:
+    """
+    The class is purposed to keep properties of the received document, parsed from transmittal inventory file
+    and collected from pdf-file for printing.
+
+    Attributes
+    ----------
+    crs_code : str
+        Comment review sheet code.
+    file_size : int
+        Size of pdf-file in bytes (None if the file has not been inspected).
+    formats : list
+        Format of each page (empty if the file has not been inspected).
+    number : str
+        Document number.
+    phase : str
+        Phase of the document.
+    revision : str
+        Document revision.
+    status : str
+        Status of the document for printing (None if it has not been assigned).
+    trm_date
+        Date of the transmittal.
+
+    Methods
+    -------
+    from_state(state)
+        Creates the record from its compact state.
+    to_state()
+        Gets compact state of the record.
+    """
+    __slots__ = ('number', 'revision', 'crs_code', 'phase', 'trm_date', 'file_size', 'formats', 'status')
+
+    def __init__(self, number, revision, crs_code, phase, trm_date, file_size=None, formats=None, status=None):
+        self.number = number
+        self.revision = revision
+        self.crs_code = crs_code
+        self.phase = phase
+        self.trm_date = trm_date
+        self.file_size = file_size
+        self.formats = list(formats) if formats else []
+        self.status = status
+
+    def to_state(self):
+        """
+        Gets compact state of the record: pages formats are run-length encoded.
+
+        Returns
+        -------
+        tuple
+        """
+        return (self.number, self.revision, self.crs_code, self.phase, self.trm_date, self.file_size,
+                encode_runs(self.formats), self.status)
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates the record from its compact state.
+
+        Parameters
+        ----------
+        state : Iterable
+            State returned by to_state.
+
+        Returns
+        -------
+        ReceivedDocRecord
+        """
+        number, revision, crs_code, phase, trm_date, file_size, formats, status = state
+        return cls(number, revision, crs_code, phase, trm_date, file_size, decode_runs(formats), status)
+
+    def __getstate__(self):
+        return self.to_state()
+
+    def __setstate__(self, state):
+        number, revision, crs_code, phase, trm_date, file_size, formats, status = state
+        self.__init__(number, revision, crs_code, phase, trm_date, file_size, decode_runs(formats), status)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(repr(value) for value in self.to_state()))
@@ -0,0 +1,116 @@
+import os
+import pickle
+import sys
+import threading
+
+
+class FileCache:
+    """
+    The class is purposed to keep results computed from files (e.g. text parsed from PDF).
+    A result is valid while size and modification time of the file are the same as when it was computed.
+    The cache is stored in a pickle file, usually in the process directory.
+
+    Attributes
+    ----------
+    path : str
+        The cache location path.
+
+    Methods
+    -------
+    get(file_path: str, default=None)
+        Gets cached value for the file if the file has not been changed.
+    save()
+        Backing up the cache if it has been changed.
+    set(file_path: str, value)
+        Puts value for the file into the cache.
+    """
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.__data = {}
+        self.__is_changed = False
+        self.__lock = threading.Lock()
+        self.__load()
+
+    def __load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                self.__data = pickle.load(f)
+        except FileNotFoundError:
+            self.__data = {}
+        except Exception as e:
+            print('WARNING: cache {} cannot be read ({}), it will be rebuilt'.format(self.path, e))
+            self.__data = {}
+
+    @staticmethod
+    def __signature(file_path: str):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    @staticmethod
+    def __key(file_path: str):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def get(self, file_path: str, default=None):
+        """
+        Gets cached value for the file if the file has not been changed.
+
+        Parameters
+        ----------
+        file_path : str
+        default : default=None
+            Value to return if there is no valid cached value.
+
+        Returns
+        -------
+        Cached value or default.
+        """
+        signature = self.__signature(file_path)
+        with self.__lock:
+            item = self.__data.get(self.__key(file_path))
+        if item is None or signature is None or item[0] != signature:
+            return default
+        return item[1]
+
+    def set(self, file_path: str, value):
+        """
+        Puts value for the file into the cache.
+
+        Parameters
+        ----------
+        file_path : str
+        value
+            Any picklable object.
+
+        Returns
+        -------
+        None
+        """
+        signature = self.__signature(file_path)
+        if signature is None:
+            return
+        with self.__lock:
+            self.__data[self.__key(file_path)] = (signature, value)
+            self.__is_changed = True
+
+    def save(self):
+        """
+        Backing up the cache if it has been changed.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            if not self.__is_changed:
+                return
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(self.__data, f)
+                os.replace(tmp_path, self.path)
+                self.__is_changed = False
+            except OSError as e:
+                print('ERROR: cache {} cannot be saved ({})'.format(self.path, e), file=sys.stderr)
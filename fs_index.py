@@ -0,0 +1,203 @@
+import os
+import threading
+
+
+class FsEntry:
+    """
+    The class is purposed to keep one directory entry read by os.scandir.
+    Type of the entry is known from the directory listing, size and modification time are read on demand
+    and then cached (on Windows they come with the listing for free).
+
+    Attributes
+    ----------
+    is_dir : bool
+    is_file : bool
+    mtime : float
+    name : str
+    path : str
+    size : int
+    """
+    __slots__ = ('name', 'path', 'is_dir', 'is_file', '__dir_entry', '__stat')
+
+    def __init__(self, dir_entry: os.DirEntry):
+        self.name = dir_entry.name
+        self.path = dir_entry.path
+        try:
+            self.is_dir = dir_entry.is_dir()
+            self.is_file = dir_entry.is_file()
+        except OSError:
+            self.is_dir = False
+            self.is_file = False
+        self.__dir_entry = dir_entry
+        self.__stat = None
+
+    def __get_stat(self):
+        if self.__stat is None:
+            self.__stat = self.__dir_entry.stat()
+            self.__dir_entry = None
+        return self.__stat
+
+    @property
+    def size(self):
+        return self.__get_stat().st_size
+
+    @property
+    def mtime(self):
+        return self.__get_stat().st_mtime
+
+
+class FsIndex:
+    """
+    The class is purposed to cache directory listings during one run, so that every directory
+    is read only once with os.scandir and all further lookups are answered from memory.
+
+    Methods
+    -------
+    entry(path: str)
+        Gets cached entry of the path.
+    invalidate(path: str)
+        Drops cached listing of the directory.
+    isdir(path: str)
+        Checks whether the path is an existing directory.
+    isfile(path: str)
+        Checks whether the path is an existing file.
+    listdir(path: str)
+        Gets names of entries in the directory.
+    scan(path: str, depth=0)
+        Gets entries of the directory and optionally of its subdirectories.
+    """
+    def __init__(self):
+        self.__dirs = {}
+        self.__names = {}
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def __key(path: str):
+        return os.path.normcase(os.path.abspath(path))
+
+    def scan(self, path: str, depth=0):
+        """
+        Gets entries of the directory and optionally of its subdirectories.
+
+        Parameters
+        ----------
+        path : str
+            Path to the directory.
+        depth : int, default=0
+            How many levels of subdirectories should be read in advance.
+
+        Returns
+        -------
+        entries : list
+            List of FsEntry.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the directory does not exist.
+        """
+        key = self.__key(path)
+        with self.__lock:
+            entries = self.__dirs.get(key)
+
+        if entries is None:
+            with os.scandir(path) as it:
+                entries = [FsEntry(dir_entry) for dir_entry in it]
+            with self.__lock:
+                if key not in self.__dirs:
+                    self.__dirs[key] = entries
+                    self.__names[key] = {os.path.normcase(item.name): item for item in entries}
+                entries = self.__dirs[key]
+
+        if depth > 0:
+            for item in entries:
+                if item.is_dir:
+                    try:
+                        self.scan(item.path, depth - 1)
+                    except OSError:
+                        pass
+        return entries
+
+    def listdir(self, path: str):
+        """
+        Gets names of entries in the directory.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        list
+        """
+        return [item.name for item in self.scan(path)]
+
+    def entry(self, path: str):
+        """
+        Gets cached entry of the path using listing of its parent directory.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        FsEntry or None
+            None if the path does not exist.
+        """
+        directory, name = os.path.split(os.path.abspath(path))
+        try:
+            self.scan(directory)
+        except OSError:
+            return None
+        with self.__lock:
+            names = self.__names.get(self.__key(directory), {})
+        return names.get(os.path.normcase(name))
+
+    def isdir(self, path: str):
+        """
+        Checks whether the path is an existing directory.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        bool
+        """
+        item = self.entry(path)
+        return item is not None and item.is_dir
+
+    def isfile(self, path: str):
+        """
+        Checks whether the path is an existing file.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        bool
+        """
+        item = self.entry(path)
+        return item is not None and item.is_file
+
+    def invalidate(self, path: str):
+        """
+        Drops cached listing of the directory, so it will be read again on the next lookup.
+        Should be called after files in the directory are created, renamed or removed.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        None
+        """
+        key = self.__key(path)
+        with self.__lock:
+            self.__dirs.pop(key, None)
+            self.__names.pop(key, None)
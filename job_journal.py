@@ -0,0 +1,201 @@
+import datetime
+import json
+import os
+import threading
+
+
+def get_signature(paths):
+    """
+    Gets signature of files: size and modification time of each one (None if the file does not exist).
+
+    Parameters
+    ----------
+    paths : Iterable
+        Paths to files.
+
+    Returns
+    -------
+    list
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append([stat.st_size, stat.st_mtime_ns])
+        except (OSError, TypeError):
+            signature.append(None)
+    return signature
+
+
+def _encode(obj):
+    if isinstance(obj, datetime.datetime):
+        return {'__datetime__': obj.isoformat()}
+    if isinstance(obj, datetime.date):
+        return {'__date__': obj.isoformat()}
+    raise TypeError('{} is not JSON serializable'.format(type(obj).__name__))
+
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return datetime.date.fromisoformat(obj['__date__'])
+    return obj
+
+
+class JobJournal:
+    """
+    The class is purposed to record completed units of a long job, so that the job interrupted by a crash
+    or by closing the app resumes where it stopped.
+    Each unit is appended to a JSON lines file as soon as it is completed. A unit is identified by its kind and key
+    and is valid only while its input and output files have the same size and modification time as when the unit
+    was recorded (so a unit whose output has been restored or deleted is to be done again).
+
+    Attributes
+    ----------
+    path : str
+        Path to the journal file.
+
+    Methods
+    -------
+    clear()
+        Deletes all the units, e.g. when the job has been completed successfully.
+    close()
+        Closes the journal file.
+    get(kind: str, key: str, inputs=(), outputs=())
+        Gets data of the completed unit.
+    is_done(kind: str, key: str, inputs=(), outputs=())
+        Checks whether the unit has been completed.
+    record(kind: str, key: str, inputs=(), data=None, outputs=())
+        Records the completed unit.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__units = {}
+        self.__file = None
+        self.__lock = threading.Lock()
+        self.__load()
+
+    def __load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    unit = json.loads(line, object_hook=_decode)
+                    self.__units[(unit['kind'], unit['key'])] = (
+                        unit['inputs'], unit['data'], unit.get('outputs', []))
+                except (ValueError, KeyError):
+                    # Последняя строка может быть записана не полностью
+                    continue
+        if self.__units:
+            print('Job journal {}: {} completed units found, the job will be resumed'.format(
+                os.path.split(self.path)[1], len(self.__units)))
+
+    def __find_valid(self, kind: str, key: str, inputs, outputs):
+        with self.__lock:
+            unit = self.__units.get((kind, key))
+        if unit is None or unit[0] != get_signature(inputs) or unit[2] != get_signature(outputs):
+            return None
+        return unit
+
+    def get(self, kind: str, key: str, inputs=(), outputs=()):
+        """
+        Gets data of the completed unit.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of the unit, e.g. 'file copied'.
+        key : str
+            Unique key of the unit within its kind.
+        inputs : Iterable, default=()
+            Paths to input files of the unit.
+        outputs : Iterable, default=()
+            Paths to output files of the unit.
+
+        Returns
+        -------
+        data
+            None if the unit has not been completed or its inputs or outputs have been changed.
+        """
+        unit = self.__find_valid(kind, key, inputs, outputs)
+        return unit[1] if unit is not None else None
+
+    def is_done(self, kind: str, key: str, inputs=(), outputs=()):
+        """
+        Checks whether the unit has been completed and its inputs and outputs have not been changed since then.
+
+        Parameters
+        ----------
+        kind : str
+        key : str
+        inputs : Iterable, default=()
+        outputs : Iterable, default=()
+
+        Returns
+        -------
+        bool
+        """
+        return self.__find_valid(kind, key, inputs, outputs) is not None
+
+    def record(self, kind: str, key: str, inputs=(), data=None, outputs=()):
+        """
+        Records the completed unit.
+
+        Parameters
+        ----------
+        kind : str
+        key : str
+        inputs : Iterable, default=()
+            Paths to input files of the unit.
+        data : default=None
+            JSON serializable data of the unit (dates are supported), returned by get().
+        outputs : Iterable, default=()
+            Paths to output files of the unit (their signature is taken at the moment of recording).
+
+        Returns
+        -------
+        None
+        """
+        inputs = get_signature(inputs)
+        outputs = get_signature(outputs)
+        line = json.dumps({'kind': kind, 'key': key, 'inputs': inputs, 'data': data, 'outputs': outputs},
+                          ensure_ascii=False, default=_encode)
+        # Сохраним копию данных, чтобы последующие изменения объектов не попали в журнал
+        data = json.loads(line, object_hook=_decode)['data']
+        with self.__lock:
+            if self.__file is None:
+                self.__file = open(self.path, 'a', encoding='utf-8')
+            self.__file.write(line + '\n')
+            self.__file.flush()
+            self.__units[(kind, key)] = (inputs, data, outputs)
+
+    def clear(self):
+        """
+        Deletes all the units, e.g. when the job has been completed successfully.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+            self.__units = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        """
+        Closes the journal file.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
@@ -1,3 +1,4 @@
+import multiprocessing
 import sys  # sys нужен для передачи argv в QApplication
 
 from PyQt5.QtWidgets import QApplication
@@ -13,4 +14,5 @@ def main():
 
 
 if __name__ == '__main__':  # Если мы запускаем файл напрямую, а не импортируем
+    multiprocessing.freeze_support()  # Рабочие процессы разбора PDF в собранном приложении
     main()  # то запускаем функцию main()
@@ -1,18 +1,19 @@
 import datetime
 import os
 import sys
-import time
 
 from PyQt5 import QtGui
 from PyQt5.QtCore import pyqtSlot, QCoreApplication, QDate, QThreadPool, QTimer
-from PyQt5.QtWidgets import QFileDialog, QMainWindow, QMessageBox, QRadioButton
+from PyQt5.QtWidgets import (QFileDialog, QLabel, QLineEdit, QMainWindow, QMessageBox, QProgressBar,
+                             QPushButton, QRadioButton, QVBoxLayout, QWidget)
 from pathlib import Path
 
 import main_window  # Это наш конвертированный файл дизайна
 from output_logger import OutputLogger
-from print_progress_bar import PrintProgressBar
+from progress_reporter import ProgressEvent, ProgressReporter, format_eta
+from qt_progress_renderer import QtProgressRenderer
 from trm_manager import TrmManager
-from trm_processing import Worker
+from trm_processing import JobScheduler, Worker
 
 OUTPUT_LOGGER_STDOUT = OutputLogger(sys.stdout, OutputLogger.Severity.NORMAL)
 OUTPUT_LOGGER_STDERR = OutputLogger(sys.stderr, OutputLogger.Severity.ERROR)
@@ -33,6 +34,8 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
     ----------
     browser_dict : dict
         Dictionary to store pointers to text editors in which paths are input.
+    date_queue : list
+        Names of transmittals for which sending date is still to be chosen.
     directories_dict : dict
         Dictionary to store paths to required files.
     dir_browser_match_dict : dict
@@ -43,10 +46,22 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         Flag to indicate whether printing is required or not.
     item_list : list
         List to store databases items.
+    job_items : dict
+        Dictionary to connect job names and items of the right display processed by the job.
+    jobs : dict
+        Dictionary to connect job names and indices of items processed by the job.
     mgr : TrmManager
         Transmittal manager instance.
+    progress_bars : dict
+        Dictionary to store progress label and bar for each processing stage.
+    progress_renderer : QtProgressRenderer
+        Renderer to pass progress events from working threads to progress bars.
+    scheduler : JobScheduler
+        Tool to run independent processing jobs in parallel.
     send_date : str
-        String to store sending date.
+        String to store last chosen sending date.
+    send_dates : dict
+        Dictionary to store sending date of each transmittal.
     timer : PyQt5.QtCore.QTimer
         Internal timer.
     threadpool : PyQt5.QtCore.QThreadPool
@@ -60,6 +75,8 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         Displays all accessable items of the database.
     append_log(text: str, severity: int)
         Append string to the console display with format corresponding to its severity.
+    ask_send_date()
+        Shows dock widget to choose sending date of the next transmittal.
     browse_folder()
         Opens a standard file dialog and save path choosen in directories dictionary.
     check_list_display()
@@ -70,8 +87,12 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         Chooses further strategy of transmittals processing.
     clear_all()
         Drags all the elements listed in the right display and drops them to the left display.
+    clear_progress()
+        Removes all progress bars.
     clear_radiobutton(radiobutton: QRadioButton)
         Clear radiobuttons if checked.
+    complete_processing()
+        Shows final message and exports logs when all processing jobs are finished.
     define_slot()
         Defines to show or hide GUI elements at the first steps.
     drag_all()
@@ -84,18 +105,30 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         Initialize signals and slots.
     init_elements()
         Initialize GUI elements.
-    process_item_in_thread(item_ids)
+    process_item_in_thread(item_ids, send_dates=None, scope=None)
         Processes selected items of database.
     process_trm()
-        Creates and launches thread to process selected items.
+        Splits selected items into independent jobs and launches them in parallel.
+    search_documents()
+        Finds documents by words entered in the search field.
     show_btn_further()
         Shows "further" button.
+    show_job_status(name: str, status: str)
+        Shows status of the job next to the items processed by it.
     show_message(title, text)
         Show message box with title and text provided.
+    show_search()
+        Shows the search field when the database is updated.
+    show_search_results(results: list)
+        Prints found documents to the console display.
     set_send_date()
-        Saves sending date to attribute and hides dock widget.
+        Saves sending date of the transmittal and asks the next one or starts processing.
+    start_jobs()
+        Launches processing jobs in parallel.
     start_program()
         Initializes all GUI elements required to complete preparation stage before processing.
+    update_progress(event: ProgressEvent)
+        Shows progress event in a progress bar of corresponding stage.
     update_trm()
         Creates and launches thread to initialize and update database of TrmManager instance.
     """
@@ -130,11 +163,42 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
 
         self.item_list = None
         self.send_date = None
+        self.send_dates = {}
+        self.date_queue = []
+        self.jobs = {}
         self._translate = QCoreApplication.translate
 
+        # Панель с индикаторами прогресса для каждого этапа обработки
+        self.progress_bars = {}
+        self.progress_renderer = QtProgressRenderer()
+        self.progress_renderer.emit_progress.connect(self.update_progress)
+        self.progressPanel = QWidget(self)
+        self.progressPanel.setGeometry(830, 200, 171, 320)
+        self.progressLayout = QVBoxLayout(self.progressPanel)
+        self.progressLayout.setContentsMargins(0, 0, 0, 0)
+        self.progressLayout.addStretch()
+
+        self.btnCancel = QPushButton(self)
+        self.btnCancel.setGeometry(840, 150, 151, 41)
+        self.btnCancel.setText(self._translate("MainWindow", "Отменить"))
+
+        # Поиск документов по тексту титульного листа, наименованию, номеру и трансмиттелу
+        self.searchEdit = QLineEdit(self)
+        self.searchEdit.setGeometry(30, 25, 681, 31)
+        self.searchEdit.setPlaceholderText(self._translate("MainWindow", "Поиск документов"))
+        self.btnSearch = QPushButton(self)
+        self.btnSearch.setGeometry(716, 25, 95, 31)
+        self.btnSearch.setText(self._translate("MainWindow", "Найти"))
+
+        self.job_items = {}
+
         self.init_elements()
         self.init_connections()
         self.threadpool = QThreadPool()
+        self.scheduler = JobScheduler()
+        self.scheduler.status_changed.connect(self.show_job_status)
+        self.scheduler.finish.connect(self.complete_processing)
+        self.btnCancel.pressed.connect(self.scheduler.cancel)
 
     @staticmethod
     def clear_radiobutton(radiobutton: QRadioButton):
@@ -180,6 +244,7 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
             self.chkApplyDateToAll.setChecked(False)
 
         self.btnGotoStart.hide()
+        self.btnCancel.hide()
         self.btnFurther.hide()
         self.btnStart.hide()
         self.btnDragAll.hide()
@@ -193,6 +258,10 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         self.textBrowser_3.clear()
         self.textBrowser_3.hide()
         self.dockWidget.hide()
+        self.searchEdit.clear()
+        self.searchEdit.hide()
+        self.btnSearch.hide()
+        self.clear_progress()
 
     def init_connections(self):
         """
@@ -218,6 +287,8 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         self.btnConfirm.pressed.connect(self.set_send_date)
         self.textBrowser.textChanged['QString'].connect(self.show_btn_further)
         self.textBrowser_2.textChanged['QString'].connect(self.show_btn_further)
+        self.btnSearch.pressed.connect(self.search_documents)
+        self.searchEdit.returnPressed.connect(self.search_documents)
 
     @pyqtSlot()
     def drag_all(self):
@@ -332,11 +403,6 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
                 self.consoleOutput.textCursor().mergeCharFormat(fmt)
 
         text = text.strip('\n')
-        selected_line = get_selected_line()
-        if 'Progress' in selected_line and r'%' in selected_line and 'Progress' in text and r'%' in text:
-            self.consoleOutput.textCursor().removeSelectedText()
-            self.consoleOutput.textCursor().deletePreviousChar()
-
         self.consoleOutput.append(text)
         format_text()
 
@@ -345,6 +411,50 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
             self.consoleOutput.textCursor().deletePreviousChar()
         self.consoleOutput.moveCursor(cursor.End, cursor.MoveAnchor)
 
+    def clear_progress(self):
+        """
+        Removes all progress bars.
+
+        Returns
+        -------
+        None
+        """
+        for label, bar in self.progress_bars.values():
+            label.deleteLater()
+            bar.deleteLater()
+        self.progress_bars = {}
+
+    def update_progress(self, event: ProgressEvent):
+        """
+        Shows progress event in a progress bar of corresponding stage.
+
+        Parameters
+        ----------
+        event : ProgressEvent
+
+        Returns
+        -------
+        None
+        """
+        if event.stage not in self.progress_bars:
+            label = QLabel(self.progressPanel)
+            label.setWordWrap(True)
+            bar = QProgressBar(self.progressPanel)
+            bar.setRange(0, 1000)
+            # Новые индикаторы добавляются перед растяжкой в конце панели
+            index = self.progressLayout.count() - 1
+            self.progressLayout.insertWidget(index, label)
+            self.progressLayout.insertWidget(index + 1, bar)
+            self.progress_bars[event.stage] = (label, bar)
+
+        label, bar = self.progress_bars[event.stage]
+        bar.setValue(int(1000 * event.fraction))
+        if event.finished:
+            status = 'завершено за {}'.format(format_eta(event.elapsed))
+        else:
+            status = 'осталось {}'.format(format_eta(event.eta))
+        label.setText('{} ({}/{}), {}'.format(event.stage, event.done, event.total, status))
+
     @pyqtSlot()
     def browse_folder(self):
         """
@@ -402,17 +512,41 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
             self.btnBrowse_3.show()
             self.textBrowser_3.show()
 
+    def ask_send_date(self):
+        """
+        Shows dock widget to choose sending date of the next transmittal.
+
+        Returns
+        -------
+        None
+        """
+        title = 'Выбор даты отправки трансмиттела {}'.format(self.date_queue[0])
+        self.dockWidget.setWindowTitle(self._translate("MainWindow", title))
+        self.dockWidget.show()
+
     @pyqtSlot()
     def set_send_date(self):
         """
-        Saves sending date to attribute and hides dock widget.
+        Saves sending date of the transmittal and asks the next one or starts processing.
 
         Returns
         -------
         None
         """
         self.send_date = self.dateEdit.text()
-        self.dockWidget.hide()
+        if self.date_queue:
+            trm_name = self.date_queue.pop(0)
+            self.send_dates[trm_name] = self.send_date
+            if self.chkApplyDateToAll.isChecked():
+                for trm_name in self.date_queue:
+                    self.send_dates[trm_name] = self.send_date
+                self.date_queue = []
+
+        if self.date_queue:
+            self.ask_send_date()
+        else:
+            self.dockWidget.hide()
+            self.start_jobs()
 
     @pyqtSlot()
     def show_btn_further(self):
@@ -478,7 +612,8 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         trm_path = self.directories_dict['trm']
         vdr_path = self.directories_dict['vdr']
         print_path = self.directories_dict['print']
-        self.mgr = TrmManager(trm_path, vdr_path, print_path)
+        progress = ProgressReporter([self.progress_renderer])
+        self.mgr = TrmManager(trm_path, vdr_path, print_path, progress=progress)
         self.mgr.update_db(self.is_received)
         self.item_list = self.mgr.db.get_item_names()
 
@@ -524,6 +659,7 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         trm_updater = Worker(self.init_and_update_trm_in_thread)
         trm_updater.signals.result.connect(self.add_items)
         trm_updater.signals.finish.connect(self.check_list_display)
+        trm_updater.signals.finish.connect(self.show_search)
 
         try:
             self.threadpool.start(trm_updater)
@@ -532,6 +668,51 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
 
         self.timer.start(100)
 
+    def show_search(self):
+        """
+        Shows the search field when the database is updated.
+
+        Returns
+        -------
+        None
+        """
+        if self.mgr is not None:
+            self.searchEdit.show()
+            self.btnSearch.show()
+
+    @pyqtSlot()
+    def search_documents(self):
+        """
+        Finds documents by words entered in the search field, the search is run in a separate thread.
+
+        Returns
+        -------
+        None
+        """
+        text = self.searchEdit.text().strip()
+        if not text or self.mgr is None:
+            return
+        searcher = Worker(self.mgr.search_documents, text)
+        searcher.signals.result.connect(self.show_search_results)
+        self.threadpool.start(searcher)
+
+    def show_search_results(self, results: list):
+        """
+        Prints found documents to the console display.
+
+        Parameters
+        ----------
+        results : list
+            List of SearchResult.
+
+        Returns
+        -------
+        None
+        """
+        print('Search results for "{}": {} documents found'.format(self.searchEdit.text().strip(), len(results)))
+        for result in results:
+            print(result)
+
     @pyqtSlot()
     def check_list_process(self):
         """
@@ -546,7 +727,7 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         elif self.btnStart.isEnabled():
             self.btnStart.setEnabled(False)
 
-    def process_item_in_thread(self, item_ids: list):
+    def process_item_in_thread(self, item_ids: list, send_dates=None, scope=None):
         """
         Processes selected items of database.
 
@@ -554,38 +735,38 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         ----------
         item_ids : list
             Item indices.
+        send_dates : dict, default=None
+            Sending date of each transmittal to be sent.
+        scope : str, default=None
+            Name of the job to prefix its progress stages (jobs run in parallel have separate progress bars).
 
         Returns
         -------
         None
         """
-        if self.is_received:
-            if self.is_print:
-                for item_id in item_ids:
-                    vdr = self.mgr.db.get_item(item_id)
-                    print('Phase {} documents preparation for printing begins. '
-                          'It will take some time...'.format(vdr.phase))
-                    self.mgr.prepare_docs_for_printing(vdr)
+        with self.mgr.progress.scope(scope):
+            if self.is_received:
+                if self.is_print:
+                    for item_id in item_ids:
+                        vdr = self.mgr.db.get_item(item_id)
+                        print('Phase {} documents preparation for printing begins. '
+                              'It will take some time...'.format(vdr.phase))
+                        self.mgr.prepare_docs_for_printing(vdr)
+                else:
+                    for item_id in item_ids:
+                        trm = self.mgr.db.get_item(item_id)
+                        self.mgr.process_received_transmittals(trm)
             else:
-                print('Received transmittals processing begins. It will take some time...')
-
                 for item_id in item_ids:
                     trm = self.mgr.db.get_item(item_id)
-                    self.mgr.process_received_transmittals(trm)
-        else:
-            for item_id in item_ids:
-                trm = self.mgr.db.get_item(item_id)
-                if not trm.documents:
-                    print(f'WARNING: there are no documents in {trm.name}', file=sys.stderr)
-                else:
-                    print('{} processing begins. It will takes some time...'.format(trm.name))
-                    if not self.chkApplyDateToAll.isChecked():
-                        self.dockWidget.show()
-                        while not self.dockWidget.isHidden():
-                            time.sleep(0.1)
-                    self.mgr.parse_trm_docs(trm, self.send_date)
-                    self.mgr.create_crs(trm)
-                    self.mgr.create_trm_inventory(trm, self.send_date)
+                    if not trm.documents:
+                        print(f'WARNING: there are no documents in {trm.name}', file=sys.stderr)
+                    else:
+                        print('{} processing begins. It will takes some time...'.format(trm.name))
+                        send_date = send_dates[trm.name]
+                        self.mgr.parse_trm_docs(trm, send_date)
+                        self.mgr.create_crs(trm)
+                        self.mgr.create_trm_inventory(trm, send_date)
 
     def get_all_logs(self):
         """
@@ -617,49 +798,119 @@ class ManagerGui(QMainWindow, main_window.Ui_MainWindow):
         with open(file=f'LOGS/{filename}', mode='w', encoding="utf-8") as f:
             f.write(text)
 
+    @pyqtSlot(str, str)
+    def show_job_status(self, name: str, status: str):
+        """
+        Shows status of the job next to the items processed by it.
+
+        Parameters
+        ----------
+        name : str
+            Name of the job.
+        status : str
+            Status of the job.
+
+        Returns
+        -------
+        None
+        """
+        for item, item_name in self.job_items.get(name, []):
+            item.setText('{} ({})'.format(item_name, status))
+
     @pyqtSlot()
-    def process_trm(self):
+    def complete_processing(self):
         """
-        Creates and launches thread to process selected items.
+        Shows final message and exports logs when all processing jobs are finished.
 
         Returns
         -------
         None
         """
-        def complete():
-            title = 'Сообщение'
-            if self.is_print:
-                text = 'Документы подготовлены для печати.'
-            elif self.is_received:
-                text = 'Обработка полученных трансмиттелов успешно завершена!'
-            else:
-                text = 'Подготовка трансмиттелов к отправке успешно завершена!'
-            self.show_message(title=title, text=text)
+        statuses = self.scheduler.statuses
+        failed = [name for name, status in statuses.items() if status == JobScheduler.Status.FAILED]
+        cancelled = [name for name, status in statuses.items() if status == JobScheduler.Status.CANCELLED]
+
+        title = 'Сообщение'
+        if self.is_print:
+            text = 'Документы подготовлены для печати.'
+        elif self.is_received:
+            text = 'Обработка полученных трансмиттелов успешно завершена!'
+        else:
+            text = 'Подготовка трансмиттелов к отправке успешно завершена!'
+        if failed or cancelled:
+            text = 'Обработка завершена. Выполнено заданий: {}, с ошибкой: {}, отменено: {}.'.format(
+                len(statuses) - len(failed) - len(cancelled), len(failed), len(cancelled))
+        elif self.is_received:
+            # Журналы нужны только для продолжения прерванной обработки
+            self.mgr.clear_journals()
+        self.show_message(title=title, text=text)
 
-            datetime_now = datetime.datetime.now()
-            end_str = f"{datetime_now.strftime('%d.%m.%Y %H:%M:%S')} {END_LOG_WITH}"
-            print(end_str)
+        datetime_now = datetime.datetime.now()
+        end_str = f"{datetime_now.strftime('%d.%m.%Y %H:%M:%S')} {END_LOG_WITH}"
+        print(end_str)
 
-            self.export_logs_to_file()
-            self.goto_start()
+        self.export_logs_to_file()
+        self.btnCancel.hide()
+        self.goto_start()
 
+    @pyqtSlot()
+    def process_trm(self):
+        """
+        Splits selected items into independent jobs and launches them in parallel.
+        Each transmittal is processed by its own job, documents preparation for printing is done by one job.
+
+        Returns
+        -------
+        None
+        """
         self.timer.stop()
+        self.clear_progress()
         self.btnStart.setEnabled(False)
         self.splitter.setEnabled(False)
         self.splitter_2.setEnabled(False)
         self.btnDragAll.setEnabled(False)
         self.btnClearAll.setEnabled(False)
 
-        item_ids = []
+        self.jobs = {}
+        self.job_items = {}
         list_len = self.listProcess.count()
         for i in range(list_len):
-            item_name = self.listProcess.item(i).text()
-            item_ids.append(self.item_list.index(item_name))
+            item = self.listProcess.item(i)
+            item_name = item.text()
+            # Подготовка к печати использует все трансмиттелы, поэтому выполняется одним заданием
+            job_name = 'print' if self.is_print else item_name
+            self.jobs.setdefault(job_name, []).append(self.item_list.index(item_name))
+            self.job_items.setdefault(job_name, []).append((item, item_name))
+
+        # Даты отправки выбираются до начала обработки, чтобы задания не ждали пользователя
+        self.send_dates = {}
+        self.date_queue = []
+        if not self.is_received:
+            for item_ids in self.jobs.values():
+                for item_id in item_ids:
+                    trm = self.mgr.db.get_item(item_id)
+                    if trm.documents:
+                        self.date_queue.append(trm.name)
 
-        item_processor = Worker(self.process_item_in_thread, item_ids)
-        try:
-            self.threadpool.start(item_processor)
-        except Exception as e:
-            print(e, file=sys.stderr)
+        if self.date_queue:
+            self.ask_send_date()
+        else:
+            self.start_jobs()
+
+    def start_jobs(self):
+        """
+        Launches processing jobs in parallel.
+
+        Returns
+        -------
+        None
+        """
+        if self.is_received and not self.is_print:
+            print('Received transmittals processing begins. It will take some time...')
 
-        item_processor.signals.finish.connect(complete)
+        self.btnCancel.show()
+        # Задания ставятся одним пакетом, чтобы окончание обработки не было зафиксировано раньше времени
+        self.scheduler.submit_batch([
+            (job_name, self.process_item_in_thread, (item_ids, self.send_dates), {'scope': job_name})
+            for job_name, item_ids in self.jobs.items()
+        ])
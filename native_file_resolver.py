@@ -0,0 +1,97 @@
+import os
+
+from fs_index import FsIndex
+
+
+class NativeFileResolver:
+    """
+    The class is purposed to find native and pdf files of the transmittal documents.
+    Files of the transmittal folder are grouped by document number (part of the name before the first '_')
+    with one pass over the folder listing, so every document is resolved without scanning the whole folder.
+
+    Attributes
+    ----------
+    path : str
+        Path to the transmittal folder.
+
+    Methods
+    -------
+    get_native_file(doc_name: str)
+        Gets name of the file to be referenced as native format of the document.
+    has_pdf_in_root(doc_name: str)
+        Checks whether pdf-file of the document is located in the transmittal folder (not in a subfolder).
+    """
+    def __init__(self, path: str, fs_index: FsIndex):
+        self.path = path
+        self.__fs_index = fs_index
+
+        # Файлы перебираются в порядке кодов символов имён, независимо от порядка листинга файловой системы
+        self.__files = sorted(entry.name for entry in fs_index.scan(path) if entry.is_file)
+        self.__groups = {}
+        for file_name in self.__files:
+            self.__groups.setdefault(self.__get_key(file_name), []).append(file_name)
+        # Имена сравниваются без учёта регистра, как в файловой системе Windows (маска pdf принимает и '.PDF')
+        self.__file_set = {file_name.casefold() for file_name in self.__files}
+
+    @staticmethod
+    def __get_key(file_name: str):
+        return file_name.split('_')[0]
+
+    @staticmethod
+    def __is_pdf(file_name: str):
+        return r'.pdf' in file_name
+
+    def __is_native(self, file_name: str):
+        return not self.__is_pdf(file_name) and 'CRS' not in file_name
+
+    def __get_candidates(self, doc_name: str):
+        candidates = self.__groups.get(self.__get_key(doc_name), [])
+        candidates = [file_name for file_name in candidates if doc_name in file_name]
+        if not candidates:
+            # Имя файла может начинаться не с номера документа
+            candidates = [file_name for file_name in self.__files if doc_name in file_name]
+        return candidates
+
+    def get_native_file(self, doc_name: str):
+        """
+        Gets name of the file to be referenced as native format of the document.
+        Native file in the transmittal folder or pdf-file in the transmittal folder or native file
+        in the document subfolder is returned (the first one in alphabetical order).
+
+        Parameters
+        ----------
+        doc_name : str
+            Name of the document (pdf-file name without extension).
+
+        Returns
+        -------
+        str or None
+            None if there is no suitable file.
+        """
+        for file_name in self.__get_candidates(doc_name):
+            if self.__is_native(file_name) or self.__is_pdf(file_name):
+                return file_name
+
+        # Если в папке трансмиттела документы размещены в отдельных папках
+        subfolder = os.path.join(self.path, doc_name)
+        if not self.__fs_index.isdir(subfolder):
+            return None
+        for entry in self.__fs_index.scan(subfolder):
+            if entry.is_file and doc_name in entry.name and self.__is_native(entry.name):
+                return entry.name
+        return None
+
+    def has_pdf_in_root(self, doc_name: str):
+        """
+        Checks whether pdf-file of the document is located in the transmittal folder (not in a subfolder).
+        The case of the file name is ignored.
+
+        Parameters
+        ----------
+        doc_name : str
+
+        Returns
+        -------
+        bool
+        """
+        return (doc_name + '.pdf').casefold() in self.__file_set
@@ -0,0 +1,102 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Допуск на размер листа в дюймах
+TOLERANCE = 0.2
+OTHER_FORMAT = 'Other'
+
+
+class PageFormatClassifier:
+    """
+    The class is purposed to classify pages by format (A0, A1, ...) using their sizes.
+    A page matches a format if both sides differ from the format sides by no more than the tolerance
+    in any orientation. If several formats match, the nearest one is chosen (the distance is the largest difference
+    of the sides); if distances are equal, the latest format in the table is chosen.
+    Unknown sizes are classified in one vectorised pass (if NumPy is available), results are memoised by size,
+    because drawing sets repeat the same few sizes many times.
+
+    Attributes
+    ----------
+    tolerance : float
+
+    Methods
+    -------
+    classify(sizes)
+        Gets format of each page.
+    summarize(format_list: list)
+        Gets string of pages formats (e.g. 'A3, A4').
+    """
+    def __init__(self, format_table, tolerance=TOLERANCE):
+        self.tolerance = tolerance
+        self.__names = [name for name, w, h in format_table]
+        self.__sizes = [(float(w), float(h)) for name, w, h in format_table]
+        self.__cache = {}
+
+    def __classify_numpy(self, sizes: list):
+        pages = np.asarray(sizes, dtype=float)
+        table = np.asarray(self.__sizes, dtype=float)
+        w = pages[:, 0:1]
+        h = pages[:, 1:2]
+        # Расстояние до формата в обеих ориентациях
+        portrait = np.maximum(np.abs(w - table[:, 0]), np.abs(h - table[:, 1]))
+        landscape = np.maximum(np.abs(w - table[:, 1]), np.abs(h - table[:, 0]))
+        distance = np.minimum(portrait, landscape)
+        # При равных расстояниях выбирается последний формат, поэтому ищем минимум в обратном порядке
+        last = len(self.__names) - 1
+        nearest = last - np.argmin(distance[:, ::-1], axis=1)
+        matched = distance[np.arange(len(sizes)), nearest] <= self.tolerance
+        return [self.__names[i] if ok else OTHER_FORMAT for i, ok in zip(nearest.tolist(), matched.tolist())]
+
+    def __classify_python(self, sizes: list):
+        formats = []
+        for w, h in sizes:
+            page_format = OTHER_FORMAT
+            best = None
+            for name, (fw, fh) in zip(self.__names, self.__sizes):
+                distance = min(max(abs(w - fw), abs(h - fh)), max(abs(w - fh), abs(h - fw)))
+                if distance <= self.tolerance and (best is None or distance <= best):
+                    page_format = name
+                    best = distance
+            formats.append(page_format)
+        return formats
+
+    def classify(self, sizes):
+        """
+        Gets format of each page.
+
+        Parameters
+        ----------
+        sizes : Iterable
+            Pairs (width, height) of pages in inches.
+
+        Returns
+        -------
+        format_list : list
+            Format name of each page or 'Other'.
+        """
+        sizes = [(float(w), float(h)) for w, h in sizes]
+        unknown = list(set(size for size in sizes if size not in self.__cache))
+        if unknown and self.__sizes:
+            if np is not None:
+                formats = self.__classify_numpy(unknown)
+            else:
+                formats = self.__classify_python(unknown)
+            self.__cache.update(zip(unknown, formats))
+        return [self.__cache.get(size, OTHER_FORMAT) for size in sizes]
+
+    @staticmethod
+    def summarize(format_list: list):
+        """
+        Gets string of pages formats in alphabetical order (e.g. 'A3, A4').
+
+        Parameters
+        ----------
+        format_list : list
+
+        Returns
+        -------
+        str
+        """
+        return ', '.join(sorted(set(format_list)))
@@ -0,0 +1,437 @@
+import atexit
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import sys
+import threading
+
+from doc_name_checker import find_title_names, read_title_text
+from job_journal import get_signature
+from pdf_page_scanner import read_page_boxes
+from revision_date_extractor import RevisionDateExtractor
+
+# Время обработки одного файла, после которого рабочий процесс завершается, с
+TIMEOUT = 120
+# Ограничение памяти рабочего процесса, байт
+MEMORY_LIMIT = 2 * 1024 ** 3
+MAX_WORKERS = 2
+
+# Общие инспекторы процесса по пути к списку карантина
+_shared_inspectors = {}
+_shared_lock = threading.Lock()
+
+
+def _limit_memory(limit: int):
+    """
+    Limits memory of the current process (address space on POSIX, job object on Windows).
+    """
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        return None
+    except ImportError:
+        pass
+    except (ValueError, OSError) as e:
+        print('WARNING: memory limit cannot be set ({})'.format(e), file=sys.stderr)
+        return None
+
+    try:
+        import win32api
+        import win32job
+    except ImportError:
+        return None
+    job = win32job.CreateJobObject(None, '')
+    info = win32job.QueryInformationJobObject(job, win32job.JobObjectExtendedLimitInformation)
+    info['ProcessMemoryLimit'] = limit
+    info['BasicLimitInformation']['LimitFlags'] |= win32job.JOB_OBJECT_LIMIT_PROCESS_MEMORY
+    win32job.SetInformationJobObject(job, win32job.JobObjectExtendedLimitInformation, info)
+    win32job.AssignProcessToJobObject(job, win32api.GetCurrentProcess())
+    # Объект задания должен существовать, пока работает процесс
+    return job
+
+
+def _serve(conn, memory_limit: int):
+    """
+    Worker process loop: gets tasks (task name, path, arguments) from the connection and sends back results
+    (status, value, stdout text, stderr text). The loop ends when None is received.
+    """
+    job = _limit_memory(memory_limit)
+    tasks = {
+        'pages': read_page_boxes,
+        'date': RevisionDateExtractor().extract,
+        'title': read_title_text,
+        'title names': find_title_names
+    }
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        task, path, args = message
+        out = io.StringIO()
+        err = io.StringIO()
+        status = 'ok'
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                value = tasks[task](path, *args)
+        except FileNotFoundError:
+            status, value = 'missing', None
+        except MemoryError:
+            status, value = 'memory', 'memory limit exceeded'
+        except Exception as e:
+            status, value = 'error', '{}: {}'.format(type(e).__name__, e)
+        conn.send((status, value, out.getvalue(), err.getvalue()))
+        if status == 'memory':
+            # После нехватки памяти состояние процесса ненадёжно
+            break
+    conn.close()
+    del job
+
+
+class _Worker:
+    """
+    Persistent worker process with its connection.
+    """
+    def __init__(self, context, memory_limit: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn, memory_limit), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class InspectionSummary:
+    """
+    The class is purposed to keep statistics of pdf-files inspection during one operation.
+
+    Attributes
+    ----------
+    failures : list
+        Pairs (file name, reason) of the files which failed.
+    inspected : int
+        Number of files successfully inspected.
+    skipped : int
+        Number of quarantined files which were skipped.
+    """
+    __slots__ = ('inspected', 'skipped', 'failures')
+
+    def __init__(self):
+        self.inspected = 0
+        self.skipped = 0
+        self.failures = []
+
+    def __str__(self):
+        text = 'PDF inspection: inspected: {}, failed: {}, skipped as quarantined: {}'.format(
+            self.inspected, len(self.failures), self.skipped)
+        return '\n'.join([text] + ['    {}: {}'.format(name, reason) for name, reason in self.failures])
+
+
+class PdfInspector:
+    """
+    The class is purposed to inspect pdf-files (read pages, extract revision date, title page text and names)
+    in separate worker processes, so that a corrupt or huge file cannot hang or exhaust memory of the whole batch.
+    Worker processes are persistent and limited in memory; the worker is killed if the file is processed
+    longer than the timeout. Files which failed are put into the quarantine list and skipped by later runs
+    while they are not changed.
+
+    Attributes
+    ----------
+    max_workers : int
+        Maximum number of worker processes.
+    memory_limit : int
+        Memory limit of the worker process in bytes.
+    quarantine_path : str
+        Path to the quarantine list (JSON).
+    timeout : float
+        Time limit of one file processing in seconds.
+
+    Methods
+    -------
+    close()
+        Stops worker processes.
+    get_revision_date(path: str, summary=None)
+        Extracts date of the last revision and text of the title page.
+    get_title_names(path: str, pattern1: str, pattern2: str, summary=None)
+        Finds document names in the title page.
+    get_title_text(path: str, summary=None)
+        Extracts text of the title page.
+    is_quarantined(path: str)
+        Checks whether the file is in the quarantine list.
+    read_pages(path: str, summary=None)
+        Reads page boxes.
+    """
+    def __init__(self, quarantine_path: str, timeout=TIMEOUT, memory_limit=MEMORY_LIMIT, max_workers=MAX_WORKERS):
+        self.quarantine_path = quarantine_path
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_workers = max_workers
+        self.__context = multiprocessing.get_context('spawn')
+        self.__idle = []
+        self.__lock = threading.Lock()
+        self.__slots = threading.Semaphore(max_workers)
+        self.__quarantine = {}
+        self.__load_quarantine()
+
+    def __load_quarantine(self):
+        try:
+            with open(self.quarantine_path, encoding='utf-8') as f:
+                self.__quarantine = json.load(f)
+        except FileNotFoundError:
+            self.__quarantine = {}
+        except (OSError, ValueError) as e:
+            print('WARNING: quarantine list {} cannot be read ({})'.format(self.quarantine_path, e))
+            self.__quarantine = {}
+
+    def __save_quarantine(self):
+        tmp_path = self.quarantine_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.__quarantine, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.quarantine_path)
+        except OSError as e:
+            print('ERROR: quarantine list cannot be saved ({})'.format(e), file=sys.stderr)
+
+    @staticmethod
+    def __key(path: str):
+        return os.path.normcase(os.path.abspath(path))
+
+    def is_quarantined(self, path: str):
+        """
+        Checks whether the file is in the quarantine list and has not been changed since it failed.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        bool
+        """
+        with self.__lock:
+            entry = self.__quarantine.get(self.__key(path))
+        return entry is not None and entry['signature'] == get_signature([path])[0]
+
+    def __put_in_quarantine(self, path: str, reason: str):
+        with self.__lock:
+            self.__quarantine[self.__key(path)] = {
+                'signature': get_signature([path])[0],
+                'reason': reason,
+                'date': datetime.datetime.now().isoformat(timespec='seconds')
+            }
+            self.__save_quarantine()
+
+    def __run(self, task: str, path: str, summary, args=()):
+        """
+        Runs the task in a worker process.
+
+        Returns
+        -------
+        Result of the task or None if the file is quarantined or failed.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file does not exist.
+        """
+        if summary is None:
+            summary = InspectionSummary()
+        file_name = os.path.split(path)[1]
+        if os.path.exists(path) and self.is_quarantined(path):
+            summary.skipped += 1
+            print('WARNING: {} is quarantined and was skipped'.format(file_name))
+            return None
+
+        with self.__slots:
+            with self.__lock:
+                worker = self.__idle.pop() if self.__idle else None
+            if worker is None:
+                worker = _Worker(self.__context, self.memory_limit)
+
+            try:
+                worker.conn.send((task, path, args))
+                if not worker.conn.poll(self.timeout):
+                    worker.kill()
+                    status, value = 'failed', 'timeout ({} s)'.format(self.timeout)
+                else:
+                    status, value, out, err = worker.conn.recv()
+                    if out:
+                        sys.stdout.write(out)
+                    if err:
+                        sys.stderr.write(err)
+                    if status == 'memory':
+                        worker.kill()
+                    else:
+                        with self.__lock:
+                            self.__idle.append(worker)
+            except (EOFError, OSError):
+                worker.kill()
+                status, value = 'failed', 'worker process crashed (exit code {})'.format(worker.process.exitcode)
+
+        if status == 'missing':
+            raise FileNotFoundError(path)
+        if status == 'ok':
+            summary.inspected += 1
+            return value
+
+        summary.failures.append((file_name, value))
+        print('ERROR: {} cannot be inspected ({}), it was put in quarantine'.format(file_name, value),
+              file=sys.stderr)
+        self.__put_in_quarantine(path, value)
+        return None
+
+    def read_pages(self, path: str, summary=None):
+        """
+        Reads page boxes of pdf-file in a worker process.
+
+        Parameters
+        ----------
+        path : str
+        summary : InspectionSummary, default=None
+            Statistics of the current operation.
+
+        Returns
+        -------
+        pages : list
+            List of PageBox, None if the file failed or is quarantined.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file does not exist.
+        """
+        return self.__run('pages', path, summary)
+
+    def get_revision_date(self, path: str, summary=None):
+        """
+        Extracts date of the last revision from pdf-file in a worker process, together with the title page text
+        (see RevisionDateExtractor.extract).
+
+        Parameters
+        ----------
+        path : str
+        summary : InspectionSummary, default=None
+            Statistics of the current operation.
+
+        Returns
+        -------
+        result : tuple
+            Pair (date in format 'dd.mm.yyyy' or empty string if it was not found, title page text),
+            None if the file failed or is quarantined.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file does not exist.
+        """
+        return self.__run('date', path, summary)
+
+    def get_title_text(self, path: str, summary=None):
+        """
+        Extracts text of the title page of pdf-file in a worker process.
+
+        Parameters
+        ----------
+        path : str
+        summary : InspectionSummary, default=None
+            Statistics of the current operation.
+
+        Returns
+        -------
+        text : str
+            Text of the first page, None if the file failed or is quarantined.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file does not exist.
+        """
+        return self.__run('title', path, summary)
+
+    def get_title_names(self, path: str, pattern1: str, pattern2: str, summary=None):
+        """
+        Finds document names in the title page of pdf-file in a worker process (see find_title_names).
+
+        Parameters
+        ----------
+        path : str
+        pattern1 : str
+            Pattern of full file name.
+        pattern2 : str
+            Pattern of document number.
+        summary : InspectionSummary, default=None
+            Statistics of the current operation.
+
+        Returns
+        -------
+        names : tuple
+            Pair (name matched by pattern1, name matched by pattern2), None if the file failed or is quarantined.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file does not exist.
+        """
+        return self.__run('title names', path, summary, (pattern1, pattern2))
+
+    def close(self):
+        """
+        Stops worker processes.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            workers, self.__idle = self.__idle, []
+        for worker in workers:
+            worker.stop()
+
+
+def get_shared_inspector(quarantine_path: str):
+    """
+    Gets the inspector shared by the whole process for the quarantine list, so that worker processes are not
+    multiplied by every TrmManager or name check. Shared inspectors are closed when the process exits.
+
+    Parameters
+    ----------
+    quarantine_path : str
+        Path to the quarantine list (JSON).
+
+    Returns
+    -------
+    PdfInspector
+    """
+    key = os.path.normcase(os.path.abspath(quarantine_path))
+    with _shared_lock:
+        inspector = _shared_inspectors.get(key)
+        if inspector is None:
+            inspector = PdfInspector(quarantine_path)
+            _shared_inspectors[key] = inspector
+        return inspector
+
+
+@atexit.register
+def _close_shared_inspectors():
+    with _shared_lock:
+        inspectors = list(_shared_inspectors.values())
+    for inspector in inspectors:
+        inspector.close()
@@ -0,0 +1,656 @@
+import mmap
+import os
+import re
+import subprocess
+import sys
+import time
+import zlib
+
+import fitz
+
+WS_RE = re.compile(rb'(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*')
+REF_RE = re.compile(rb'(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])')
+NUMBER_RE = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+NAME_RE = re.compile(rb'/([^\x00\t\n\x0c\r ()<>\[\]{}/%]*)')
+NAME_ESCAPE_RE = re.compile(rb'#([0-9A-Fa-f]{2})')
+OBJ_RE = re.compile(rb'[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj')
+XREF_SUBSECTION_RE = re.compile(rb'[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]*(?=[\r\n])')
+XREF_ENTRY_RE = re.compile(rb'[\x00\t\n\x0c\r ]*(\d{1,10})[\x00\t\n\x0c\r ]+(\d{1,5})[\x00\t\n\x0c\r ]+([nf])')
+STREAM_RE = re.compile(rb'stream\r?\n')
+# startxref ищем в конце файла
+TAIL_SIZE = 4096
+INHERITABLE = ('MediaBox', 'CropBox', 'Rotate')
+
+
+class PdfScanError(Exception):
+    """
+    Raised if the file structure is not supported by PdfPageScanner.
+    """
+
+
+class Ref:
+    """
+    Reference to an indirect object.
+    """
+    __slots__ = ('num', 'gen')
+
+    def __init__(self, num: int, gen: int):
+        self.num = num
+        self.gen = gen
+
+    def __repr__(self):
+        return '{} {} R'.format(self.num, self.gen)
+
+
+class Stream:
+    """
+    Stream object: its dictionary and position of the raw data.
+    """
+    __slots__ = ('dict', 'start', 'end')
+
+    def __init__(self, dict_: dict, start: int, end: int):
+        self.dict = dict_
+        self.start = start
+        self.end = end
+
+
+class PageBox:
+    """
+    The class is purposed to keep page boxes.
+
+    Attributes
+    ----------
+    crop_box : tuple
+        (x0, y0, x1, y1) in points, equal to media_box if the page has no CropBox.
+    media_box : tuple
+        (x0, y0, x1, y1) in points.
+    rotate : int
+        Page rotation in degrees.
+    """
+    __slots__ = ('media_box', 'crop_box', 'rotate')
+
+    def __init__(self, media_box: tuple, crop_box=None, rotate=0):
+        self.media_box = media_box
+        self.crop_box = crop_box or media_box
+        self.rotate = rotate
+
+    @property
+    def width(self):
+        """
+        MediaBox width in points.
+        """
+        return abs(self.media_box[2] - self.media_box[0])
+
+    @property
+    def height(self):
+        """
+        MediaBox height in points.
+        """
+        return abs(self.media_box[3] - self.media_box[1])
+
+    def __repr__(self):
+        return 'PageBox({}, {}, {})'.format(self.media_box, self.crop_box, self.rotate)
+
+
+def _png_unpredict(data: bytes, columns: int, colors: int, bpc: int):
+    """
+    Reverts PNG predictors (used by xref and object streams).
+    """
+    bpp = max(1, colors * bpc // 8)
+    row_len = (columns * colors * bpc + 7) // 8
+    result = bytearray()
+    prev = bytearray(row_len)
+    for i in range(0, len(data), row_len + 1):
+        filter_type = data[i]
+        row = bytearray(data[i + 1:i + 1 + row_len])
+        if filter_type == 1:
+            for j in range(bpp, len(row)):
+                row[j] = (row[j] + row[j - bpp]) & 0xFF
+        elif filter_type == 2:
+            for j in range(len(row)):
+                row[j] = (row[j] + prev[j]) & 0xFF
+        elif filter_type == 3:
+            for j in range(len(row)):
+                left = row[j - bpp] if j >= bpp else 0
+                row[j] = (row[j] + ((left + prev[j]) >> 1)) & 0xFF
+        elif filter_type == 4:
+            for j in range(len(row)):
+                a = row[j - bpp] if j >= bpp else 0
+                b = prev[j]
+                c = prev[j - bpp] if j >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    predictor = a
+                elif pb <= pc:
+                    predictor = b
+                else:
+                    predictor = c
+                row[j] = (row[j] + predictor) & 0xFF
+        elif filter_type != 0:
+            raise PdfScanError('Unknown PNG predictor {}'.format(filter_type))
+        result.extend(row)
+        prev = row
+    return bytes(result)
+
+
+class PdfPageScanner:
+    """
+    The class is purposed to read page boxes of pdf-file without parsing the whole document.
+    The file is memory-mapped; only the cross-reference sections (tables or streams, following /Prev),
+    object streams containing page tree nodes and the page tree itself are parsed.
+    MediaBox, CropBox and Rotate are inherited from parent nodes of the page tree.
+
+    Methods
+    -------
+    close()
+        Closes the file.
+    pages()
+        Gets boxes of all the pages.
+
+    Raises
+    ------
+    PdfScanError
+        If the file structure is not supported (e.g. encrypted object streams or broken cross-reference).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__file = open(path, 'rb')
+        try:
+            self.__buf = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.__file.close()
+            raise PdfScanError('File is empty')
+        self.__xref = {}
+        self.__objects = {}
+        self.__object_streams = {}
+        self.__trailer = {}
+        self.__read_xref()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes the file.
+
+        Returns
+        -------
+        None
+        """
+        self.__buf.close()
+        self.__file.close()
+
+    # Разбор объектов
+
+    def __skip_ws(self, pos: int, buf=None):
+        buf = self.__buf if buf is None else buf
+        return WS_RE.match(buf, pos).end()
+
+    def __parse(self, pos: int, buf=None):
+        """
+        Parses direct object at the position.
+
+        Returns
+        -------
+        obj
+        pos : int
+            Position after the object.
+        """
+        buf = self.__buf if buf is None else buf
+        pos = self.__skip_ws(pos, buf)
+        c = buf[pos:pos + 1]
+
+        if c == b'<':
+            if buf[pos + 1:pos + 2] == b'<':
+                result = {}
+                pos += 2
+                while True:
+                    pos = self.__skip_ws(pos, buf)
+                    if buf[pos:pos + 2] == b'>>':
+                        return result, pos + 2
+                    match = NAME_RE.match(buf, pos)
+                    if match is None:
+                        raise PdfScanError('Dictionary key expected at {}'.format(pos))
+                    key = self.__decode_name(match.group(1))
+                    result[key], pos = self.__parse(match.end(), buf)
+            end = buf.find(b'>', pos)
+            if end < 0:
+                raise PdfScanError('Unterminated hex string at {}'.format(pos))
+            return buf[pos + 1:end], end + 1
+
+        if c == b'[':
+            result = []
+            pos += 1
+            while True:
+                pos = self.__skip_ws(pos, buf)
+                if buf[pos:pos + 1] == b']':
+                    return result, pos + 1
+                item, pos = self.__parse(pos, buf)
+                result.append(item)
+
+        if c == b'/':
+            match = NAME_RE.match(buf, pos)
+            return self.__decode_name(match.group(1)), match.end()
+
+        if c == b'(':
+            depth = 0
+            i = pos
+            while True:
+                ch = buf[i:i + 1]
+                if not ch:
+                    raise PdfScanError('Unterminated string at {}'.format(pos))
+                if ch == b'\\':
+                    i += 2
+                    continue
+                if ch == b'(':
+                    depth += 1
+                elif ch == b')':
+                    depth -= 1
+                    if not depth:
+                        return buf[pos + 1:i], i + 1
+                i += 1
+
+        match = REF_RE.match(buf, pos)
+        if match:
+            return Ref(int(match.group(1)), int(match.group(2))), match.end()
+        match = NUMBER_RE.match(buf, pos)
+        if match:
+            text = match.group()
+            if b'.' in text:
+                return float(text), match.end()
+            return int(text), match.end()
+
+        for keyword, value in ((b'true', True), (b'false', False), (b'null', None)):
+            if buf[pos:pos + len(keyword)] == keyword:
+                return value, pos + len(keyword)
+
+        raise PdfScanError('Unexpected token at {}: {!r}'.format(pos, buf[pos:pos + 16]))
+
+    @staticmethod
+    def __decode_name(raw: bytes):
+        if b'#' in raw:
+            raw = NAME_ESCAPE_RE.sub(lambda m: bytes([int(m.group(1), 16)]), raw)
+        return raw.decode('latin-1')
+
+    def __parse_indirect(self, offset: int):
+        """
+        Parses indirect object at the offset (object or stream).
+        """
+        match = OBJ_RE.match(self.__buf, offset)
+        if match is None:
+            raise PdfScanError('Object expected at {}'.format(offset))
+        obj, pos = self.__parse(match.end())
+        if isinstance(obj, dict):
+            pos = self.__skip_ws(pos)
+            stream_match = STREAM_RE.match(self.__buf, pos)
+            if stream_match:
+                start = stream_match.end()
+                length = obj.get('Length')
+                if isinstance(length, Ref):
+                    length = self.resolve(length)
+                end = start + length if isinstance(length, int) else -1
+                # Длина может быть указана неверно, тогда ищем конец потока
+                if end < 0 or self.__buf[self.__skip_ws(end):self.__skip_ws(end) + 9] != b'endstream':
+                    end = self.__buf.find(b'endstream', start)
+                    if end < 0:
+                        raise PdfScanError('Unterminated stream at {}'.format(start))
+                    while end > start and self.__buf[end - 1:end] in (b'\r', b'\n'):
+                        end -= 1
+                return Stream(obj, start, end)
+        return obj
+
+    def __decode_stream(self, stream: Stream):
+        """
+        Decodes stream data (only FlateDecode with optional PNG predictors is supported).
+        """
+        data = self.__buf[stream.start:stream.end]
+        filters = self.resolve(stream.dict.get('Filter'))
+        params = self.resolve(stream.dict.get('DecodeParms'))
+        if filters is None:
+            return data
+        if not isinstance(filters, list):
+            filters = [filters]
+            params = [params]
+        elif not isinstance(params, list):
+            params = [params] * len(filters)
+
+        for filter_, param in zip(filters, params):
+            if filter_ not in ('FlateDecode', 'Fl'):
+                raise PdfScanError('Unsupported filter {}'.format(filter_))
+            data = zlib.decompress(data)
+            param = self.resolve(param) or {}
+            predictor = param.get('Predictor', 1)
+            if predictor >= 10:
+                data = _png_unpredict(data, param.get('Columns', 1), param.get('Colors', 1),
+                                      param.get('BitsPerComponent', 8))
+            elif predictor != 1:
+                raise PdfScanError('Unsupported predictor {}'.format(predictor))
+        return data
+
+    # Таблица перекрёстных ссылок
+
+    def __find_startxref(self):
+        tail_start = max(0, len(self.__buf) - TAIL_SIZE)
+        pos = self.__buf.rfind(b'startxref', tail_start)
+        if pos < 0:
+            raise PdfScanError('startxref was not found')
+        offset, _ = self.__parse(pos + 9)
+        if not isinstance(offset, int):
+            raise PdfScanError('Invalid startxref')
+        return offset
+
+    def __read_xref(self):
+        offset = self.__find_startxref()
+        visited = set()
+        while offset is not None and offset not in visited:
+            visited.add(offset)
+            if self.__buf[self.__skip_ws(offset):self.__skip_ws(offset) + 4] == b'xref':
+                trailer = self.__read_xref_table(self.__skip_ws(offset) + 4)
+                # Гибридный файл: сжатые объекты описаны в дополнительном потоке
+                xref_stm = trailer.get('XRefStm')
+                if isinstance(xref_stm, int):
+                    self.__read_xref_stream(xref_stm)
+            else:
+                trailer = self.__read_xref_stream(offset)
+            for key, value in trailer.items():
+                self.__trailer.setdefault(key, value)
+            prev = trailer.get('Prev')
+            offset = prev if isinstance(prev, int) else None
+
+        if 'Root' not in self.__trailer:
+            raise PdfScanError('Document catalog was not found')
+        if 'Encrypt' in self.__trailer:
+            # Словари страниц не шифруются, но потоки объектов зашифрованы
+            self.__encrypted = True
+        else:
+            self.__encrypted = False
+
+    def __read_xref_table(self, pos: int):
+        while True:
+            match = XREF_SUBSECTION_RE.match(self.__buf, pos)
+            if match is None:
+                break
+            first, count = int(match.group(1)), int(match.group(2))
+            pos = match.end()
+            for num in range(first, first + count):
+                entry = XREF_ENTRY_RE.match(self.__buf, pos)
+                if entry is None:
+                    raise PdfScanError('Invalid xref entry at {}'.format(pos))
+                pos = entry.end()
+                if entry.group(3) == b'n':
+                    self.__xref.setdefault(num, (1, int(entry.group(1)), int(entry.group(2))))
+
+        pos = self.__skip_ws(pos)
+        if self.__buf[pos:pos + 7] != b'trailer':
+            raise PdfScanError('Trailer was not found at {}'.format(pos))
+        trailer, _ = self.__parse(pos + 7)
+        return trailer
+
+    def __read_xref_stream(self, offset: int):
+        stream = self.__parse_indirect(offset)
+        if not isinstance(stream, Stream) or stream.dict.get('Type') != 'XRef':
+            raise PdfScanError('Xref stream expected at {}'.format(offset))
+        data = self.__decode_stream(stream)
+        widths = stream.dict['W']
+        index = stream.dict.get('Index', [0, stream.dict['Size']])
+        entry_len = sum(widths)
+
+        def field(entry_pos, n):
+            start = entry_pos + sum(widths[:n])
+            value = 0
+            for b in data[start:start + widths[n]]:
+                value = (value << 8) | b
+            return value
+
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for num in range(first, first + count):
+                if pos + entry_len > len(data):
+                    raise PdfScanError('Xref stream is too short')
+                type_ = field(pos, 0) if widths[0] else 1
+                if type_ == 1:
+                    self.__xref.setdefault(num, (1, field(pos, 1), field(pos, 2)))
+                elif type_ == 2:
+                    self.__xref.setdefault(num, (2, field(pos, 1), field(pos, 2)))
+                pos += entry_len
+        return stream.dict
+
+    # Косвенные объекты
+
+    def __get_object_stream(self, num: int):
+        if num not in self.__object_streams:
+            if self.__encrypted:
+                raise PdfScanError('Encrypted object streams are not supported')
+            stream = self.__get_object(num)
+            if not isinstance(stream, Stream):
+                raise PdfScanError('Object stream {} was not found'.format(num))
+            data = self.__decode_stream(stream)
+            first = self.resolve(stream.dict['First'])
+            count = self.resolve(stream.dict['N'])
+            header = data[:first].split()
+            offsets = {int(header[2 * i]): first + int(header[2 * i + 1]) for i in range(count)}
+            self.__object_streams[num] = (data, offsets)
+        return self.__object_streams[num]
+
+    def __get_object(self, num: int):
+        if num in self.__objects:
+            return self.__objects[num]
+        entry = self.__xref.get(num)
+        if entry is None:
+            obj = None
+        elif entry[0] == 1:
+            obj = self.__parse_indirect(entry[1])
+        else:
+            data, offsets = self.__get_object_stream(entry[1])
+            if num not in offsets:
+                raise PdfScanError('Object {} is not in its object stream'.format(num))
+            obj, _ = self.__parse(offsets[num], data)
+        self.__objects[num] = obj
+        return obj
+
+    def resolve(self, obj):
+        """
+        Resolves the reference to an indirect object (other objects are returned as is).
+
+        Parameters
+        ----------
+        obj
+
+        Returns
+        -------
+        Resolved object (dictionary of the stream for stream objects).
+        """
+        depth = 0
+        while isinstance(obj, Ref):
+            obj = self.__get_object(obj.num)
+            depth += 1
+            if depth > 32:
+                raise PdfScanError('Reference loop')
+        if isinstance(obj, Stream):
+            return obj.dict
+        return obj
+
+    def __resolve_box(self, box):
+        box = self.resolve(box)
+        if not isinstance(box, list) or len(box) != 4:
+            return None
+        return tuple(float(self.resolve(value)) for value in box)
+
+    def pages(self):
+        """
+        Gets boxes of all the pages in the order of the page tree.
+
+        Returns
+        -------
+        list
+            List of PageBox.
+        """
+        catalog = self.resolve(self.__trailer['Root'])
+        root = catalog.get('Pages') if isinstance(catalog, dict) else None
+        if root is None:
+            raise PdfScanError('Page tree was not found')
+
+        pages = []
+        visited = set()
+        stack = [(root, {})]
+        while stack:
+            node_ref, inherited = stack.pop()
+            if isinstance(node_ref, Ref):
+                if node_ref.num in visited:
+                    raise PdfScanError('Page tree loop')
+                visited.add(node_ref.num)
+            node = self.resolve(node_ref)
+            if not isinstance(node, dict):
+                raise PdfScanError('Invalid page tree node')
+
+            attrs = dict(inherited)
+            for key in INHERITABLE:
+                if key in node:
+                    attrs[key] = node[key]
+
+            kids = self.resolve(node.get('Kids'))
+            if node.get('Type') == 'Pages' or (kids is not None and node.get('Type') != 'Page'):
+                for kid in reversed(kids or []):
+                    stack.append((kid, attrs))
+                continue
+
+            media_box = self.__resolve_box(attrs.get('MediaBox'))
+            if media_box is None:
+                raise PdfScanError('Page has no MediaBox')
+            crop_box = self.__resolve_box(attrs.get('CropBox'))
+            rotate = int(self.resolve(attrs.get('Rotate', 0)) or 0) % 360
+            pages.append(PageBox(media_box, crop_box, rotate))
+        return pages
+
+
+def read_pages_with_fitz(path: str):
+    """
+    Reads boxes of all the pages with PyMuPDF.
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    list
+        List of PageBox.
+    """
+    pages = []
+    with fitz.open(path) as f:
+        for page_number in range(f.pageCount):
+            page = f.loadPage(page_number)
+            media_box = page.MediaBox
+            crop_box = page.CropBox
+            pages.append(PageBox((media_box.x0, media_box.y0, media_box.x1, media_box.y1),
+                                 (crop_box.x0, crop_box.y0, crop_box.x1, crop_box.y1), page.rotation))
+    return pages
+
+
+def read_page_boxes(path: str):
+    """
+    Reads boxes of all the pages: with PdfPageScanner, with PyMuPDF if the file structure is not supported.
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    list
+        List of PageBox.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist.
+    """
+    try:
+        with PdfPageScanner(path) as scanner:
+            return scanner.pages()
+    except (PdfScanError, ValueError, KeyError, IndexError, TypeError, AttributeError, zlib.error):
+        return read_pages_with_fitz(path)
+
+
+def _get_peak_rss():
+    """
+    Gets peak resident set size of the current process in MB (None if it is unknown).
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # В macOS размер в байтах, в Linux - в килобайтах
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 ** 2
+        except (ImportError, AttributeError):
+            return None
+
+
+def _run_method(method: str, paths: list):
+    """
+    Reads page sizes of the files with the method and prints statistics (used in a separate process).
+    """
+    start = time.perf_counter()
+    page_count = 0
+    for path in paths:
+        if method == 'scanner':
+            with PdfPageScanner(path) as scanner:
+                pages = scanner.pages()
+            page_count += len(pages)
+        elif method == 'fitz':
+            page_count += len(read_pages_with_fitz(path))
+        elif method == 'pypdf2':
+            from PyPDF2 import PdfFileReader
+            pdf = PdfFileReader(path, strict=False)
+            for i in range(pdf.getNumPages()):
+                pdf.getPage(i).mediaBox.getWidth()
+                page_count += 1
+    elapsed = time.perf_counter() - start
+    print('{}\t{}\t{:.3f}\t{}'.format(method, page_count, elapsed, _get_peak_rss()))
+
+
+def benchmark(paths: list):
+    """
+    Compares reading of page sizes with PdfPageScanner, PyMuPDF and PyPDF2: throughput and peak memory.
+    Each method is run in a separate process to measure its memory usage.
+
+    Parameters
+    ----------
+    paths : list
+        Paths to pdf-files.
+
+    Returns
+    -------
+    None
+    """
+    mb = 1024 ** 2
+    total_size = sum(os.path.getsize(path) for path in paths)
+    print('{} files, {:.1f} MB'.format(len(paths), total_size / mb))
+    print('{:<8} {:>8} {:>10} {:>12} {:>12}'.format('method', 'pages', 'time, s', 'MB/s', 'peak RSS, MB'))
+    for method in ('scanner', 'fitz', 'pypdf2'):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), '--method', method] + paths,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if result.returncode:
+            print('{:<8} failed: {}'.format(method, result.stderr.strip().splitlines()[-1:]))
+            continue
+        _, page_count, elapsed, rss = result.stdout.strip().splitlines()[-1].split('\t')
+        elapsed = float(elapsed)
+        rate = total_size / mb / elapsed if elapsed else 0
+        print('{:<8} {:>8} {:>10.3f} {:>12.1f} {:>12}'.format(method, page_count, elapsed, rate, rss))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--method':
+        _run_method(sys.argv[2], sys.argv[3:])
+    elif len(sys.argv) > 1:
+        benchmark(sys.argv[1:])
+    else:
+        print('Usage: python pdf_page_scanner.py <pdf-file> [<pdf-file> ...]', file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,151 @@
+import os
+import sys
+
+import fitz
+
+# Число страниц, после которого пакет сохраняется и переоткрывается для освобождения памяти
+CHUNK_PAGES = 200
+
+
+class _Bundle:
+    """
+    Print bundle of one format.
+    """
+    def __init__(self, path: str, chunk_pages: int):
+        self.path = path
+        self.chunk_pages = chunk_pages
+        self.toc = []
+        self.page_count = 0
+        self.__doc = None
+        self.__unsaved = 0
+
+    def add_pages(self, src, from_page: int, to_page: int):
+        if self.__doc is None:
+            self.__doc = fitz.open()
+            self.__doc.insertPDF(src, from_page=from_page, to_page=to_page)
+            # Дальнейшие страницы дописываются инкрементальным сохранением
+            self.__doc.save(self.path)
+            self.__doc.close()
+            self.__doc = fitz.open(self.path)
+        else:
+            self.__doc.insertPDF(src, from_page=from_page, to_page=to_page)
+            self.__unsaved += to_page - from_page + 1
+        self.page_count += to_page - from_page + 1
+        if self.__unsaved >= self.chunk_pages:
+            self.flush()
+
+    def add_bookmark(self, title: str):
+        self.toc.append([1, title, self.page_count + 1])
+
+    def flush(self):
+        if self.__doc is not None and self.__unsaved:
+            self.__doc.saveIncr()
+            self.__doc.close()
+            self.__doc = fitz.open(self.path)
+            self.__unsaved = 0
+
+    def close(self):
+        if self.__doc is None:
+            return
+        self.__doc.setToC(self.toc)
+        self.__doc.saveIncr()
+        self.__doc.close()
+        self.__doc = None
+
+
+class PrintBundler:
+    """
+    The class is purposed to merge pages of documents for printing into one pdf-file per format
+    (A4.pdf, A3.pdf, ..., Other.pdf), so that each bundle is printed without changing paper.
+    Pages keep the order of documents and each document gets a bookmark in each bundle containing its pages.
+    Only one source document is open at a time and bundles are saved incrementally every chunk_pages pages,
+    so memory usage does not depend on the total number of pages.
+
+    Attributes
+    ----------
+    chunk_pages : int
+        Number of pages after which the bundle is saved and reopened.
+    target_dir : str
+        Path to a folder where bundles are created.
+
+    Methods
+    -------
+    add_document(path: str, title: str, format_list: list)
+        Adds pages of the document to bundles of their formats.
+    close()
+        Completes all the bundles.
+    """
+    def __init__(self, target_dir: str, chunk_pages=CHUNK_PAGES):
+        self.target_dir = target_dir
+        self.chunk_pages = chunk_pages
+        self.__bundles = {}
+
+    def __get_bundle(self, page_format: str):
+        if page_format not in self.__bundles:
+            path = os.path.join(self.target_dir, page_format + '.pdf')
+            if os.path.exists(path):
+                os.remove(path)
+            self.__bundles[page_format] = _Bundle(path, self.chunk_pages)
+        return self.__bundles[page_format]
+
+    def add_document(self, path: str, title: str, format_list: list):
+        """
+        Adds pages of the document to bundles of their formats.
+
+        Parameters
+        ----------
+        path : str
+            Path to pdf-file.
+        title : str
+            Bookmark title.
+        format_list : list
+            Format of each page.
+
+        Returns
+        -------
+        page_count : int
+            Number of pages added.
+        """
+        file_name = os.path.split(path)[1]
+        try:
+            src = fitz.open(path)
+        except RuntimeError as e:
+            print('ERROR: {} cannot be added to print bundles ({})'.format(file_name, e), file=sys.stderr)
+            return 0
+
+        with src:
+            if src.pageCount != len(format_list):
+                print('WARNING: {} has {} pages, formats are known for {}'.format(
+                    file_name, src.pageCount, len(format_list)))
+            page_count = min(src.pageCount, len(format_list))
+
+            bookmarked = set()
+            start = 0
+            while start < page_count:
+                # Непрерывный диапазон страниц одного формата вставляется за один раз
+                page_format = format_list[start]
+                end = start
+                while end + 1 < page_count and format_list[end + 1] == page_format:
+                    end += 1
+                bundle = self.__get_bundle(page_format)
+                if page_format not in bookmarked:
+                    bundle.add_bookmark(title)
+                    bookmarked.add(page_format)
+                bundle.add_pages(src, start, end)
+                start = end + 1
+        return page_count
+
+    def close(self):
+        """
+        Completes all the bundles: writes bookmarks and saves them.
+
+        Returns
+        -------
+        page_counts : dict
+            Number of pages in the bundle of each format.
+        """
+        page_counts = {}
+        for page_format, bundle in self.__bundles.items():
+            bundle.close()
+            page_counts[page_format] = bundle.page_count
+        return page_counts
@@ -0,0 +1,335 @@
+import contextlib
+import sys
+import threading
+import time
+
+
+class ProgressEvent:
+    """
+    The class is purposed to keep a snapshot of a processing stage state passed to progress renderers.
+
+    Attributes
+    ----------
+    bytes_done : int
+        Number of bytes processed.
+    bytes_total : int
+        Total number of bytes to be processed (0 if stage is not byte-aware).
+    done : int
+        Number of processed items.
+    elapsed : float
+        Seconds since the stage start.
+    eta : float or None
+        Estimated seconds to the stage end, None if it cannot be estimated yet.
+    finished : bool
+        Whether the stage is finished or not.
+    stage : str
+        Name of the stage.
+    total : int
+        Total number of items.
+    """
+    __slots__ = ('stage', 'done', 'total', 'bytes_done', 'bytes_total', 'elapsed', 'eta', 'finished')
+
+    def __init__(self, stage: str, done: int, total: int, bytes_done: int, bytes_total: int, elapsed: float,
+                 eta, finished: bool):
+        self.stage = stage
+        self.done = done
+        self.total = total
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.elapsed = elapsed
+        self.eta = eta
+        self.finished = finished
+
+    @property
+    def fraction(self):
+        """
+        Completed part of the stage in range [0, 1].
+
+        Returns
+        -------
+        float
+        """
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        if self.total:
+            return min(self.done / self.total, 1.0)
+        return 1.0 if self.finished else 0.0
+
+    @property
+    def rate(self):
+        """
+        Processing speed in bytes per second (items per second if the stage is not byte-aware).
+
+        Returns
+        -------
+        float
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        if self.bytes_total:
+            return self.bytes_done / self.elapsed
+        return self.done / self.elapsed
+
+
+class ProgressStage:
+    """
+    The class is purposed to count progress of one processing stage and to pass throttled events to the reporter.
+
+    Attributes
+    ----------
+    bytes_done : int
+    bytes_total : int
+    done : int
+    name : str
+    total : int
+
+    Methods
+    -------
+    advance(step=1, bytes_=0)
+        Increases counters and reports progress if throttling interval has passed.
+    finish()
+        Marks the stage as finished and reports it.
+    """
+    def __init__(self, reporter, name: str, total: int, bytes_total=0):
+        self.name = name
+        self.total = total
+        self.bytes_total = bytes_total
+        self.done = 0
+        self.bytes_done = 0
+
+        self.__reporter = reporter
+        self.__lock = threading.Lock()
+        self.__start = time.monotonic()
+        self.__next_emit = self.__start
+        self.__finished = False
+
+        self.__emit(self.__start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.finish()
+
+    def __snapshot(self, now: float):
+        elapsed = now - self.__start
+        if self.bytes_total and self.bytes_done:
+            eta = elapsed * (self.bytes_total - self.bytes_done) / self.bytes_done
+        elif self.total and self.done:
+            eta = elapsed * (self.total - self.done) / self.done
+        else:
+            eta = None
+        if eta is not None:
+            eta = max(eta, 0.0)
+        return ProgressEvent(self.name, self.done, self.total, self.bytes_done, self.bytes_total, elapsed, eta,
+                             self.__finished)
+
+    def __emit(self, now: float):
+        self.__next_emit = now + self.__reporter.interval
+        self.__reporter.report(self.__snapshot(now))
+
+    def advance(self, step=1, bytes_=0):
+        """
+        Increases counters and reports progress if throttling interval has passed.
+        The stage is finished automatically when all items are done.
+
+        Parameters
+        ----------
+        step : int, default=1
+            Number of processed items.
+        bytes_ : int, default=0
+            Number of processed bytes.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            if self.__finished:
+                return
+            self.done += step
+            self.bytes_done += bytes_
+            if self.total and self.done >= self.total:
+                self.__finished = True
+                self.__emit(time.monotonic())
+                return
+            now = time.monotonic()
+            if now >= self.__next_emit:
+                self.__emit(now)
+
+    def finish(self):
+        """
+        Marks the stage as finished and reports it.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            if self.__finished:
+                return
+            self.__finished = True
+            self.__emit(time.monotonic())
+
+
+class ProgressReporter:
+    """
+    The class is purposed for structured reporting of processing progress.
+    Workers open stages and advance them, renderers display throttled progress events.
+
+    Attributes
+    ----------
+    interval : float
+        Minimum interval between two events of the same stage in seconds.
+    renderers : list
+        Objects with method render(event: ProgressEvent).
+
+    Methods
+    -------
+    report(event: ProgressEvent)
+        Passes the event to all renderers.
+    scope(name)
+        Prefixes names of stages created by the current thread.
+    stage(name: str, total: int, bytes_total=0)
+        Creates new progress stage.
+    """
+    def __init__(self, renderers=None, max_rate=10.0):
+        if renderers is None:
+            renderers = [ConsoleProgressRenderer()]
+        self.renderers = list(renderers)
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.__local = threading.local()
+
+    @contextlib.contextmanager
+    def scope(self, name):
+        """
+        Prefixes names of stages created by the current thread within the context, so that stages of jobs
+        running in parallel (e.g. processing different transmittals) are displayed separately.
+
+        Parameters
+        ----------
+        name : str or None
+            Prefix of stage names, e.g. name of the transmittal (stage names are not changed if None).
+
+        Returns
+        -------
+        context manager
+        """
+        prev = getattr(self.__local, 'scope', None)
+        self.__local.scope = name
+        try:
+            yield
+        finally:
+            self.__local.scope = prev
+
+    def stage(self, name: str, total: int, bytes_total=0):
+        """
+        Creates new progress stage.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage to be displayed.
+        total : int
+            Number of items to be processed.
+        bytes_total : int, default=0
+            Number of bytes to be processed, if the stage is byte-aware.
+
+        Returns
+        -------
+        ProgressStage
+        """
+        scope = getattr(self.__local, 'scope', None)
+        if scope:
+            name = '{}: {}'.format(scope, name)
+        return ProgressStage(self, name, total, bytes_total)
+
+    def report(self, event: ProgressEvent):
+        """
+        Passes the event to all renderers.
+
+        Parameters
+        ----------
+        event : ProgressEvent
+
+        Returns
+        -------
+        None
+        """
+        for renderer in self.renderers:
+            try:
+                renderer.render(event)
+            except Exception as e:
+                print('ERROR: progress renderer failed: {}'.format(e), file=sys.stderr)
+
+
+def format_eta(seconds) -> str:
+    """
+    Formats estimated time as 'hh:mm:ss'.
+
+    Parameters
+    ----------
+    seconds : float or None
+
+    Returns
+    -------
+    str
+    """
+    if seconds is None:
+        return '--:--:--'
+    seconds = int(round(seconds))
+    return '{:02d}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+class ConsoleProgressRenderer:
+    """
+    The class is purposed for output progress events to console as a text progress bar.
+
+    Attributes
+    ----------
+    fill : str, default='█'
+        A symbol to fill the progress bar.
+    length : int, default=50
+        Number of symbols in the progress bar.
+    stream : file-like, default=sys.stdout
+        Output stream.
+
+    Methods
+    -------
+    render(event: ProgressEvent)
+        Prints the progress bar line.
+    """
+    def __init__(self, length=50, fill='█', stream=None):
+        self.length = length
+        self.fill = fill
+        self.stream = stream
+
+    def render(self, event: ProgressEvent):
+        """
+        Prints the progress bar line.
+
+        Parameters
+        ----------
+        event : ProgressEvent
+
+        Returns
+        -------
+        None
+        """
+        stream = self.stream if self.stream is not None else sys.stdout
+        fraction = event.fraction
+        filled_length = int(self.length * fraction)
+        bar = self.fill * filled_length + '-' * (self.length - filled_length)
+        text = '{} |{}| {:.1f}% ({}/{})'.format(event.stage, bar, 100 * fraction, event.done, event.total)
+        if event.bytes_total:
+            text += ' {:.1f} MB/s'.format(event.rate / 1024 ** 2)
+        if event.finished:
+            text += ' Complete in {}'.format(format_eta(event.elapsed))
+        else:
+            text += ' ETA {}'.format(format_eta(event.eta))
+
+        is_tty = getattr(stream, 'isatty', lambda: False)()
+        if is_tty:
+            print('\r' + text, end='\n' if event.finished else '', file=stream, flush=True)
+        else:
+            print(text, file=stream)
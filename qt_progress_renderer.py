@@ -0,0 +1,25 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from progress_reporter import ProgressEvent
+
+
+class QtProgressRenderer(QObject):
+    """
+    The class is purposed for redirect progress events from working threads to GUI thread.
+    Progress events are emitted as signal, so the connected slot can drive GUI progress bars safely.
+
+    Attributes
+    ----------
+    emit_progress
+        Signal to be connected to some progress display.
+
+    Methods
+    -------
+    render(event: ProgressEvent)
+        Emits progress event.
+    """
+
+    emit_progress = pyqtSignal(object)
+
+    def render(self, event: ProgressEvent):
+        self.emit_progress.emit(event)
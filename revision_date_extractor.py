@@ -0,0 +1,188 @@
+import datetime
+import os
+import re
+import sys
+
+import fitz
+
+from file_cache import FileCache
+
+DATE_RU_RE = re.compile(r'(\d\d)\.(\d\d)\.(\d{4})')
+DATE_EN_RE = re.compile(r'(\d\d)-(\w{3})-(\d{4})')
+# Ключевые слова таблицы ревизий и штампа
+REVISION_RE = re.compile(r'rev|date|issue|ревиз|редакц|дата|выпуск|изм', re.IGNORECASE)
+MONTH_DICT = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+# Верхняя граница области штампа (доля высоты страницы)
+TITLE_BLOCK_TOP = 0.5
+
+
+def parse_dates(text: str):
+    """
+    Parses dates from the text. Dates in RU format (dd.mm.yyyy) have priority over EN format (dd-Mon-yyyy).
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    date_list : list
+        List of datetime.date.
+    """
+    date_list = []
+    for day, month, year in DATE_RU_RE.findall(text):
+        try:
+            date_list.append(datetime.date(int(year), int(month), int(day)))
+        except ValueError:
+            pass
+    if date_list:
+        return date_list
+
+    for day, month, year in DATE_EN_RE.findall(text):
+        month = MONTH_DICT.get(month.lower())
+        if month is None:
+            continue
+        try:
+            date_list.append(datetime.date(int(year), month, int(day)))
+        except ValueError:
+            pass
+    return date_list
+
+
+class RevisionDateExtractor:
+    """
+    The class is purposed for getting date of the last revision from pdf-file.
+    Only the title block region (with the revision table) is extracted at first, the whole page is extracted
+    if no date was found there. The second page is read only if the first one has no dates.
+    Results are cached by file size and modification time.
+
+    Methods
+    -------
+    extract(file_path: str)
+        Extracts date of the last revision and text of the first page.
+    get_date(file_path: str, extract=None)
+        Gets date of the last revision in format 'dd.mm.yyyy'.
+    save_cache()
+        Backing up the cache.
+    """
+    def __init__(self, cache_path=None):
+        self.__cache = FileCache(cache_path) if cache_path else None
+
+    @staticmethod
+    def __get_page_dates(page, full_text=False):
+        """
+        Parses dates from the page: only the title block region is extracted at first; if it has no dates,
+        the whole page is extracted and revision table blocks are parsed before the rest of the text.
+
+        Parameters
+        ----------
+        page : fitz.Page
+        full_text : bool, default=False
+            Whether text of the whole page is needed even if the date was found in the title block region.
+
+        Returns
+        -------
+        date_list : list
+        text : str
+            Text of the whole page (empty string if it was not extracted).
+        """
+        rect = page.rect
+        clip = fitz.Rect(rect.x0, rect.y0 + rect.height * TITLE_BLOCK_TOP, rect.x1, rect.y1)
+        try:
+            date_list = parse_dates('\n'.join(block[4] for block in page.getText('blocks', clip=clip)))
+            if date_list:
+                return date_list, page.getText('text') if full_text else ''
+        except TypeError:
+            # Старые версии PyMuPDF не поддерживают извлечение текста из области
+            pass
+
+        blocks = page.getText('blocks')
+        text = '\n'.join(block[4] for block in blocks)
+        region_text = '\n'.join(block[4] for block in blocks if REVISION_RE.search(block[4]))
+        date_list = parse_dates(region_text)
+        if date_list:
+            return date_list, text
+        return parse_dates(text), text
+
+    def extract(self, file_path: str):
+        """
+        Extracts date of the last revision and text of the first page (e.g. for the search index),
+        without the cache.
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the target file.
+
+        Returns
+        -------
+        date : str
+            Date of last revision in format 'dd.mm.yyyy' or empty string if it was not found.
+        title_text : str
+            Text of the whole first page.
+        """
+        file_name = os.path.split(file_path)[-1]
+        title_text = ''
+        with fitz.open(file_path) as f:
+            for page_number in range(min(2, f.pageCount)):
+                try:
+                    page = f.loadPage(page_number)
+                    date_list, text = self.__get_page_dates(page, page_number == 0)
+                except Exception:
+                    if page_number == 0:
+                        print('ERROR: {} is empty!'.format(file_name), file=sys.stderr)
+                        return '', title_text
+                    continue
+                if page_number == 0:
+                    title_text = text
+                if date_list:
+                    return max(date_list).strftime('%d.%m.%Y'), title_text
+            if f.pageCount == 0:
+                print('ERROR: {} is empty!'.format(file_name), file=sys.stderr)
+                return '', title_text
+
+        print('WARNING: {} has no date in first two pages!'.format(file_name))
+        return '', title_text
+
+    def get_date(self, file_path: str, extract=None):
+        """
+        Gets date of the last revision in format 'dd.mm.yyyy'.
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the target file.
+        extract : callable, default=None
+            Function extracting the date if it is not cached (e.g. in a separate process); it returns None
+            if the date cannot be extracted. The file is parsed in the current process if extract is None.
+
+        Returns
+        -------
+        date : str
+            Date of last revision or empty string if it was not found.
+        """
+        if self.__cache:
+            date_ = self.__cache.get(file_path)
+            if date_ is not None:
+                return date_
+
+        date_ = extract(file_path) if extract else self.extract(file_path)[0]
+        if date_ is None:
+            return ''
+        if self.__cache:
+            self.__cache.set(file_path, date_)
+        return date_
+
+    def save_cache(self):
+        """
+        Backing up the cache.
+
+        Returns
+        -------
+        None
+        """
+        if self.__cache:
+            self.__cache.save()
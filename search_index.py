@@ -0,0 +1,364 @@
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import config
+
+TOKEN_RE = re.compile(r'\w+')
+# Число параметров одного запроса при обновлении документов по списку номеров
+NUMBERS_CHUNK = 500
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    doc_name TEXT,
+    number TEXT,
+    trm TEXT,
+    title_text TEXT,
+    size INTEGER,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS documents_number ON documents (number);
+CREATE INDEX IF NOT EXISTS documents_trm ON documents (trm);
+CREATE TABLE IF NOT EXISTS names (
+    number TEXT PRIMARY KEY,
+    name_ru TEXT,
+    name_en TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    doc_name, number, trm, name_ru, name_en, title_text, tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _get_stat(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_query(text: str):
+    """
+    Builds FTS5 query from user text: all the words are required, each word matches as a prefix.
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    str
+    """
+    return ' '.join('"{}"*'.format(token) for token in TOKEN_RE.findall(text))
+
+
+class SearchResult:
+    """
+    The class is purposed to keep a document found in the search index.
+
+    Attributes
+    ----------
+    doc_name : str
+        Name of the document file without extension.
+    name_en : str
+        Document name in English (from VDR).
+    name_ru : str
+        Document name in Russian (from VDR).
+    number : str
+        Document number.
+    path : str
+        Path to the document file.
+    snippet : str
+        Matched text fragment with the matched words in square brackets.
+    trm : str
+        Name of the transmittal containing the document.
+    """
+    __slots__ = ('doc_name', 'number', 'trm', 'path', 'name_ru', 'name_en', 'snippet')
+
+    def __init__(self, doc_name, number, trm, path, name_ru, name_en, snippet):
+        self.doc_name = doc_name
+        self.number = number
+        self.trm = trm
+        self.path = path
+        self.name_ru = name_ru
+        self.name_en = name_en
+        self.snippet = snippet
+
+    def __str__(self):
+        names = ' / '.join(name for name in (self.name_ru, self.name_en) if name)
+        return '{}\t{}\t{}\n    {}'.format(self.trm, self.doc_name, names, ' '.join(self.snippet.split()))
+
+
+class SearchIndex:
+    """
+    The class is purposed to search documents by title page text, VDR names, number and transmittal.
+    The index is kept in SQLite database with FTS5 full-text table. It is updated incrementally: a document
+    is indexed again only if its file has been changed, VDR names are read again only if VDR has been changed.
+
+    Attributes
+    ----------
+    path : str
+        Path to the database file.
+
+    Methods
+    -------
+    close()
+        Closes the database.
+    commit()
+        Saves changes.
+    get_trms()
+        Gets names of transmittals having indexed documents.
+    is_current(path: str)
+        Checks whether the document file is indexed and has not been changed.
+    is_source_current(path: str)
+        Checks whether names from VDR file are indexed and the file has not been changed.
+    remove_other_documents(trm: str, paths)
+        Removes documents of the transmittal which are not in the list.
+    search(text: str, limit=50)
+        Finds documents.
+    update_document(path: str, doc_name: str, trm: str, number: str, title_text: str)
+        Adds or updates the document.
+    update_names(source_path: str, names)
+        Updates documents names read from VDR file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(path, check_same_thread=False)
+        self.__conn.execute('PRAGMA journal_mode=WAL')
+        self.__conn.executescript(SCHEMA)
+        self.__conn.commit()
+
+    def __refresh(self, where: str, params=()):
+        """
+        Rebuilds full-text rows of documents selected by the condition.
+        """
+        ids = [row[0] for row in self.__conn.execute('SELECT id FROM documents d WHERE ' + where, params)]
+        self.__conn.executemany('DELETE FROM documents_fts WHERE rowid = ?', [(id_,) for id_ in ids])
+        self.__conn.execute(
+            'INSERT INTO documents_fts (rowid, doc_name, number, trm, name_ru, name_en, title_text) '
+            'SELECT d.id, d.doc_name, d.number, d.trm, n.name_ru, n.name_en, d.title_text '
+            'FROM documents d LEFT JOIN names n ON n.number = d.number WHERE ' + where, params
+        )
+
+    def get_trms(self):
+        """
+        Gets names of transmittals having indexed documents.
+
+        Returns
+        -------
+        set
+        """
+        with self.__lock:
+            return {row[0] for row in self.__conn.execute('SELECT DISTINCT trm FROM documents')}
+
+    def is_current(self, path: str):
+        """
+        Checks whether the document file is indexed and has not been changed since then.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        bool
+        """
+        with self.__lock:
+            row = self.__conn.execute('SELECT size, mtime_ns FROM documents WHERE path = ?',
+                                      (os.path.abspath(path),)).fetchone()
+        return row is not None and tuple(row) == _get_stat(path)
+
+    def is_source_current(self, path: str):
+        """
+        Checks whether names from VDR file are indexed and the file has not been changed since then.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        bool
+        """
+        with self.__lock:
+            row = self.__conn.execute('SELECT size, mtime_ns FROM sources WHERE path = ?',
+                                      (os.path.abspath(path),)).fetchone()
+        return row is not None and tuple(row) == _get_stat(path)
+
+    def update_document(self, path: str, doc_name: str, trm: str, number: str, title_text: str):
+        """
+        Adds or updates the document.
+
+        Parameters
+        ----------
+        path : str
+            Path to the document file.
+        doc_name : str
+            Name of the document file without extension.
+        trm : str
+            Name of the transmittal.
+        number : str
+            Document number as in VDR.
+        title_text : str
+            Text of the title page.
+
+        Returns
+        -------
+        None
+        """
+        path = os.path.abspath(path)
+        size, mtime_ns = _get_stat(path) or (None, None)
+        with self.__lock:
+            self.__conn.execute(
+                'INSERT INTO documents (path, doc_name, number, trm, title_text, size, mtime_ns) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET doc_name = excluded.doc_name, '
+                'number = excluded.number, trm = excluded.trm, title_text = excluded.title_text, '
+                'size = excluded.size, mtime_ns = excluded.mtime_ns',
+                (path, doc_name, number, trm, title_text, size, mtime_ns)
+            )
+            self.__refresh('d.path = ?', (path,))
+
+    def remove_other_documents(self, trm: str, paths):
+        """
+        Removes documents of the transmittal which are not in the list (e.g. renamed or deleted files).
+
+        Parameters
+        ----------
+        trm : str
+            Name of the transmittal.
+        paths : Iterable
+            Paths to current documents of the transmittal.
+
+        Returns
+        -------
+        count : int
+            Number of removed documents.
+        """
+        paths = {os.path.abspath(path) for path in paths}
+        with self.__lock:
+            ids = [id_ for id_, path in self.__conn.execute('SELECT id, path FROM documents WHERE trm = ?', (trm,))
+                   if path not in paths]
+            self.__conn.executemany('DELETE FROM documents_fts WHERE rowid = ?', [(id_,) for id_ in ids])
+            self.__conn.executemany('DELETE FROM documents WHERE id = ?', [(id_,) for id_ in ids])
+        return len(ids)
+
+    def update_names(self, source_path: str, names):
+        """
+        Updates documents names read from VDR file. Only documents whose names have been changed are indexed again.
+
+        Parameters
+        ----------
+        source_path : str
+            Path to VDR file.
+        names : Iterable
+            Triples (document number, name in Russian, name in English).
+
+        Returns
+        -------
+        count : int
+            Number of changed names.
+        """
+        source_path = os.path.abspath(source_path)
+        size, mtime_ns = _get_stat(source_path) or (None, None)
+        with self.__lock:
+            current = {number: (name_ru, name_en)
+                       for number, name_ru, name_en in self.__conn.execute('SELECT * FROM names')}
+            changed = {number: (number, name_ru, name_en) for number, name_ru, name_en in names
+                       if current.get(number) != (name_ru, name_en)}
+            self.__conn.executemany(
+                'INSERT INTO names (number, name_ru, name_en) VALUES (?, ?, ?) ON CONFLICT (number) DO UPDATE SET '
+                'name_ru = excluded.name_ru, name_en = excluded.name_en',
+                changed.values()
+            )
+            self.__conn.execute(
+                'INSERT OR REPLACE INTO sources (path, size, mtime_ns) VALUES (?, ?, ?)',
+                (source_path, size, mtime_ns)
+            )
+            numbers = list(changed)
+            for i in range(0, len(numbers), NUMBERS_CHUNK):
+                chunk = numbers[i:i + NUMBERS_CHUNK]
+                self.__refresh('d.number IN ({})'.format(', '.join('?' * len(chunk))), chunk)
+        return len(changed)
+
+    def search(self, text: str, limit=50):
+        """
+        Finds documents: all the words of the text are to be found in the document (as prefixes of its words).
+        The best matches go first.
+
+        Parameters
+        ----------
+        text : str
+            Words to be found, e.g. 'Схема подключения'.
+        limit : int, default=50
+            Maximum number of results.
+
+        Returns
+        -------
+        results : list
+            List of SearchResult.
+        """
+        query = build_query(text)
+        if not query:
+            return []
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT d.doc_name, d.number, d.trm, d.path, n.name_ru, n.name_en, "
+                "snippet(documents_fts, -1, '[', ']', '...', 12) "
+                "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+                "LEFT JOIN names n ON n.number = d.number "
+                "WHERE documents_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        return [SearchResult(*row) for row in rows]
+
+    def commit(self):
+        """
+        Saves changes.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            self.__conn.commit()
+
+    def close(self):
+        """
+        Closes the database.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            self.__conn.commit()
+            self.__conn.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python search_index.py <words>', file=sys.stderr)
+        sys.exit(1)
+    index_path = os.path.join(config.get_project_config().process_dir, 'search_index.sqlite')
+    if not os.path.exists(index_path):
+        print('ERROR: search index {} was not found'.format(index_path), file=sys.stderr)
+        sys.exit(1)
+    index = SearchIndex(index_path)
+    start = time.perf_counter()
+    results = index.search(' '.join(sys.argv[1:]))
+    elapsed = time.perf_counter() - start
+    for result in results:
+        print(result)
+    print('{} documents found in {:.1f} ms'.format(len(results), elapsed * 1000))
+    index.close()
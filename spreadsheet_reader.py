@@ -0,0 +1,149 @@
+import os
+
+from openpyxl import load_workbook
+from xlrd import open_workbook
+
+
+class SpreadsheetReader:
+    """
+    The class is purposed for reading rows of a spreadsheet with the fastest backend available for its format:
+    xlrd for legacy '.xls' files and streaming read-only openpyxl for '.xlsx' files.
+    Both backends give the same API: rows are yielded as tuples of cell values one by one.
+
+    Attributes
+    ----------
+    path : str
+        Path to the spreadsheet file.
+
+    Methods
+    -------
+    close()
+        Releases the file.
+    iter_rows(min_row=0)
+        Yields rows of the sheet as tuples of cell values.
+    get_value(row: tuple, col: int)
+        Gets value from the row, None if the row is shorter.
+    resolve_columns(header: tuple, exact=None, contains=None)
+        Finds indices of required columns by header names.
+    """
+    def __init__(self, path: str, sheet=0):
+        self.path = path
+        self.__sheet = sheet
+        self.__wb = None
+        self.__log = None
+
+        if os.path.splitext(path)[1].lower() == '.xls':
+            self.__log = open(os.devnull, 'w')
+            self.__wb = open_workbook(path, on_demand=True, logfile=self.__log)
+            self.__iter_rows = self.__iter_rows_xls
+        else:
+            self.__wb = load_workbook(path, read_only=True, data_only=True)
+            self.__iter_rows = self.__iter_rows_xlsx
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter_rows_xls(self):
+        if isinstance(self.__sheet, str):
+            sheet = self.__wb.sheet_by_name(self.__sheet)
+        else:
+            sheet = self.__wb.sheet_by_index(self.__sheet)
+        for row in sheet.get_rows():
+            yield tuple(cell.value for cell in row)
+
+    def __iter_rows_xlsx(self):
+        if isinstance(self.__sheet, str):
+            sheet = self.__wb[self.__sheet]
+        else:
+            sheet = self.__wb.worksheets[self.__sheet]
+        yield from sheet.iter_rows(values_only=True)
+
+    def iter_rows(self, min_row=0):
+        """
+        Yields rows of the sheet as tuples of cell values.
+
+        Parameters
+        ----------
+        min_row : int, default=0
+            Index of the first row to be yielded (zero-based).
+
+        Returns
+        -------
+        Iterator
+        """
+        for i, row in enumerate(self.__iter_rows()):
+            if i >= min_row:
+                yield row
+
+    @staticmethod
+    def get_value(row: tuple, col: int):
+        """
+        Gets value from the row, None if the row is shorter.
+
+        Parameters
+        ----------
+        row : tuple
+        col : int
+            Column index (zero-based).
+
+        Returns
+        -------
+        Cell value.
+        """
+        if col < len(row):
+            return row[col]
+        return None
+
+    @staticmethod
+    def resolve_columns(header: tuple, exact=None, contains=None):
+        """
+        Finds indices of required columns by header names (case insensitive).
+
+        Parameters
+        ----------
+        header : tuple
+            Header row values.
+        exact : dict, default=None
+            Keys mapped to column names to be equal to the header.
+        contains : dict, default=None
+            Keys mapped to column names to be found in the header.
+
+        Returns
+        -------
+        cols : dict
+            Keys mapped to column indices (zero-based).
+
+        Raises
+        ------
+        ValueError
+            If a required column is not found.
+        """
+        col_names = [str(value).lower() for value in header]
+        cols = {}
+        for key, name in (exact or {}).items():
+            cols[key] = col_names.index(name.lower())
+        for key, name in (contains or {}).items():
+            found = [i for i, col_name in enumerate(col_names) if name.lower() in col_name]
+            if not found:
+                raise ValueError('{} is not in header'.format(name))
+            cols[key] = found[0]
+        return cols
+
+    def close(self):
+        """
+        Releases the file.
+
+        Returns
+        -------
+        None
+        """
+        if self.__wb is not None:
+            if self.__log is not None:
+                self.__wb.release_resources()
+                self.__log.close()
+            else:
+                self.__wb.close()
+            self.__wb = None
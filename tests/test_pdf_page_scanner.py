@@ -0,0 +1,187 @@
+import os
+import sys
+import tempfile
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from pdf_page_scanner import PdfPageScanner, PdfScanError
+except ImportError:
+    # Модуль импортирует PyMuPDF для резервного чтения страниц
+    PdfPageScanner = None
+
+A4 = b'[0 0 595 842]'
+CATALOG = b'<< /Type /Catalog /Pages 2 0 R >>'
+# Дерево страниц: первая страница альбомная, вторая наследует MediaBox и Rotate корня
+PAGE_TREE = {
+    2: b'<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 /MediaBox ' + A4 + b' /Rotate 90 >>',
+    3: b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 842 595] /Rotate 0 >>',
+    4: b'<< /Type /Page /Parent 2 0 R >>',
+}
+
+
+def _stream(dict_: bytes, data: bytes):
+    return b'<< ' + dict_ + b' /Length %d >>\nstream\n' % len(data) + data + b'\nendstream'
+
+
+def _png_up(rows: list):
+    """
+    Encodes rows of the xref stream with PNG 'Up' predictor.
+    """
+    data = bytearray()
+    prev = bytes(len(rows[0]))
+    for row in rows:
+        data.append(2)
+        data.extend((b - p) & 0xFF for b, p in zip(row, prev))
+        prev = row
+    return bytes(data)
+
+
+def build_pdf(objects: dict, compressed=None, xref='table'):
+    """
+    Builds pdf-file.
+
+    Parameters
+    ----------
+    objects : dict
+        Numbers of objects written to the file body mapped to their content.
+    compressed : dict, default=None
+        Numbers of objects put into one object stream mapped to their content.
+    xref : {'table', 'stream', 'hybrid'}
+        Cross-reference section: table, stream with PNG predictor or table with additional stream (XRefStm).
+
+    Returns
+    -------
+    bytes
+    """
+    compressed = compressed or {}
+    out = bytearray(b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n')
+    # Записи xref: номер -> (тип, поле 2, поле 3)
+    entries = {}
+
+    def write_object(num, content):
+        entries[num] = (1, len(out), 0)
+        out.extend(b'%d 0 obj\n' % num + content + b'\nendobj\n')
+
+    for num, content in objects.items():
+        write_object(num, content)
+    next_num = max(list(objects) + list(compressed)) + 1
+
+    if compressed:
+        stm_num = next_num
+        next_num += 1
+        header, body = [], bytearray()
+        for index, (num, content) in enumerate(compressed.items()):
+            header.append(b'%d %d' % (num, len(body)))
+            body.extend(content + b'\n')
+            entries[num] = (2, stm_num, index)
+        header = b' '.join(header) + b'\n'
+        write_object(stm_num, _stream(b'/Type /ObjStm /N %d /First %d /Filter /FlateDecode' % (
+            len(compressed), len(header)), zlib.compress(header + bytes(body))))
+
+    size = next_num + 1
+    xref_num = next_num
+
+    def write_xref_stream(nums, extra=b''):
+        entries[xref_num] = (1, len(out), 0)
+        rows = [bytes([entries[num][0]]) + entries[num][1].to_bytes(4, 'big') + entries[num][2].to_bytes(2, 'big')
+                for num in nums]
+        index = b' '.join(b'%d 1' % num for num in nums)
+        offset = len(out)
+        out.extend(b'%d 0 obj\n' % xref_num + _stream(
+            b'/Type /XRef /Size %d /W [1 4 2] /Index [%s] /Filter /FlateDecode '
+            b'/DecodeParms << /Predictor 12 /Columns 7 >>' % (size, index) + extra,
+            zlib.compress(_png_up(rows))) + b'\nendobj\n')
+        return offset
+
+    if xref == 'stream':
+        start = write_xref_stream(sorted(entries), b' /Root 1 0 R')
+    else:
+        xref_stm = None
+        if xref == 'hybrid':
+            xref_stm = write_xref_stream(sorted(num for num, entry in entries.items() if entry[0] == 2))
+        start = len(out)
+        out.extend(b'xref\n0 %d\n' % size)
+        for num in range(size):
+            entry = entries.get(num)
+            if entry is not None and entry[0] == 1 and num != xref_num:
+                out.extend(b'%010d %05d n \n' % (entry[1], entry[2]))
+            else:
+                out.extend(b'0000000000 65535 f \n')
+        out.extend(b'trailer\n<< /Size %d /Root 1 0 R' % size)
+        if xref_stm is not None:
+            out.extend(b' /XRefStm %d' % xref_stm)
+        out.extend(b' >>\n')
+    out.extend(b'startxref\n%d\n%%%%EOF\n' % start)
+    return bytes(out)
+
+
+@unittest.skipIf(PdfPageScanner is None, 'PyMuPDF is not installed')
+class PdfPageScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def __pages(self, data: bytes):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        with PdfPageScanner(self.path) as scanner:
+            return scanner.pages()
+
+    def __check_page_tree(self, pages):
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[0].media_box, (0.0, 0.0, 842.0, 595.0))
+        self.assertEqual(pages[0].rotate, 0)
+        self.assertEqual(pages[1].media_box, (0.0, 0.0, 595.0, 842.0))
+        self.assertEqual(pages[1].crop_box, pages[1].media_box)
+        self.assertEqual(pages[1].rotate, 90)
+
+    def test_xref_table(self):
+        pages = self.__pages(build_pdf({1: CATALOG, **PAGE_TREE}))
+        self.__check_page_tree(pages)
+
+    def test_xref_stream_with_object_stream(self):
+        pages = self.__pages(build_pdf({1: CATALOG}, PAGE_TREE, xref='stream'))
+        self.__check_page_tree(pages)
+
+    def test_hybrid_xref(self):
+        pages = self.__pages(build_pdf({1: CATALOG}, PAGE_TREE, xref='hybrid'))
+        self.__check_page_tree(pages)
+
+    def test_inherited_boxes(self):
+        # Промежуточный узел задаёт MediaBox и CropBox, корень - Rotate
+        pages = self.__pages(build_pdf({
+            1: CATALOG,
+            2: b'<< /Type /Pages /Kids [3 0 R 6 0 R] /Count 3 /Rotate 270 >>',
+            3: b'<< /Type /Pages /Parent 2 0 R /Kids [4 0 R 5 0 R] /Count 2 /MediaBox [0 0 1191 842] '
+               b'/CropBox [10 10 1181 832] >>',
+            4: b'<< /Type /Page /Parent 3 0 R >>',
+            5: b'<< /Type /Page /Parent 3 0 R /MediaBox 7 0 R /Rotate 0 >>',
+            6: b'<< /Type /Page /Parent 2 0 R /MediaBox ' + A4 + b' >>',
+            7: A4,
+        }))
+        self.assertEqual([page.media_box for page in pages],
+                         [(0.0, 0.0, 1191.0, 842.0), (0.0, 0.0, 595.0, 842.0), (0.0, 0.0, 595.0, 842.0)])
+        self.assertEqual(pages[0].crop_box, (10.0, 10.0, 1181.0, 832.0))
+        self.assertEqual(pages[1].crop_box, (10.0, 10.0, 1181.0, 832.0))
+        self.assertEqual(pages[2].crop_box, pages[2].media_box)
+        self.assertEqual([page.rotate for page in pages], [270, 0, 270])
+
+    def test_page_tree_loop(self):
+        data = build_pdf({
+            1: CATALOG,
+            2: b'<< /Type /Pages /Kids [3 0 R] /Count 1 /MediaBox ' + A4 + b' >>',
+            3: b'<< /Type /Pages /Parent 2 0 R /Kids [2 0 R] /Count 1 >>',
+        })
+        with self.assertRaises(PdfScanError):
+            self.__pages(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
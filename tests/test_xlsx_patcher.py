@@ -0,0 +1,164 @@
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xlsx_patcher import XlsxPatcher
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="VDR" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+# Стиль 1: жирный шрифт, тонкая рамка, выравнивание по центру, числовой формат 'General'
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/></font><font><b/><sz val="11"/></font></fonts>
+<fills count="1"><fill><patternFill patternType="none"/></fill></fills>
+<borders count="2"><border/><border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center"/></xf></cellXfs>
+</styleSheet>"""
+SHEET = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetData><row r="1"><c r="A1" s="1"/><c r="B1" s="1"/><c r="C1"/></row></sheetData>
+</worksheet>"""
+
+
+class XlsxPatcherDateStyleTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        with zipfile.ZipFile(self.path, 'w') as zf:
+            zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+            zf.writestr('_rels/.rels', ROOT_RELS)
+            zf.writestr('xl/workbook.xml', WORKBOOK)
+            zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+            zf.writestr('xl/styles.xml', STYLES)
+            zf.writestr('xl/worksheets/sheet1.xml', SHEET)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def __read(self):
+        with zipfile.ZipFile(self.path) as zf:
+            styles = ElementTree.fromstring(zf.read('xl/styles.xml'))
+            sheet = ElementTree.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        xfs = list(styles.find(NS + 'cellXfs').iter(NS + 'xf'))
+        cells = {c.get('r'): c for c in sheet.iter(NS + 'c')}
+        return xfs, cells
+
+    def test_date_keeps_font_and_border(self):
+        patcher = XlsxPatcher(self.path)
+        patcher.set_value('VDR', 1, 1, datetime.date(2024, 3, 15))
+        patcher.set_value('VDR', 1, 2, datetime.date(2024, 3, 16))
+        patcher.set_value('VDR', 1, 3, datetime.date(2024, 3, 17))
+        patcher.save()
+
+        xfs, cells = self.__read()
+        bold_style = cells['A1'].get('s')
+        self.assertNotEqual(bold_style, '1')
+        # Ячейки одного исходного стиля используют одну копию
+        self.assertEqual(cells['B1'].get('s'), bold_style)
+
+        xf = xfs[int(bold_style)]
+        self.assertEqual(xf.get('numFmtId'), '14')
+        self.assertEqual(xf.get('applyNumberFormat'), '1')
+        self.assertEqual(xf.get('fontId'), '1')
+        self.assertEqual(xf.get('borderId'), '1')
+        self.assertEqual(xf.find(NS + 'alignment').get('horizontal'), 'center')
+
+        plain_xf = xfs[int(cells['C1'].get('s'))]
+        self.assertEqual(plain_xf.get('numFmtId'), '14')
+        self.assertEqual(plain_xf.get('fontId'), '0')
+        self.assertEqual(len(xfs), 4)
+
+        # Исходные стили не изменены
+        self.assertEqual(xfs[1].get('numFmtId'), '0')
+        self.assertEqual(xfs[1].get('fontId'), '1')
+
+
+# A3:A5 - общая формула, главная ячейка A3
+SHARED_SHEET = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetData><row r="3"><c r="A3"><f t="shared" ref="A3:A5" si="0">B3*2</f><v>2</v></c><c r="B3"><v>1</v></c></row>
+<row r="4"><c r="A4"><f t="shared" si="0"/><v>4</v></c><c r="B4"><v>2</v></c></row>
+<row r="5"><c r="A5"><f t="shared" si="0"/><v>6</v></c><c r="B5"><v>3</v></c></row></sheetData>
+</worksheet>"""
+
+
+class XlsxPatcherFormulaTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        with zipfile.ZipFile(self.path, 'w') as zf:
+            zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+            zf.writestr('_rels/.rels', ROOT_RELS)
+            zf.writestr('xl/workbook.xml', WORKBOOK)
+            zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+            zf.writestr('xl/styles.xml', STYLES)
+            zf.writestr('xl/worksheets/sheet1.xml', SHARED_SHEET)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def __read(self):
+        with zipfile.ZipFile(self.path) as zf:
+            workbook = zf.read('xl/workbook.xml').decode('utf-8')
+            sheet = ElementTree.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        return workbook, {c.get('r'): c for c in sheet.iter(NS + 'c')}
+
+    def test_shared_master_is_moved(self):
+        patcher = XlsxPatcher(self.path)
+        patcher.set_value('VDR', 3, 1, 'text')
+        patcher.save()
+
+        workbook, cells = self.__read()
+        self.assertIsNone(cells['A3'].find(NS + 'f'))
+        master = cells['A4'].find(NS + 'f')
+        self.assertEqual(master.get('t'), 'shared')
+        self.assertEqual(master.get('si'), '0')
+        self.assertEqual(master.get('ref'), 'A4:A5')
+        self.assertEqual(master.text, 'B4*2')
+        dependent = cells['A5'].find(NS + 'f')
+        self.assertIsNone(dependent.get('ref'))
+        self.assertEqual(dependent.get('si'), '0')
+        self.assertIn('fullCalcOnLoad="1"', workbook)
+
+    def test_values_do_not_force_recalculation(self):
+        patcher = XlsxPatcher(self.path)
+        patcher.set_value('VDR', 3, 2, 5)
+        patcher.save()
+
+        workbook, cells = self.__read()
+        self.assertEqual(cells['A3'].find(NS + 'f').get('ref'), 'A3:A5')
+        self.assertNotIn('fullCalcOnLoad', workbook)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,9 @@ import os
 import re
 import sys
 
-import fitz
-
 import config
+from doc_name_checker import DocNameChecker
+from fs_index import FsIndex
 
 
 class Transmittal:
@@ -18,8 +18,11 @@ class Transmittal:
     check_docs_name : bool, default=False
         If True, documents name will be checked for correctness: if a name is incorrect, the file will be renamed
         corresponding to the name given in its title page.
+        Title pages are checked in worker processes of PdfInspector by DocNameChecker
+        (name_checker argument, if provided).
     documents : dict
-        Documents dictionary, which values contain properties of corresponding document.
+        Documents dictionary, which values contain properties of corresponding document
+        (SentDocRecord or ReceivedDocRecord, None until the document is parsed).
     name : str
         Name of the transmittal.
     path : str
@@ -29,10 +32,12 @@ class Transmittal:
 
     Methods
     -------
-    update(update_docs=False)
+    map_trm_dirs(entries: list)
+        Maps transmittal names to names of folders in the directory listing.
+    update(update_docs=False, fs_index=None, trm_dirs=None)
         Refreshes the transmittal path and optionally updates files in it.
     """
-    def __init__(self, name: str, path: str, check_docs_name=False):
+    def __init__(self, name: str, path: str, check_docs_name=False, fs_index=None, name_checker=None):
         self.name = name
 
         if os.path.isabs(path):
@@ -42,38 +47,59 @@ class Transmittal:
 
         self.check_docs_name = check_docs_name
             
-        self.__cfg = config.get_config()
-        
+        # Ссылка на общую конфигурацию, в базе сохраняется только ссылка
+        self.__cfg = config.get_project_config()
+
+        if fs_index is None:
+            fs_index = FsIndex()
+        if check_docs_name and name_checker is None:
+            cache_path = os.path.join(self.__cfg.process_dir, 'name_check_cache.pickle')
+            quarantine_path = os.path.join(self.__cfg.process_dir, 'pdf_quarantine.json')
+            name_checker = DocNameChecker(self.__cfg.vdr_mask, cache_path, quarantine_path=quarantine_path)
+
         self.phases = None
-        self.documents = self.__collect_docs()
+        self.documents = self.__collect_docs(fs_index, name_checker)
     
-    def __get_docs_in_subfolders(self):
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # В старых версиях базы каждый трансмиттел хранил копию конфигурации
+        self.__cfg = config.get_project_config()
+        # В старых версиях базы свойства документов хранились списками, они будут получены заново
+        self.documents = {
+            doc_name: None if isinstance(record, list) else record
+            for doc_name, record in self.documents.items()
+        }
+
+    def __get_docs_in_subfolders(self, fs_index: FsIndex, name_checker=None):
         """
         Looks for documents in subfolders.
 
+        Parameters
+        ----------
+        fs_index : FsIndex
+            Cache of directory listings.
+        name_checker : DocNameChecker, default=None
+            Tool to check documents name if check_docs_name is True.
+
         Returns
         -------
         Iterable
         """
         print('Trying to find docs in subfolders')
         file_list = []
-        folder_mask = self.__cfg[1]['vdr_mask']
-        # Сформируем маску для поиска папки с именем документа
-        folder_mask = folder_mask.split(r'.xlsx')[0]
-        for item in os.listdir(self.path):
-            subfolder = os.path.join(self.path, item)
-            if os.path.isdir(subfolder):
-                if fnmatch.fnmatch(item, folder_mask):
+        for entry in fs_index.scan(self.path):
+            if entry.is_dir:
+                if self.__cfg.subfolder_matcher.match(entry.name):
                     # Выполним поиск внутри подпапки
-                    print('Trying to find docs in {}'.format(subfolder))
+                    print('Trying to find docs in {}'.format(entry.path))
                     try:
-                        doc_name = self.__get_docs(subfolder)[0]
+                        doc_name = self.__get_docs(entry.path, fs_index, name_checker)[0]
                         file_list.append(doc_name)
                     except IndexError:
-                        print('ERROR: {}.pdf was not found!'.format(item), file=sys.stderr)
+                        print('ERROR: {}.pdf was not found!'.format(entry.name), file=sys.stderr)
         return file_list
 
-    def __get_docs(self, path: str):
+    def __get_docs(self, path: str, fs_index: FsIndex, name_checker=None):
         """
         Looks for documents in path provided.
 
@@ -81,158 +107,107 @@ class Transmittal:
         ----------
         path : str
             Path to folder in which documents are looked for.
+        fs_index : FsIndex
+            Cache of directory listings.
+        name_checker : DocNameChecker, default=None
+            Tool to check documents name if check_docs_name is True.
 
         Returns
         -------
         Iterable
         """
-        file_list = []
+        item_list = []
         phase_list = []
-        mask = self.__cfg[1]['vdr_mask']
-        mask = mask.split('*')[0] + '*.pdf'
-        alt_mask = mask.split('*')[0] + '*.PDF'
-        for item in os.listdir(path):
-            if (fnmatch.fnmatch(item, mask) or fnmatch.fnmatch(item, alt_mask)) and 'crs' not in item.lower():
+        pdf_matcher = self.__cfg.pdf_matcher
+        for item in fs_index.listdir(path):
+            if pdf_matcher.match(item) and 'crs' not in item.lower():
 
                 phase = item.split('.')[1]
                 if phase == '0':
                     phase = '1'
 
                 phase_list.append(phase)
+                item_list.append(item)
 
-                if 'att' not in item.lower():
-                    doc_name = item
+        checked_names = {}
+        if self.check_docs_name and name_checker is not None:
+            # Проверим названия документов на опечатки (кроме приложений) одним параллельным проходом
+            to_check = [item for item in item_list if 'att' not in item.lower()]
+            checked_names = name_checker.check_and_rename(path, to_check)
+            if any(item != checked_names[item] for item in to_check):
+                fs_index.invalidate(path)
 
-                    if self.check_docs_name:
-                        # Проверим название документа на опечатки
-                        doc_name = self.__get_doc_name_checked(item, path)
-
-                    # Отбросим ненужную часть названия документа '.pdf'
-                    doc_name = doc_name[:-4]
-                else:
-                    doc_name = item[:-4]
-                file_list.append(doc_name)
+        # Отбросим ненужную часть названия документа '.pdf'
+        file_list = [checked_names.get(item, item)[:-4] for item in item_list]
         self.phases = phase_list
         return file_list
 
-    def __get_doc_name_checked(self, file_name: str, file_dir: str):
+    def __collect_docs(self, fs_index: FsIndex, name_checker=None):
         """
-        Checks documents name for correctness.
-        If a name is incorrect then renames file in according to filename in title page.
+        Collects all required documents in dictionary.
 
         Parameters
         ----------
-        file_dir : str
-            Path to folder containing target file.
-        file_name : str
-            Name of the file to be checked.
-
-        Returns
-        -------
-        str
-        """
-        src = os.path.join(file_dir, file_name)
-        with fitz.open(src) as f:
-            page1_text = f.loadPage(0).getText('text')
-
-        mask = self.__cfg[1]['vdr_mask']
-        pattern1 = mask.split('.')[0] + r'.*ER.*\.\w{3}'
-        pattern2 = mask.split('.')[0] + r'.*-\d{4}'
-
-        find1 = re.findall(pattern1, page1_text)
-        find2 = re.findall(pattern2, page1_text)
-
-        if find1:
-            if file_name == find1[0]:
-                return file_name
-            else:
-                print('WARNING: the file name is not correct for {}!'.format(file_name))
-                new_name = find1[0]
-                dst = os.path.join(file_dir, new_name)
-                try:
-                    os.rename(src, dst)
-                    print('File name was successfully changed')
-                except FileNotFoundError:
-                    pass
-                return new_name
-        elif find2:
-            s = re.sub(r'_.*$', '', file_name)
-            s = re.sub(r'-(?=[\w\d]{2}-[\d]{4})', r'.', s)
-            if s == find2[0]:
-                return file_name
-            else:
-                print('WARNING: the file name is not correct for {}!'.format(file_name))
-                sub1 = re.sub(r'\.(?=[\w\d]{2}-[\d]{4})', r'-', find2[0])
-                sub2 = re.findall(r'_\d\d_\w\w.*$', file_name)[0]
-                new_name = sub1 + sub2
-                dst = os.path.join(file_dir, sub1 + sub2)
-                try:
-                    os.rename(src, dst)
-                    print('File name was successfully changed')
-                except FileNotFoundError:
-                    pass
-                return new_name
-        else:
-            return file_name
-    
-    def __collect_docs(self):
-        """
-        Collects all required documents in dictionary.
+        fs_index : FsIndex
+            Cache of directory listings.
+        name_checker : DocNameChecker, default=None
+            Tool to check documents name if check_docs_name is True.
 
         Returns
         -------
         dict
         """
-        file_list = self.__get_docs(self.path)
+        file_list = self.__get_docs(self.path, fs_index, name_checker)
         
         if not file_list:
             print('WARNING: there are no .pdf docs in {}'.format(self.path))
-            file_list = self.__get_docs_in_subfolders()
+            file_list = self.__get_docs_in_subfolders(fs_index, name_checker)
         # Создадим словарь, в который дальше будем записывать
         # данные по каждому документу
         file_dict = dict.fromkeys(file_list)
         return file_dict
 
-    def __update_docs_in_subfolders(self):
+    def __update_docs_in_subfolders(self, fs_index: FsIndex):
         """
         Tries to find documents in subfolders and update them.
 
+        Parameters
+        ----------
+        fs_index : FsIndex
+            Cache of directory listings.
+
         Returns
         -------
         None
         """
         print('Trying to update docs in subfolders')
-        folder_mask = self.__cfg[1]['vdr_mask']
-        # Сформируем маску для поиска папки с именем документа
-        folder_mask = folder_mask.split('.xlsx')[0]
-        for item in os.listdir(self.path):
-            subfolder = os.path.join(self.path, item)
-            if fnmatch.fnmatch(item, folder_mask) and os.path.isdir(subfolder):
+        for entry in fs_index.scan(self.path):
+            if self.__cfg.subfolder_matcher.match(entry.name) and entry.is_dir:
                 # Выполним поиск внутри подпапки
-                print('Trying to find docs in {}'.format(subfolder))
-                check = self.__update_docs(subfolder)
+                print('Trying to find docs in {}'.format(entry.path))
+                check = self.__update_docs(entry.path, fs_index)
                 if not check:
-                    print('ERROR: there are no .pdf docs in {}'.format(subfolder), file=sys.stderr)
+                    print('ERROR: there are no .pdf docs in {}'.format(entry.path), file=sys.stderr)
 
-    def __update_docs(self, path: str):
+    def __update_docs(self, path: str, fs_index: FsIndex):
         """
         Tries to find documents and update them using path provided.
 
         Parameters
         ----------
         path : str
+        fs_index : FsIndex
+            Cache of directory listings.
 
         Returns
         -------
         check : int
             Indicator of file presence.
         """
-        mask = self.__cfg[1]['vdr_mask']
-        mask = mask.split('*')[0] + '*.pdf'
-        alt_mask = mask.split('*')[0] + '*.PDF'
+        pdf_matcher = self.__cfg.pdf_matcher
         check = 0
-        for item in os.listdir(path):
-            if fnmatch.fnmatch(item, mask) or fnmatch.fnmatch(item, alt_mask):
+        for item in fs_index.listdir(path):
+            if pdf_matcher.match(item):
                 check += 1
                 # Отбросим ненужную часть названия документа '.pdf'
                 doc_name = item[:-4]
@@ -241,31 +216,69 @@ class Transmittal:
                     self.documents[doc_name] = None
         return check
 
-    def update(self, update_docs=False):
+    @staticmethod
+    def map_trm_dirs(entries: list):
+        """
+        Maps transmittal names to names of folders in the directory listing.
+        A transmittal name is the part of the folder name up to transmittal number (e.g. 'TRM-00012'),
+        so the map is built with one pass over the listing of the shared parent directory.
+
+        Parameters
+        ----------
+        entries : list
+            List of FsEntry of the parent directory.
+
+        Returns
+        -------
+        trm_dirs : dict
+        """
+        trm_dirs = {}
+        for entry in entries:
+            if entry.is_dir:
+                trm_name = re.sub(r'(?<=TRM-\d{5}).*$', r'', entry.name).strip()
+                trm_dirs[trm_name] = entry.name
+        return trm_dirs
+
+    def update(self, update_docs=False, fs_index=None, trm_dirs=None):
         """
         Refreshes the transmittal path and optionally updates files in it.
 
         Parameters
         ----------
         update_docs : bool, default=False
+        fs_index : FsIndex, default=None
+            Cache of directory listings shared between transmittals.
+        trm_dirs : dict, default=None
+            Transmittal names mapped to folder names in the parent directory (see map_trm_dirs).
+            If not provided, it is built from the parent directory listing.
 
         Returns
         -------
         None
         """
+        if fs_index is None:
+            fs_index = FsIndex()
+
         # Обновим путь к трансмиттелу, если название папки трансмиттела изменено
-        mask = self.name + '*'
-        directory = os.path.split(self.path)[0]
-        for item in os.listdir(directory):
-            if fnmatch.fnmatch(item, mask):
-                trm_dir = os.path.split(self.path)
-                if trm_dir[1] != item:
-                    self.path = os.path.join(trm_dir[0], item)
-                    print('Path to {} was successfully updated'.format(self.name))
-                    
-                    # Добавим документы, если в трансмиттел были добавлены новые
+        directory, cur_dir_name = os.path.split(self.path)
+        if trm_dirs is None:
+            trm_dirs = self.map_trm_dirs(fs_index.scan(directory))
+
+        dir_name = trm_dirs.get(self.name)
+        if dir_name is None:
+            # Название папки не содержит номер трансмиттела в привычном виде
+            mask = self.name + '*'
+            for item in fs_index.listdir(directory):
+                if fnmatch.fnmatch(item, mask):
+                    dir_name = item
+
+        if dir_name is not None and dir_name != cur_dir_name:
+            self.path = os.path.join(directory, dir_name)
+            print('Path to {} was successfully updated'.format(self.name))
+
+        # Добавим документы, если в трансмиттел были добавлены новые
         if update_docs:
-            check = self.__update_docs(self.path)
+            check = self.__update_docs(self.path, fs_index)
             
             if check == 0:
-                self.__update_docs_in_subfolders()
+                self.__update_docs_in_subfolders(fs_index)
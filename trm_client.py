@@ -0,0 +1,189 @@
+import argparse
+import json
+import sys
+import time
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+HOST = '127.0.0.1'
+PORT = 8765
+# Интервал опроса состояния задания, с
+POLL_INTERVAL = 0.5
+
+
+class TrmClientError(Exception):
+    """
+    Error returned by TrmServer.
+    """
+
+
+class TrmClient:
+    """
+    The class is purposed to send requests to TrmServer running on the local machine (see TrmServer for the API).
+
+    Attributes
+    ----------
+    url : str
+        Base URL of the server.
+
+    Methods
+    -------
+    history(number=None, trm=None)
+        Gets history of the document or of the transmittal.
+    job(id_: int)
+        Gets state and output of the job.
+    prepare_print(vdr: str, hard_link=False, bundle=False)
+        Queues preparation of VDR phase documents for printing.
+    receive(trm: str)
+        Queues processing of the received transmittal.
+    search(text: str, limit=50)
+        Finds documents.
+    send(trm: str, send_date=None)
+        Queues preparation of the transmittal for sending.
+    status()
+        Gets items of the database and states of the jobs.
+    update_db(is_received=False)
+        Queues update of the database.
+    wait(id_: int, echo=True)
+        Waits for the job to be finished.
+    """
+    def __init__(self, host=HOST, port=PORT):
+        self.url = 'http://{}:{}'.format(host, port)
+
+    def __request(self, path: str, data=None):
+        if data is None:
+            request = Request(self.url + path)
+        else:
+            request = Request(self.url + path, data=json.dumps(data).encode('utf-8'), method='POST',
+                              headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(request) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8'))['error']
+            except (ValueError, KeyError):
+                message = str(e)
+            raise TrmClientError(message) from None
+
+    def status(self):
+        return self.__request('/status')
+
+    def update_db(self, is_received=False):
+        return self.__request('/update', {'is_received': is_received})
+
+    def send(self, trm: str, send_date=None):
+        return self.__request('/send', {'trm': trm, 'send_date': send_date})
+
+    def receive(self, trm: str):
+        return self.__request('/receive', {'trm': trm})
+
+    def prepare_print(self, vdr: str, hard_link=False, bundle=False):
+        return self.__request('/print', {'vdr': vdr, 'hard_link': hard_link, 'bundle': bundle})
+
+    def job(self, id_: int):
+        return self.__request('/jobs/{}'.format(id_))
+
+    def wait(self, id_: int, echo=True):
+        """
+        Waits for the job to be finished.
+
+        Parameters
+        ----------
+        id_ : int
+        echo : bool, default=True
+            Whether to print output of the job while waiting.
+
+        Returns
+        -------
+        job : dict
+            Final state of the job.
+        """
+        printed = 0
+        while True:
+            job = self.job(id_)
+            if echo:
+                sys.stdout.write(job['log'][printed:])
+                sys.stdout.flush()
+                printed = len(job['log'])
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(POLL_INTERVAL)
+
+    def search(self, text: str, limit=50):
+        return self.__request('/search?' + urlencode({'q': text, 'limit': limit}))
+
+    def history(self, number=None, trm=None):
+        params = {'number': number} if number is not None else {'trm': trm}
+        return self.__request('/history?' + urlencode(params))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Client of TRM manager server')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--no-wait', action='store_true', help='do not wait for the job to be finished')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status')
+    command = commands.add_parser('update')
+    command.add_argument('--received', action='store_true')
+    command = commands.add_parser('send')
+    command.add_argument('trm')
+    command.add_argument('--date', help='sending date dd.mm.yyyy (today by default)')
+    command = commands.add_parser('receive')
+    command.add_argument('trm')
+    command = commands.add_parser('print')
+    command.add_argument('vdr')
+    command.add_argument('--hard-link', action='store_true')
+    command.add_argument('--bundle', action='store_true')
+    command = commands.add_parser('search')
+    command.add_argument('words', nargs='+')
+    command.add_argument('--limit', type=int, default=50)
+    command = commands.add_parser('history')
+    command.add_argument('--number')
+    command.add_argument('--trm')
+    args = parser.parse_args()
+
+    client = TrmClient(args.host, args.port)
+    try:
+        if args.command == 'status':
+            result = client.status()
+            print('\n'.join(result['items']))
+            for job in result['jobs']:
+                print('job {id}: {name} - {status}'.format(**job))
+            return 0
+        if args.command == 'search':
+            for result in client.search(' '.join(args.words), args.limit):
+                print('{}\t{}\t{}'.format(result['trm'], result['doc_name'], result['snippet']))
+            return 0
+        if args.command == 'history':
+            if not (args.number or args.trm):
+                parser.error("'--number' or '--trm' is required")
+            print(json.dumps(client.history(args.number, args.trm), ensure_ascii=False, indent=1))
+            return 0
+
+        if args.command == 'update':
+            job = client.update_db(args.received)
+        elif args.command == 'send':
+            job = client.send(args.trm, args.date)
+        elif args.command == 'receive':
+            job = client.receive(args.trm)
+        else:
+            job = client.prepare_print(args.vdr, args.hard_link, args.bundle)
+    except (TrmClientError, OSError) as e:
+        print('ERROR: {}'.format(e), file=sys.stderr)
+        return 1
+
+    print('job {id}: {name} - {status}'.format(**job))
+    if args.no_wait:
+        return 0
+    job = client.wait(job['id'])
+    if job['status'] == 'failed':
+        print(job['error'], file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,20 +4,42 @@ import os
 import re
 import shutil
 import sys
+import threading
 import warnings
+import zipfile
 
-import fitz
 from openpyxl import load_workbook
 from openpyxl.worksheet.worksheet import Worksheet
-from PyPDF2 import PdfFileReader
 from win32com import client
-from xlrd import open_workbook
 
 import config
+from content_index import ContentIndex
+from copy_engine import CopyEngine
 from database import DataBase
+from doc_history import DocHistory
+from doc_name_matcher import DocNameMatcher
+from doc_records import ReceivedDocRecord, SentDocRecord
 from document import Document
-from print_progress_bar import PrintProgressBar
+from fs_index import FsIndex
+from job_journal import JobJournal
+from native_file_resolver import NativeFileResolver
+from page_format_classifier import PageFormatClassifier
+from pdf_inspector import InspectionSummary, get_shared_inspector
+from print_bundler import PrintBundler
+from progress_reporter import ProgressReporter
+from revision_date_extractor import RevisionDateExtractor
+from search_index import SearchIndex
+from spreadsheet_reader import SpreadsheetReader
 from transmittal import Transmittal
+from xlsx_patcher import XlsxPatcher
+from xlsx_stream_reader import SheetValues, XlsxStreamReader
+
+# Строки шапки VDR, данные документов начинаются со следующей строки
+VDR_HEADER_ROWS = 12
+# Столбцы VDR со свойствами документа
+VDR_DATA_COLUMNS = (22, 38, 40, 41, 49, 50, 54, 55)
+# Смещения столбцов выпуска, получения и кода CRS относительно столбца даты выпуска ревизии
+VDR_ISSUE_OFFSETS = (0, 1, 4, 5, 6, 28, 29, 30)
 
 
 class TrmManager:
@@ -27,8 +49,12 @@ class TrmManager:
     Attributes
     ----------
     db : Database
+    fs_index : FsIndex
+        Cache of directory listings of the current run.
     print_dir : str
         Directory where to collect documents for printing.
+    progress : ProgressReporter
+        Reporter to which processing stages report their progress.
     trm_dir : str
         Directory where to look for transmittals.
     vdr_dir : str
@@ -36,32 +62,50 @@ class TrmManager:
 
     Methods
     -------
+    add_received_transmittals(paths: list)
+        Adds transmittals which have arrived after the last DB update.
+    clear_item_name(raw_name: str)
+        Gets name of the item from name of its file or folder.
+    clear_journals()
+        Deletes journals of completed work units.
     create_crs(cur_trm: Transmittal)
         Creates comment review sheet for every existing document in the transmittal; optionally creates title page.
     create_trm_inventory(cur_trm: Transmittal, send_date: str)
         Creates transmittal inventory files.
+    get_doc_history(doc_number: str)
+        Gets history of the document.
+    get_trm_history(trm_name: str)
+        Gets history events of all documents sent or received with the transmittal.
     parse_trm_docs(cur_trm: Transmittal, send_date: str)
         Parses data in documents corresponding to the current transmittal.
-    prepare_docs_for_printing(cur_vdr: Document)
+    prepare_docs_for_printing(cur_vdr: Document, hard_link=False, bundle=False)
         Performs all preparations needed for printing documents from received transmittals.
+    process_received_batch(trm_list: list)
+        Parses documents in the transmittals and fills required fields in VDR once per phase.
     process_received_transmittals(cur_trm: Transmittal)
         Parses documents in selected transmittal and filled up required fields in VDR.
+    search_documents(text: str, limit=50)
+        Finds documents by words.
     update_db(is_received=False)
         Updates database by adding new TRMs and VDRs.
     update_paths_and_files(update_docs=False)
         Updates paths to TRMs and updates file list corresponding to the TRM.
     """
 
-    def __init__(self, trm_dir: str, vdr_dir: str, print_dir: str):
+    def __init__(self, trm_dir: str, vdr_dir: str, print_dir: str, progress=None):
         warnings.filterwarnings('ignore', category=UserWarning)
 
-        self.__cfg = config.get_config()
+        if progress is None:
+            progress = ProgressReporter()
+        self.progress = progress
+
+        self.__cfg = config.get_project_config()
         self.__trm_dir = os.path.abspath(trm_dir)
         self.__vdr_dir = os.path.abspath(vdr_dir)
         self.__print_dir = print_dir
 
         print('Trying to load database...')
-        prc_dir = self.__cfg[0]['process_dir']
+        prc_dir = self.__cfg.process_dir
 
         if not os.path.exists(prc_dir):
             try:
@@ -71,6 +115,109 @@ class TrmManager:
 
         self.__db_path = os.path.join(prc_dir, 'db.pickle')
         self.db = DataBase(self.__db_path)
+        self.fs_index = None
+        self.__native_resolvers = {}
+        self.__reset_fs_index()
+        self.__date_extractor = RevisionDateExtractor(os.path.join(prc_dir, 'date_cache.pickle'))
+        self.__content_index = ContentIndex(os.path.join(prc_dir, 'content_index.pickle'))
+        self.__search_index = SearchIndex(os.path.join(prc_dir, 'search_index.sqlite'))
+        self.__doc_history = DocHistory(os.path.join(prc_dir, 'doc_history.pickle'))
+        self.__format_classifier = PageFormatClassifier(self.__cfg.format_table)
+        # Файлы PDF разбираются в отдельных процессах, сбойные файлы попадают в карантин
+        self.__pdf_inspector = get_shared_inspector(os.path.join(prc_dir, 'pdf_quarantine.json'))
+        # Журналы выполненных частей длительных операций для продолжения после сбоя
+        self.__print_journal = JobJournal(os.path.join(prc_dir, 'print_journal.jsonl'))
+        self.__receive_journal = JobJournal(os.path.join(prc_dir, 'receive_journal.jsonl'))
+
+        # Блокировки VDR: трансмиттелы разных фаз могут обрабатываться параллельно
+        self.__vdr_locks = {}
+        self.__vdr_locks_guard = threading.Lock()
+        # Прочитанные VDR и справочник CSV_DB хранятся в памяти, пока файлы не изменены
+        self.__sheet_cache = {}
+        self.__sheet_cache_lock = threading.Lock()
+
+    def __get_vdr_lock(self, vdr_path: str):
+        """
+        Gets the lock guarding access to VDR file, so that only one thread reads or writes it at a time.
+
+        Parameters
+        ----------
+        vdr_path : str
+            Path to VDR file.
+
+        Returns
+        -------
+        threading.Lock
+        """
+        with self.__vdr_locks_guard:
+            if vdr_path not in self.__vdr_locks:
+                self.__vdr_locks[vdr_path] = threading.Lock()
+            return self.__vdr_locks[vdr_path]
+
+    def clear_journals(self):
+        """
+        Deletes journals of completed work units. It is to be called when the whole batch of jobs has succeeded,
+        otherwise the next run resumes where the previous one stopped.
+
+        Returns
+        -------
+        None
+        """
+        self.__print_journal.clear()
+        self.__receive_journal.clear()
+
+    def __reset_fs_index(self):
+        """
+        Starts new run over the file system: drops cached directory listings and everything built from them.
+
+        Returns
+        -------
+        None
+        """
+        self.fs_index = FsIndex()
+        self.__native_resolvers = {}
+
+    def __get_native_resolver(self, cur_trm: Transmittal):
+        """
+        Gets resolver of native files for the transmittal, it is built once per run.
+
+        Parameters
+        ----------
+        cur_trm : Transmittal
+            Current transmittal.
+
+        Returns
+        -------
+        NativeFileResolver
+        """
+        resolver = self.__native_resolvers.get(cur_trm.path)
+        if resolver is None:
+            resolver = NativeFileResolver(cur_trm.path, self.fs_index)
+            self.__native_resolvers[cur_trm.path] = resolver
+        return resolver
+
+    @staticmethod
+    def clear_item_name(raw_name: str):
+        """
+        Gets name of the item (VDR or transmittal) from name of its file or folder.
+
+        Parameters
+        ----------
+        raw_name : str
+
+        Returns
+        -------
+        item_name : str
+        """
+        if '.xls' in raw_name:
+            item_name = raw_name.split('.xls')[0]
+        elif '.XLS' in raw_name:
+            item_name = raw_name.split('.XLS')[0]
+        else:
+            item_name = re.sub(r'(?<=TRM-\d{5}).*$', r'', raw_name)
+
+        item_name = item_name.strip()
+        return item_name
 
     def __parse_files(self, db: DataBase, item_type: str, is_received=False):
         """
@@ -88,45 +235,31 @@ class TrmManager:
         -------
         None
         """
-
-        def clear_name(raw_name: str):
-            if '.xls' in raw_name:
-                item_name = raw_name.split('.xls')[0]
-            elif '.XLS' in raw_name:
-                item_name = raw_name.split('.XLS')[0]
-            else:
-                item_name = re.sub(r'(?<=TRM-\d{5}).*$', r'', raw_name)
-
-            item_name = item_name.strip()
-            return item_name
-
-        mask_dict = self.__cfg[1]
-
-        mask = ''
+        matcher = None
         directory = ''
 
         if item_type == 'vdr':
             directory = self.__vdr_dir
-            mask = mask_dict['vdr_mask']
+            matcher = self.__cfg.vdr_matcher
         elif item_type == 'trm':
             directory = self.__trm_dir
 
             if is_received:
-                mask = mask_dict['received_trm_mask']
+                matcher = self.__cfg.received_trm_matcher
             else:
-                mask = mask_dict['send_trm_mask']
+                matcher = self.__cfg.send_trm_matcher
 
-        for item in os.listdir(directory):
-            if fnmatch.fnmatch(item, mask):
-                path = os.path.join(directory, item)
-                name = clear_name(item)
+        for entry in self.fs_index.scan(directory):
+            if matcher is not None and matcher.match(entry.name):
+                path = entry.path
+                name = self.clear_item_name(entry.name)
                 if item_type == 'trm':
-                    if os.path.isdir(path):
-                        obj = Transmittal(name, path)
+                    if entry.is_dir:
+                        obj = Transmittal(name, path, fs_index=self.fs_index)
                         db.add_item(obj)
                         print('{} was added to DB'.format(obj.name))
                 elif item_type == 'vdr':
-                    if os.path.isfile(path):
+                    if entry.is_file:
                         obj = Document(name, path)
                         db.add_item(obj)
                         print('{} was added to DB'.format(obj.name))
@@ -148,12 +281,161 @@ class TrmManager:
         None
         """
         print('DB is updating now...')
+        # Каждое обновление БД начинает новый проход по файловой системе
+        self.__reset_fs_index()
         self.db.clear_db()
         self.__parse_files(self.db, 'vdr')
         self.__parse_files(self.db, 'trm', is_received)
         self.db.save_db()
         print('DB was successfully updated')
 
+        # Проиндексированные трансмиттелы дополняются при обработке, здесь добавляются только новые
+        indexed_trms = self.__search_index.get_trms()
+        item_names_list = self.db.get_item_names()
+        trm_list = [self.db.get_item(i) for i, name in enumerate(item_names_list) if name not in indexed_trms]
+        trm_list = [trm for trm in trm_list if isinstance(trm, Transmittal) and trm.documents]
+        if trm_list:
+            print('Adding {} new transmittals to the search index...'.format(len(trm_list)))
+            bar = self.progress.stage('Search index updating', len(trm_list))
+            summary = InspectionSummary()
+            for trm in trm_list:
+                self.__index_trm_documents(trm, summary)
+                bar.advance()
+            bar.finish()
+            print(summary)
+
+    def add_received_transmittals(self, paths: list):
+        """
+        Adds transmittals which have arrived after the last DB update, without scanning the whole directory.
+
+        Parameters
+        ----------
+        paths : list
+            Paths to folders of the received transmittals.
+
+        Returns
+        -------
+        trm_list : list
+            Transmittals in the order of paths.
+        """
+        # Состав новых папок мог измениться после прошлого прохода по файловой системе
+        self.__reset_fs_index()
+        item_names = self.db.get_item_names()
+        trm_list = []
+        for path in paths:
+            obj = Transmittal(self.clear_item_name(os.path.basename(path)), path, fs_index=self.fs_index)
+            # Трансмиттел, уже имеющийся в БД, обрабатывается по актуальному составу папки
+            if obj.name not in item_names:
+                self.db.add_item(obj)
+                item_names.append(obj.name)
+                print('{} was added to DB'.format(obj.name))
+            trm_list.append(obj)
+        self.db.save_db()
+        return trm_list
+
+    def __index_trm_documents(self, cur_trm: Transmittal, summary=None):
+        """
+        Adds title page text of the transmittal documents to the search index. Only new and changed files
+        are read, documents which are no longer in the transmittal are removed from the index.
+
+        Parameters
+        ----------
+        cur_trm : Transmittal
+        summary : InspectionSummary, default=None
+            Statistics of pdf-files inspection.
+
+        Returns
+        -------
+        None
+        """
+        paths = []
+        for doc_name in cur_trm.documents:
+            file_path = self.__find_doc_pdf(cur_trm, doc_name)
+            if file_path is None:
+                continue
+            paths.append(file_path)
+            if self.__search_index.is_current(file_path):
+                continue
+            try:
+                title_text = self.__pdf_inspector.get_title_text(file_path, summary)
+            except FileNotFoundError:
+                continue
+            if title_text is not None:
+                self.__search_index.update_document(file_path, doc_name, cur_trm.name,
+                                                    self.__get_doc_number(doc_name), title_text)
+        self.__search_index.remove_other_documents(cur_trm.name, paths)
+        self.__search_index.commit()
+
+    def __update_search_names(self, vdr_path: str, sheet_data: SheetValues):
+        """
+        Updates documents names in the search index from VDR values if VDR has been changed since the last update.
+
+        Parameters
+        ----------
+        vdr_path : str
+            Path to VDR file.
+        sheet_data : SheetValues
+            Values of VDR worksheet (see __read_vdr_data).
+
+        Returns
+        -------
+        None
+        """
+        if self.__search_index.is_source_current(vdr_path):
+            return
+        names = []
+        for row in range(VDR_HEADER_ROWS + 1, sheet_data.max_row + 1):
+            number = sheet_data.cell(row=row, column=41).value
+            if number is None:
+                continue
+            # Номер документа, наименование (рус.), наименование (англ.)
+            name_ru = sheet_data.cell(row=row, column=50).value
+            name_en = sheet_data.cell(row=row, column=49).value
+            names.append((self.__preprocess_str(number), self.__preprocess_str(name_ru),
+                          self.__preprocess_str(name_en)))
+        self.__search_index.update_names(vdr_path, names)
+        self.__search_index.commit()
+
+    def __refresh_search_names(self):
+        """
+        Updates documents names in the search index from all the VDRs in DB which have been changed since the last
+        update.
+
+        Returns
+        -------
+        None
+        """
+        item_names_list = self.db.get_item_names()
+        for i in range(len(item_names_list)):
+            vdr = self.db.get_item(i)
+            if isinstance(vdr, Document) and not self.__search_index.is_source_current(vdr.path):
+                with self.__get_vdr_lock(vdr.path):
+                    try:
+                        sheet_data = self.__read_vdr_data(vdr.path)
+                    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+                        print('ERROR: names cannot be read from {} ({})'.format(vdr.name, e), file=sys.stderr)
+                        continue
+                    self.__update_search_names(vdr.path, sheet_data)
+
+    def search_documents(self, text: str, limit=50):
+        """
+        Finds documents by words of the title page, names from VDR, number or transmittal name.
+
+        Parameters
+        ----------
+        text : str
+            Words to be found, e.g. 'Схема подключения'.
+        limit : int, default=50
+            Maximum number of results.
+
+        Returns
+        -------
+        results : list
+            List of SearchResult, the best matches go first.
+        """
+        self.__refresh_search_names()
+        return self.__search_index.search(text, limit)
+
     def update_paths_and_files(self, update_docs=False):
         """
         Updates paths to TRMs and updates file list corresponding to the TRM.
@@ -166,20 +448,42 @@ class TrmManager:
         -------
         None
         """
-        self.db.update_db(update_docs)
+        self.__reset_fs_index()
+        self.db.update_db(update_docs, self.fs_index)
         s = 'and documents ' if not update_docs else ''
         print('Paths {}in DB was successfully updated'.format(s))
 
+    @staticmethod
+    def __get_doc_number(doc_name: str):
+        """
+        Gets document number as it is written in VDR from the document file name.
+
+        Parameters
+        ----------
+        doc_name : str
+            Name of the document file without extension (e.g. '0055-CPC-GA1-4.2-ER-...-0001_00_EN').
+
+        Returns
+        -------
+        str
+            Document number (e.g. '0055-CPC-GA1-4.2-ER-...-0001' with the point before the last two parts)
+            or doc_name if it is not a name of document file.
+        """
+        if 'ER' not in doc_name:
+            return doc_name
+        s = re.sub(r'_.*$', '', doc_name)
+        return re.sub(r'-(?=[\w\d]{2}-[\d]{4})', r'.', s)
+
     # Функция для нахождения номера строки,
     # в которой находятся данные по конкретному документу
-    def __get_vdr_ind(self, xlsheet: Worksheet, doc_name: str):
+    def __get_vdr_ind(self, xlsheet: SheetValues, doc_name: str):
         """
         Finds a VDR row index which contains selected document data.
 
         Parameters
         ----------
-        xlsheet : Worksheet
-            Worksheet of VDR file.
+        xlsheet : SheetValues
+            Values of VDR worksheet.
         doc_name : str
             Name or number of target document.
 
@@ -189,26 +493,23 @@ class TrmManager:
             Row index where target document info locates.
         """
         if 'ER' in doc_name:
-            s = re.sub(r'_.*$', '', doc_name)
-            s = re.sub(r'-(?=[\w\d]{2}-[\d]{4})', r'.', s)
-            return self.__get_vdr_ind(xlsheet, s)
+            return self.__get_vdr_ind(xlsheet, self.__get_doc_number(doc_name))
         else:
-            for i in range(13, xlsheet.max_row + 1):
-                cur_cell_value = xlsheet.cell(row=i, column=41).value
-                if cur_cell_value is not None and cur_cell_value == doc_name:
-                    return i
+            i = xlsheet.find_row(41, doc_name, min_row=VDR_HEADER_ROWS + 1)
+            if i is not None:
+                return i
         print('ERROR: there is no {} in VDR!'.format(doc_name), file=sys.stderr)
         return None
 
     @staticmethod
-    def __find_issued_cols(xlsheet: Worksheet, revision: str):
+    def __find_issued_cols(xlsheet: SheetValues, revision: str):
         """
         Finds VDR column with issue info.
 
         Parameters
         ----------
-        xlsheet : Worksheet
-            Worksheet of VDR file.
+        xlsheet : SheetValues
+            Values of VDR worksheet.
         revision : str
             Revision of target document.
             It consists of a letter and a digit or of two digits, for example: 'A1', '01'.
@@ -232,6 +533,89 @@ class TrmManager:
                 issue_cols.append(i + 2)
         return issue_cols
 
+    def __get_cached_sheets(self, path: str, read):
+        """
+        Gets values read from the file by the function: they are read again only if the file has been changed.
+
+        Parameters
+        ----------
+        path : str
+        read : callable
+            Function reading values from the file.
+
+        Returns
+        -------
+        Values returned by read (they are shared and must not be changed).
+        """
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        key = os.path.normcase(os.path.abspath(path))
+        with self.__sheet_cache_lock:
+            item = self.__sheet_cache.get(key)
+        if item is not None and item[0] == signature:
+            return item[1]
+        values = read(path)
+        with self.__sheet_cache_lock:
+            self.__sheet_cache[key] = (signature, values)
+        return values
+
+    def __read_vdr_data(self, vdr_path: str):
+        """
+        Reads values of VDR worksheet required for documents processing: the whole header and only columns with
+        document properties and issue info in the rest rows. Values are kept in memory while VDR is not changed.
+
+        Parameters
+        ----------
+        vdr_path : str
+            Path to VDR file.
+
+        Returns
+        -------
+        sheet_data : SheetValues
+            Values of VDR worksheet.
+        """
+        def read(path: str):
+            with XlsxStreamReader(path) as reader:
+                sheet_data = reader.read_values('VDR', max_row=VDR_HEADER_ROWS)
+                columns = set(VDR_DATA_COLUMNS)
+                for i in range(62, sheet_data.max_column + 1):
+                    if 'issue for' in str(sheet_data.cell(row=9, column=i).value):
+                        columns.update(i + 2 + offset for offset in VDR_ISSUE_OFFSETS)
+                reader.read_values('VDR', sorted(columns), min_row=VDR_HEADER_ROWS + 1, sheet_values=sheet_data)
+            return sheet_data
+
+        return self.__get_cached_sheets(vdr_path, read)
+
+    def __read_csv_db(self, csv_db_path: str):
+        """
+        Reads reference data for CSV inventory. Values are kept in memory while the file is not changed.
+
+        Parameters
+        ----------
+        csv_db_path : str
+            Path to 'CSV_DB.xlsx'.
+
+        Returns
+        -------
+        numbers_sheet : SheetValues
+            Descriptions of documents by document number (sheet 'Лист1').
+        types_sheet : SheetValues
+            Descriptions of document type codes (sheet 'Лист2').
+        doc_number_list : list
+            Document numbers (the first column of numbers_sheet).
+        doc_type_code_list : list
+            Document type codes (the first column of types_sheet).
+        """
+        def read(path: str):
+            with XlsxStreamReader(path) as reader:
+                numbers_sheet = reader.read_values('Лист1')
+                types_sheet = reader.read_values('Лист2')
+            doc_number_list = [numbers_sheet.cell(row=i, column=1).value for i in range(1, numbers_sheet.max_row + 1)]
+            doc_type_code_list = [types_sheet.cell(row=i, column=1).value for i in range(1, types_sheet.max_row + 1)]
+            return numbers_sheet, types_sheet, doc_number_list, doc_type_code_list
+
+        return self.__get_cached_sheets(csv_db_path, read)
+
     def __find_vdr(self, phase: str):
         """
         Finds required VDR in DB using phase provided.
@@ -245,12 +629,11 @@ class TrmManager:
         vdr_path : str
             Path to VDR file.
         """
-        mask = self.__cfg[1]['vdr_mask']
-        mask = mask.split('*')[0] + phase + '*'
+        matcher = self.__cfg.vdr_phase_matcher(phase)
         item_name_list = self.db.get_item_names()
         vdr = None
         for item_name in item_name_list:
-            if fnmatch.fnmatch(item_name, mask):
+            if matcher.match(item_name):
                 id_ = item_name_list.index(item_name)
                 vdr = self.db.get_item(id_)
                 return vdr.path
@@ -294,23 +677,23 @@ class TrmManager:
         None
         """
 
-        def get_doc_info(xlsheet: Worksheet, xlsheet_data: Worksheet, doc_name: str):
+        def get_doc_info(patcher: XlsxPatcher, xlsheet_data: SheetValues, doc_name: str):
             """
             Gets selected document info in VDR provided.
 
             Parameters
             ----------
-            xlsheet : Worksheet
-                VDR file worksheet.
-            xlsheet_data : Worksheet
-                VDR file worksheet (data only).
+            patcher : XlsxPatcher
+                Collects changes of VDR file.
+            xlsheet_data : SheetValues
+                VDR file worksheet values.
             doc_name : str
                 Name of the target document.
 
             Returns
             -------
-            info_list : list
-                List with document information required.
+            record : SentDocRecord
+                Document information required.
             is_changed : bool
                 Whether VDR has been changed or not.
             """
@@ -357,9 +740,9 @@ class TrmManager:
                 ind = issue_list.index(revision)
                 for index, date_col in enumerate(issue_cols[:ind + 1]):
                     if index == ind:
-                        xlsheet.cell(row=vdr_ind, column=date_col).value = datetime.datetime.strptime(send_date,
-                                                                                                      r'%d.%m.%Y')
-                        xlsheet.cell(row=vdr_ind, column=date_col + 1).value = cur_trm.name
+                        patcher.set_value('VDR', vdr_ind, date_col,
+                                          datetime.datetime.strptime(send_date, r'%d.%m.%Y'))
+                        patcher.set_value('VDR', vdr_ind, date_col + 1, cur_trm.name)
                         date_list_.append(send_date)
                         is_changed = True
                     else:
@@ -376,14 +759,14 @@ class TrmManager:
                 if not date_list_ or len(date_list_) < ind + 1:
                     date_col = issue_cols[ind]
                     cur_date = datetime.datetime.now().date()
-                    xlsheet.cell(row=vdr_ind, column=date_col).value = cur_date
-                    xlsheet.cell(row=vdr_ind, column=date_col + 1).value = cur_trm.name
+                    patcher.set_value('VDR', vdr_ind, date_col, cur_date)
+                    patcher.set_value('VDR', vdr_ind, date_col + 1, cur_trm.name)
                     date_list_.append(cur_date.strftime('%d.%m.%Y'))
                     is_changed = True
 
                 return date_list_, is_changed
 
-            [ifr_list, ifu_list] = self.__cfg[2].values()
+            ifr_list, ifu_list = self.__cfg.ifr_list, self.__cfg.ifu_list
             issue_cols = self.__find_issued_cols(xlsheet_data, revision)
             # Соберём список дат отправленных трансмиттелов до текущей ревизии.
             # Если номер ревизии не букво-цифровой, то искать в столбцах 00, 01,..
@@ -398,10 +781,10 @@ class TrmManager:
             # Тип кода документа
             doc_type_code = self.__preprocess_str(xlsheet_data.cell(row=vdr_ind, column=40).value)
 
-            info_list = [doc_issue, doc_class, doc_name_ru, doc_name_en, revision, doc_number, date_list,
-                         doc_discipline_code, doc_type_code]
+            record = SentDocRecord(doc_issue, doc_class, doc_name_ru, doc_name_en, revision, doc_number, date_list,
+                                   doc_discipline_code, doc_type_code)
 
-            return info_list, is_changed
+            return record, is_changed
 
         print('Parsing TRM docs info...')
 
@@ -413,44 +796,43 @@ class TrmManager:
             if vdr_tmp is None:
                 print('ERROR: there is no VDR for phase {}!'.format(phase), file=sys.stderr)
                 continue
-            # Загрузим данный VDR, при этом считываем только значения в ячейках
-            wb = load_workbook(vdr_tmp)
-            sheet = wb['VDR']
-            wb_data = load_workbook(vdr_tmp, data_only=True)
-            sheet_data = wb_data['VDR']
-
-            documents = [
-                doc
-                for doc, doc_phase in zip(cur_trm.documents, cur_trm.phases)
-                if doc_phase == phase
-            ]
-
-            total = len(documents)
-            bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
-            check = 0
-            for doc in documents:
-                doc_info, is_changed = get_doc_info(sheet, sheet_data, doc)
-                if is_changed:
-                    check += 1
-                if doc_info is None:
-                    bar.print_progress_bar()
-                    continue
-                cur_trm.documents[doc] = doc_info
-                bar.print_progress_bar()
-
-            # i = 0
-            # if check:
-            #     while True:
-            #         try:
-            #             wb.save(vdr_tmp)
-            #             print('{} was changed and saved.'.format(os.path.split(vdr_tmp)[1]))
-            #             break
-            #         except PermissionError:
-            #             if not i:
-            #                 print('Please, close the file {} !'.format(os.path.split(vdr_tmp)[1]))
-            #                 i += 1
-            wb.close()
-            wb_data.close()
+
+            with self.__get_vdr_lock(vdr_tmp):
+                # Загрузим данный VDR, при этом считываем только значения в ячейках
+                patcher = XlsxPatcher(vdr_tmp)
+                sheet_data = self.__read_vdr_data(vdr_tmp)
+                self.__update_search_names(vdr_tmp, sheet_data)
+
+                documents = [
+                    doc
+                    for doc, doc_phase in zip(cur_trm.documents, cur_trm.phases)
+                    if doc_phase == phase
+                ]
+
+                total = len(documents)
+                bar = self.progress.stage('TRM docs parsing', total)
+                check = 0
+                for doc in documents:
+                    doc_info, is_changed = get_doc_info(patcher, sheet_data, doc)
+                    if is_changed:
+                        check += 1
+                    if doc_info is None:
+                        bar.advance()
+                        continue
+                    cur_trm.documents[doc] = doc_info
+                    bar.advance()
+
+                # i = 0
+                # if check:
+                #     while True:
+                #         try:
+                #             patcher.save()
+                #             print('{} was changed and saved.'.format(os.path.split(vdr_tmp)[1]))
+                #             break
+                #         except PermissionError:
+                #             if not i:
+                #                 print('Please, close the file {} !'.format(os.path.split(vdr_tmp)[1]))
+                #                 i += 1
 
         print('TRM docs parsing was successfully ended')
 
@@ -502,7 +884,7 @@ class TrmManager:
             Parameters
             ----------
             file_dict : dict
-                Files dictionary with required information.
+                Files dictionary with required information (SentDocRecord).
             file_name : str
                 Selected file name.
             path_trm : str
@@ -513,20 +895,20 @@ class TrmManager:
             None
             """
             print(f'Adding title sheets to {file_name}...')
-            tit_path = os.path.join(self.__cfg[0]['templates_dir'], 'tit_template.xlsx')
+            tit_path = os.path.join(self.__cfg.templates_dir, 'tit_template.xlsx')
             pasport = load_workbook(tit_path)
             pasport_tit = pasport['Cover Page']
             # Наименование документа (рус.)
-            doc_name_ru = (str(file_dict[file_name][2]).upper()).replace('\n', ' ')
+            doc_name_ru = (str(file_dict[file_name].name_ru).upper()).replace('\n', ' ')
             self.__unmerge_write_merge(pasport_tit, 'H15:O15', doc_name_ru)
             # Наименование документа (англ.)
-            doc_name_en = (str(file_dict[file_name][3]).upper()).replace('\n', ' ')
+            doc_name_en = (str(file_dict[file_name].name_en).upper()).replace('\n', ' ')
             self.__unmerge_write_merge(pasport_tit, 'H16:O16', doc_name_en)
             # Ревизия поставщика
-            doc_rev = file_dict[file_name][4]
+            doc_rev = file_dict[file_name].revision
             self.__unmerge_write_merge(pasport_tit, 'H23:O23', doc_rev)
             # Номер документа
-            doc_number = file_dict[file_name][5]
+            doc_number = file_dict[file_name].number
             self.__unmerge_write_merge(pasport_tit, 'H17:O17', doc_number)
             # Наименование документа (рус+англ) в колонтитуле
             ru_en = doc_name_ru + '\n' + doc_name_en
@@ -549,9 +931,9 @@ class TrmManager:
                 -------
                 None
                 """
-                issue = file_dict[file_name][0]  # Цель выпуска
+                issue = file_dict[file_name].issue  # Цель выпуска
                 # Список дат из словаря документов
-                date_list = file_dict[file_name][6]
+                date_list = file_dict[file_name].dates
                 # Длина списка дат до даты отправки текущего трансмиттела включительно
                 date_list_len = len(date_list)
                 k = 0  # Начальное значение счётчика
@@ -586,7 +968,7 @@ class TrmManager:
 
                     k += 1  # Инкремент счётчика
 
-            [ifr_list, ifu_list] = self.__cfg[2].values()
+            ifr_list, ifu_list = self.__cfg.ifr_list, self.__cfg.ifu_list
             if doc_rev in ifu_list:
                 fill_revision_field(ifu_list)
             else:
@@ -594,7 +976,7 @@ class TrmManager:
 
             file_path = os.path.join(path_trm, file_name)
             passport_name = file_name + '.xlsx'
-            if os.path.isdir(file_path):
+            if self.fs_index.isdir(file_path):
                 passport_path = os.path.join(file_path, passport_name)
             else:
                 passport_path = os.path.join(path_trm, passport_name)
@@ -615,11 +997,13 @@ class TrmManager:
         print('Creating CRS files...')
         trm_name = cur_trm.name
         trm_path = cur_trm.path
-        template_path = os.path.join(self.__cfg[0]['templates_dir'], 'template.xlsx')
+        template_path = os.path.join(self.__cfg.templates_dir, 'template.xlsx')
 
         file_dict = cur_trm.documents
+        native_resolver = self.__get_native_resolver(cur_trm)
         total = len(cur_trm.documents)
-        bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
+        bar = self.progress.stage('CRS files creation', total)
+        crs_dirs = set()
         for doc in file_dict:
             if file_dict[doc]:
                 # Загрузим образец CRS
@@ -627,47 +1011,52 @@ class TrmManager:
                 template_sheet = template[template.sheetnames[0]]
                 # Заполним нужные поля
                 self.__unmerge_write_merge(template_sheet, 'E7:F7', trm_name)
-                trm_date = file_dict[doc][6][-1]
+                trm_date = file_dict[doc].last_date
                 template_sheet['I7'] = trm_date
-                doc_issue = file_dict[doc][0]
+                doc_issue = file_dict[doc].issue
                 template_sheet['A22'] = doc_issue
-                doc_number = file_dict[doc][5]
+                doc_number = file_dict[doc].number
                 template_sheet['B22'] = doc_number
-                doc_class = file_dict[doc][1]
+                doc_class = file_dict[doc].doc_class
                 template_sheet['C22'] = doc_class
 
-                doc_name_ru = str(file_dict[doc][2])
-                doc_name_en = str(file_dict[doc][3])
+                doc_name_ru = str(file_dict[doc].name_ru)
+                doc_name_en = str(file_dict[doc].name_en)
                 ru_en = doc_name_ru + '\n' + doc_name_en
                 self.__unmerge_write_merge(template_sheet, 'D22:E22', ru_en)
 
-                doc_rev = file_dict[doc][4]
+                doc_rev = file_dict[doc].revision
                 template_sheet['F22'] = doc_rev
                 # Сохраним файл CRS в корень TRM или в папку с документом, если
                 # файлы хранятся в отдельных папках
                 crs_name = str(doc) + '_CRS.xlsx'
                 file_path = os.path.join(trm_path, doc)
-                if os.path.isfile(file_path + '.pdf'):
+                if native_resolver.has_pdf_in_root(doc):
                     crs_path = os.path.join(trm_path, crs_name)
                 else:
                     crs_path = os.path.join(file_path, crs_name)
                 template.save(crs_path)
+                crs_dirs.add(os.path.dirname(crs_path))
                 # Если необходимо добавить титульник к паспорту
                 # code_type_list = ['JH', 'LB']
-                # if file_dict[doc][-1] in code_type_list:
+                # if file_dict[doc].type_code in code_type_list:
                 #     new_tit(file_dict, doc, trm_path)
             else:
                 print('ERROR: {} has no info!'.format(doc), file=sys.stderr)
-            bar.print_progress_bar()
+            bar.advance()
+        # Созданные файлы CRS должны быть видны при следующих обращениях к папкам
+        for crs_dir in crs_dirs:
+            self.fs_index.invalidate(crs_dir)
         print('CRS files creation was successfully completed')
 
-    def __get_sheet_format_from_pdf(self, pdf_file: PdfFileReader, return_format_list=False):
+    def __get_sheet_format_from_pdf(self, pages: list, return_format_list=False):
         """
         Gets sheets format from selected pdf file.
 
         Parameters
         ----------
-        pdf_file: PdfFileReader
+        pages: list
+            Boxes of the pdf-file pages (PageBox).
         return_format_list: bool, default=False
             Whether to return list with formats of each page or not.
 
@@ -678,39 +1067,36 @@ class TrmManager:
         format_list : list
             If return_format_list=True returns list of formats.
         """
-        precision = 0.2
-        format_dict = self.__cfg[3]
-
-        page_count = pdf_file.getNumPages()
-        pages_w_h = [(float(pdf_file.getPage(i).mediaBox.getWidth() / 72),
-                      float(pdf_file.getPage(i).mediaBox.getHeight() / 72)) for i in range(page_count)]
-        format_list = []
-        for w_h in pages_w_h:
-            page_format = ''
-            for fmt in format_dict:
-                for fmt_value in format_dict[fmt]:
-                    if abs(fmt_value[0] - w_h[0]) <= precision and abs(fmt_value[1] - w_h[1]) <= precision:
-                        page_format = fmt
-                    elif abs(fmt_value[0] - w_h[1]) <= precision and abs(fmt_value[1] - w_h[0]) <= precision:
-                        page_format = fmt
-            if not page_format:
-                page_format = 'Other'
-
-            format_list.append(page_format)
-
+        format_list = self.__format_classifier.classify((page.width / 72, page.height / 72) for page in pages)
         if return_format_list:
             return format_list
+        return self.__format_classifier.summarize(format_list)
 
-        format_set_list = list(set(format_list))
-        format_set_list.sort()
+    @staticmethod
+    def __find_doc_pdf(cur_trm: Transmittal, doc_name: str):
+        """
+        Finds pdf-file of the document in the transmittal folder or in the document subfolder (as __open_pdf does).
 
-        text = ', '.join(format_set_list)
-        return text
+        Parameters
+        ----------
+        cur_trm : Transmittal
+        doc_name : str
 
-    @staticmethod
-    def __open_pdf(cur_trm: Transmittal, doc_name: str, bar=None):
+        Returns
+        -------
+        file_path : str or None
+            None if the file was not found.
+        """
+        for file_path in (os.path.join(cur_trm.path, doc_name + '.pdf'),
+                          os.path.join(cur_trm.path, doc_name, doc_name + '.pdf')):
+            if os.path.isfile(file_path):
+                return file_path
+        return None
+
+    def __open_pdf(self, cur_trm: Transmittal, doc_name: str, bar=None, summary=None):
         """
-        Tries to open pdf-file using path to the transmittal, if failed tries to open it in subfolder.
+        Tries to read pages of pdf-file using path to the transmittal, if failed tries to read it in subfolder.
+        Only the page tree is read (see PdfPageScanner) in a worker process of PdfInspector.
 
         Parameters
         ----------
@@ -718,33 +1104,40 @@ class TrmManager:
             Current transmittal.
         doc_name : str
             Selected document name.
-        bar : PrintProgressBar, default=None
-            Progress bar instance.
+        bar : ProgressStage, default=None
+            Progress stage instance.
+        summary : InspectionSummary, default=None
+            Statistics of pdf-files inspection.
 
         Returns
         -------
-        pdf : PdfFileReader
+        pages : list
+            Boxes of the pages (PageBox), None if the file was not found or cannot be read.
         file_path : str
             Path to selected document.
         """
         file_path = os.path.join(cur_trm.path, doc_name + '.pdf')
         try:
-            pdf = PdfFileReader(file_path, strict=False)
+            pages = self.__pdf_inspector.read_pages(file_path, summary)
         except FileNotFoundError:
             file_path = os.path.join(cur_trm.path, doc_name, doc_name + '.pdf')
             try:
-                pdf = PdfFileReader(file_path, strict=False)
+                pages = self.__pdf_inspector.read_pages(file_path, summary)
             except FileNotFoundError:
                 if bar:
-                    bar.print_progress_bar()
+                    bar.advance()
                 print('ERROR: {}.pdf was not found in {}'.format(doc_name, cur_trm.name), file=sys.stderr)
                 return None, None
+        if pages is None:
+            if bar:
+                bar.advance()
+            return None, None
         if cur_trm.documents[doc_name] is None:
             if bar:
-                bar.print_progress_bar()
+                bar.advance()
             print('ERROR: {} has no info!'.format(doc_name), file=sys.stderr)
             return None, None
-        return pdf, file_path
+        return pages, file_path
 
     def create_trm_inventory(self, cur_trm: Transmittal, send_date: str):
         """
@@ -761,90 +1154,7 @@ class TrmManager:
         -------
         None
         """
-
-        def get_date_from_pdf(filename: str):
-            """
-            Parses date from pdf-file.
-
-            Parameters
-            ----------
-            filename : str
-                Path to the target file.
-
-            Returns
-            -------
-            date : str
-                Date of last revision.
-            """
-            month_dict = {
-                'jan': '01',
-                'feb': '02',
-                'mar': '03',
-                'apr': '04',
-                'may': '05',
-                'jun': '06',
-                'jul': '07',
-                'aug': '08',
-                'sep': '09',
-                'oct': '10',
-                'nov': '11',
-                'dec': '12'
-            }
-
-            with fitz.open(filename) as f:
-                try:
-                    page1_text = f.loadPage(0).getText('text')
-                except:
-                    print('ERROR: {} is empty!'.format(os.path.split(filename)[-1]), file=sys.stderr)
-                    return ''
-                try:
-                    page2_text = f.loadPage(1).getText('text')
-                except:
-                    page2_text = ''
-
-            def get_temp_date_list(page: str):
-                """
-                Parses dates from pdf-file.
-
-                Parameters
-                ----------
-                page : str
-                    Page contents.
-
-                Returns
-                -------
-                temp_list : list
-                    Temporary list of parsed dates.
-                """
-                temp_list = []
-                date_format_ru = r'\d\d\.\d\d\.\d{4}'
-                date_format_en = r'\d\d-\w{3}-\d{4}'
-                match_ru = re.findall(date_format_ru, page)
-                match_en = re.findall(date_format_en, page)
-                if match_ru:
-                    for date_time in match_ru:
-                        temp_list.append(datetime.datetime.strptime(date_time, '%d.%m.%Y'))
-                elif match_en:
-                    for date_time in match_en:
-                        month = re.findall(r'\w{3}', date_time)[0]
-                        sub = r'.' + month_dict[month.lower()] + r'.'
-                        date_time_ru = re.sub(r'-\w{3}-', sub, date_time)
-                        temp_list.append(datetime.datetime.strptime(date_time_ru, '%d.%m.%Y'))
-                return temp_list
-
-            date_ = ''
-            temp_list = get_temp_date_list(page1_text)
-            if temp_list:
-                date_ = max(temp_list).strftime('%d.%m.%Y')
-            else:
-                temp_list = get_temp_date_list(page2_text)
-                if temp_list:
-                    date_ = max(temp_list).strftime('%d.%m.%Y')
-                else:
-                    print('WARNING: {} has no date in first two pages!'.format(os.path.split(filename)[-1]))
-            return date_
-
-        tpl_path = self.__cfg[0]['templates_dir']
+        tpl_path = self.__cfg.templates_dir
         trm_template_path = os.path.join(tpl_path, 'TRM_file_template.xlsx')
         csv_template_path = os.path.join(tpl_path, 'CSV_template.xlsx')
         csv_db_template_path = os.path.join(tpl_path, 'CSV_DB.xlsx')
@@ -853,17 +1163,9 @@ class TrmManager:
         sheet2 = wb2[wb2.sheetnames[0]]
         wb3 = load_workbook(csv_template_path, data_only=True)
         sheet3 = wb3['Document Load']
-        wb4 = load_workbook(csv_db_template_path, data_only=True, read_only=True)
-        sheet4 = wb4['Лист1']
-        sheet5 = wb4['Лист2']
+        # Справочник с номерами документов и типами кодов документов
+        sheet4, sheet5, doc_number_list, doc_type_code_list = self.__read_csv_db(csv_db_template_path)
         print('Templates reading was successfully completed')
-        # Считаем в списки номера документов и типы кодов документов
-        doc_number_list = []
-        doc_type_code_list = []
-        for i in range(1, sheet4.max_row + 1):
-            doc_number_list.append(sheet4.cell(row=i, column=1).value)
-        for i in range(1, sheet5.max_row + 1):
-            doc_type_code_list.append(sheet5.cell(row=i, column=1).value)
 
         # Запишем выбранную пользователем дату и название трансмиттела в заголовок файла описи
         send_date_str = datetime.datetime.strptime(send_date, r'%d.%m.%Y')
@@ -882,9 +1184,22 @@ class TrmManager:
                         'PS': ['PS - Fire Alarm', 'PS - Пожарная сигнализация']}
         # Начнём заполнение для каждого документа
         print('Filling up template files...')
+        native_resolver = self.__get_native_resolver(cur_trm)
         count = 7
         total = len(cur_trm.documents)
-        bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
+        bar = self.progress.stage('Inventory filling', total)
+        summary = InspectionSummary()
+
+        def extract_date(path: str, doc_name: str):
+            # Текст титульного листа, прочитанный для поиска даты, сохраняется в поисковом индексе
+            result = self.__pdf_inspector.get_revision_date(path, summary)
+            if result is None:
+                return None
+            date_, title_text = result
+            self.__search_index.update_document(path, doc_name, cur_trm.name, self.__get_doc_number(doc_name),
+                                                title_text)
+            return date_
+
         for doc_name, phase in zip(cur_trm.documents, cur_trm.phases):
             # Заполним файл описи документов трансмиттела
             count += 1
@@ -893,76 +1208,57 @@ class TrmManager:
             # Расширение файла
             sheet2.cell(row=count, column=17).value = 'pdf'
 
-            pdf, file_path = self.__open_pdf(cur_trm, doc_name, bar)
-            if not pdf:
+            pages, file_path = self.__open_pdf(cur_trm, doc_name, bar, summary)
+            if pages is None:
                 continue
 
             # Формат страниц файла
-            sheet_format = self.__get_sheet_format_from_pdf(pdf)
+            sheet_format = self.__get_sheet_format_from_pdf(pages)
             sheet2.cell(row=count, column=16).value = sheet_format
-            # Считаем файл и найдём число страниц
-            page_count = pdf.getNumPages()
+            # Число страниц
+            page_count = len(pages)
             sheet2.cell(row=count, column=15).value = page_count
 
             # Тип кода документа
-            doc_type_code = cur_trm.documents[doc_name][8]
+            doc_type_code = cur_trm.documents[doc_name].type_code
             sheet2.cell(row=count, column=14).value = doc_type_code
             # Ревизия поставщика
-            doc_rev = cur_trm.documents[doc_name][4]
+            doc_rev = cur_trm.documents[doc_name].revision
             sheet2.cell(row=count, column=13).value = doc_rev
             # Класс документа
-            doc_class = cur_trm.documents[doc_name][1]
+            doc_class = cur_trm.documents[doc_name].doc_class
             sheet2.cell(row=count, column=12).value = doc_class
             # Дата ревизии документа
 
-            doc_rev_date = get_date_from_pdf(file_path)
+            doc_rev_date = self.__date_extractor.get_date(file_path, lambda path: extract_date(path, doc_name))
             sheet2.cell(row=count, column=11).value = doc_rev_date
             # Цель выпуска документа
-            doc_issue = cur_trm.documents[doc_name][0]
+            doc_issue = cur_trm.documents[doc_name].issue
             sheet2.cell(row=count, column=10).value = doc_issue
             # Код дисциплины (Марка комплекта)
-            doc_disc_code = cur_trm.documents[doc_name][7]
+            doc_disc_code = cur_trm.documents[doc_name].discipline_code
             sheet2.cell(row=count, column=9).value = doc_disc_code
             # Наименование документа (англ.)
-            doc_en_name = cur_trm.documents[doc_name][3]
+            doc_en_name = cur_trm.documents[doc_name].name_en
             sheet2.cell(row=count, column=7).value = doc_en_name
             # Наименование документа (рус.)
-            doc_ru_name = cur_trm.documents[doc_name][2]
+            doc_ru_name = cur_trm.documents[doc_name].name_ru
             sheet2.cell(row=count, column=6).value = doc_ru_name
             sheet2.cell(row=count, column=5).value = 'ER'
             # Номер документа
-            doc_number = cur_trm.documents[doc_name][5]
+            doc_number = cur_trm.documents[doc_name].number
             sheet2.cell(row=count, column=4).value = doc_number
             # Заказ на покупку
             sheet2.cell(row=count, column=1).value = 'P2AM-7-0001'
 
             # Заполним файл CSV (опись трансмиттела)
             # Найдём нативный файл, соответствующий данному документу
-            check = 0
-            for sfile in os.listdir(cur_trm.path):
-                if doc_name in sfile and os.path.isfile(os.path.join(cur_trm.path, sfile)):
-                    if r'.pdf' not in sfile and 'CRS' not in sfile:
-                        sheet3.cell(row=count - 6, column=51).value = sfile
-                        sheet3.cell(row=count - 6, column=50).value = 'Native Format'
-                        check = 1
-                        break
-                    elif r'.pdf' in sfile:
-                        sheet3.cell(row=count - 6, column=51).value = sfile
-                        sheet3.cell(row=count - 6, column=50).value = 'Native Format'
-                        check = 1
-                        break
-            # Если в папке трансмиттела документы размещены в отдельных папках
-            if not check:
-                subfolder = os.path.join(cur_trm.path, doc_name)
-                for sfile in os.listdir(subfolder):
-                    if doc_name in sfile and os.path.isfile(os.path.join(subfolder, sfile)) and \
-                            '.pdf' not in sfile and 'CRS' not in sfile:
-                        sheet3.cell(row=count - 6, column=51).value = sfile
-                        sheet3.cell(row=count - 6, column=50).value = 'Native Format'
-                        check = 1
-                        break
+            native_file = native_resolver.get_native_file(doc_name)
+            if native_file is not None:
+                sheet3.cell(row=count - 6, column=51).value = native_file
+                sheet3.cell(row=count - 6, column=50).value = 'Native Format'
             # Если в папке трансмиттела нет данного документа
-            if not check:
+            else:
                 print('WARNING: there is no {} in {}!'.format(doc_name, cur_trm.name))
 
             sheet3.cell(row=count - 6, column=49).value = doc_name
@@ -1018,12 +1314,17 @@ class TrmManager:
             sheet3.cell(row=count - 6, column=5).value = doc_en_name
             sheet3.cell(row=count - 6, column=4).value = doc_ru_name
             sheet3.cell(row=count - 6, column=2).value = re.sub(r'_.*$', '', doc_name)
-            bar.print_progress_bar()
+            bar.advance()
 
         inventory_path = os.path.join(cur_trm.path, cur_trm.name + '.xlsx')
         inventory_csv_path = os.path.join(cur_trm.path, cur_trm.name + '_CSV.xlsx')
         wb2.save(inventory_path)
         wb3.save(inventory_csv_path)
+        self.__date_extractor.save_cache()
+        # Документы с датой из кэша, ещё не попавшие в индекс
+        self.__index_trm_documents(cur_trm, summary)
+        self.fs_index.invalidate(cur_trm.path)
+        print(summary)
         print('For {} inventory files were successfully created'.format(cur_trm.name))
 
     def __get_received_trm_inventory_path(self, trm_name: str, path: str):
@@ -1044,7 +1345,7 @@ class TrmManager:
         """
         mask = trm_name + '*.xls*'
         file_check = 0
-        for item in os.listdir(path):
+        for item in self.fs_index.listdir(path):
             file_check += 1
             if fnmatch.fnmatch(item, mask):
                 path = os.path.join(path, item)
@@ -1075,17 +1376,9 @@ class TrmManager:
         -------
         doc_name : str
         """
-        trm_doc_names = list(trm_doc_names)
-        name_1_list = [doc_name.split('_')[0] for doc_name in trm_doc_names]
-        name_2 = doc_name_to_clarify.split('_')[0]
-
-        try:
-            index = name_1_list.index(name_2)
-            return trm_doc_names[index]
-        except ValueError:
-            return ''
+        return DocNameMatcher(trm_doc_names).match(doc_name_to_clarify)
 
-    def __parse_received_trm(self, cur_trm: Transmittal):
+    def __parse_received_trm(self, cur_trm: Transmittal, journal=None):
         """
         Parses info in documents corresponding to the current transmittal.
 
@@ -1093,97 +1386,135 @@ class TrmManager:
         ----------
         cur_trm : Transmittal
             Current transmittal.
+        journal : JobJournal, default=None
+            Journal where parsed documents are recorded; they are taken from it if the inventory file is not changed.
 
         Returns
         -------
-        None
+        inventory_path : str or None
+            Path to the transmittal inventory file, None if it is not found or cannot be parsed.
         """
         inventory_path = self.__get_received_trm_inventory_path(cur_trm.name, cur_trm.path)
         if inventory_path is None:
-            return
+            return None
 
-        wb_data = open_workbook(inventory_path, logfile=open(os.devnull, 'w'))
-        sheet_data = wb_data.sheet_by_index(0)
+        if journal is not None:
+            documents = journal.get('trm parsed', cur_trm.name, [inventory_path])
+            if documents is not None:
+                cur_trm.documents.update(
+                    (doc_name, ReceivedDocRecord.from_state(state) if state is not None else None)
+                    for doc_name, state in documents.items()
+                )
+                return inventory_path
+
+        # Сопоставление имён строк описи с файлами трансмиттела строится один раз
+        doc_name_matcher = DocNameMatcher(cur_trm.documents)
+        get_value = SpreadsheetReader.get_value
+
+        with SpreadsheetReader(inventory_path) as reader:
+            trm_date = None
+            cols = None
+            for i, row in enumerate(reader.iter_rows()):
+                if i == 0:
+                    trm_date = get_value(row, 8)
+                    continue
+                elif i < 6:
+                    continue
+                elif i == 6:
+                    try:
+                        cols = reader.resolve_columns(
+                            row,
+                            exact={'doc_rev': 'rev', 'crs_code': 'comments'},
+                            contains={'doc_number': 'project doc number', 'doc_name': 'electronic filename'}
+                        )
+                    except ValueError:
+                        print('ERROR: cannot parse trm inventory file for {} (unknown columns name)!'.format(
+                            cur_trm.name), file=sys.stderr)
+                        return None
+                    continue
 
-        col_names = [str(sheet_data.cell_value(6, i)).lower() for i in range(sheet_data.ncols)]
-        try:
-            doc_number_col = col_names.index([c for c in col_names if 'project doc number' in c.lower()][0])
-            doc_name_col = col_names.index([c for c in col_names if 'electronic filename' in c.lower()][0])
-            doc_rev_col = col_names.index('rev')
-            crs_code_col = col_names.index('comments')
-        except ValueError:
-            print('ERROR: cannot parse trm inventory file for {} (unknown columns name)!'.format(cur_trm.name),
-                  file=sys.stderr)
-            return
+                if not get_value(row, 3):
+                    continue
 
-        rng = range(7, sheet_data.nrows)
-        for i in rng:
-            if sheet_data.cell_value(rowx=i, colx=3):
-                doc_number = self.__preprocess_str(sheet_data.cell_value(rowx=i, colx=doc_number_col))
-                doc_name = self.__preprocess_str(sheet_data.cell_value(rowx=i, colx=doc_name_col)[:-4])
-                doc_rev = self.__preprocess_str(sheet_data.cell_value(rowx=i, colx=doc_rev_col))
-                crs_code = self.__preprocess_str(sheet_data.cell_value(rowx=i, colx=crs_code_col))
+                doc_number = self.__preprocess_str(get_value(row, cols['doc_number']))
+                doc_name = self.__preprocess_str(str(get_value(row, cols['doc_name']) or '')[:-4])
+                doc_rev = self.__preprocess_str(get_value(row, cols['doc_rev']))
+                crs_code = self.__preprocess_str(get_value(row, cols['crs_code']))
 
                 try:
                     phase = doc_number.split('.')[1]
                     if phase == '0':
                         phase = '1'
-                except IndexError:
+                except (AttributeError, IndexError):
                     phase = None
                     print('WARNING: cannot parse document {} phase!'.format(doc_number))
 
-                trm_date = sheet_data.cell_value(rowx=0, colx=8)
-                prop_list = [doc_number, doc_rev, crs_code, phase, trm_date]
+                record = ReceivedDocRecord(doc_number, doc_rev, crs_code, phase, trm_date)
 
-                doc_name = self.clarify_doc_name(cur_trm.documents, doc_name)
+                doc_name = doc_name_matcher.match(doc_name)
                 if doc_name:
-                    cur_trm.documents[doc_name] = prop_list
+                    cur_trm.documents[doc_name] = record
+
+        if journal is not None:
+            documents = {
+                doc_name: record.to_state() if record is not None else None
+                for doc_name, record in cur_trm.documents.items()
+            }
+            journal.record('trm parsed', cur_trm.name, [inventory_path], documents)
+        return inventory_path
 
-    def __fill_vdr_fields(self, cur_trm: Transmittal):
+    def __fill_vdr_fields(self, trm_list: list):
         """
-        Fills required fields in VDR for each document in the transmittal.
+        Fills required fields in VDR for each document in the transmittals.
+        VDR of each phase is opened, read and saved once for all the transmittals of the batch.
+        VDR of the phase already filled in from the same inventory file (according to the journal) is skipped
+        for the transmittal unless VDR has been changed since then.
 
         Parameters
         ----------
-        cur_trm : Transmittal
-            Current transmittal.
+        trm_list : list
+            Pairs (transmittal, path to its inventory file).
 
         Returns
         -------
-        None
+        failed : dict
+            Names of transmittals whose documents were not filled in mapped to the reason.
         """
 
-        def fill_doc_info(xlsheet: Worksheet, xlsheet_data: Worksheet, docs: dict):
+        def fill_doc_info(patcher: XlsxPatcher, xlsheet_data: SheetValues, cur_trm: Transmittal):
             """
             Fills required fields in VDR using documents dictionary provided.
 
             Parameters
             ----------
-            xlsheet : Worksheet
-                VDR worksheet.
-            xlsheet_data : Worksheet
-                VDR worksheet (data only).
-            docs : dict
-                Documents dictionary with required information.
+            patcher : XlsxPatcher
+                Collects changes of VDR file.
+            xlsheet_data : SheetValues
+                VDR worksheet values.
+            cur_trm : Transmittal
+                Transmittal with documents information (ReceivedDocRecord).
 
             Returns
             -------
-            None
+            events : list
+                Arguments of DocHistory.set_received for each filled document.
             """
-            [ifr_list, ifu_list] = self.__cfg[2].values()
+            events = []
+            docs = cur_trm.documents
+            ifr_list, ifu_list = self.__cfg.ifr_list, self.__cfg.ifu_list
 
             total = len(docs)
-            bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
+            bar = self.progress.stage('VDR filling', total)
 
             for doc in docs:
-                doc_num = docs[doc][0]
+                doc_num = docs[doc].number
                 # Вычислим номер строки, в которой находится нужный документ
                 vdr_ind = self.__get_vdr_ind(xlsheet_data, doc_num)
                 if vdr_ind is None:
-                    bar.print_progress_bar()
+                    bar.advance()
                     continue
                 # Вычислим номер столбца, с которого начнём заполнять информацию из полученного трансмиттела
-                doc_rev = docs[doc][1]
+                doc_rev = docs[doc].revision
                 issue_cols = self.__find_issued_cols(xlsheet_data, doc_rev)
                 if doc_rev in ifr_list:
                     ind = ifr_list.index(doc_rev)
@@ -1198,48 +1529,85 @@ class TrmManager:
                     req_col = req_col + 4
 
                 # Дата получения трансмиттела с замечаниями
-                xlsheet.cell(row=vdr_ind, column=req_col).value = docs[doc][4]
+                patcher.set_value('VDR', vdr_ind, req_col, docs[doc].trm_date)
                 # Номер трансмиттела
-                xlsheet.cell(row=vdr_ind, column=req_col + 1).value = cur_trm.name
+                patcher.set_value('VDR', vdr_ind, req_col + 1, cur_trm.name)
                 # Код замечания CRS
-                xlsheet.cell(row=vdr_ind, column=req_col + 2).value = docs[doc][2]
+                patcher.set_value('VDR', vdr_ind, req_col + 2, docs[doc].crs_code)
+                events.append((self.__get_doc_number(doc_num), doc_rev, docs[doc].trm_date, cur_trm.name,
+                               docs[doc].crs_code))
 
-                bar.print_progress_bar()
+                bar.advance()
+            return events
 
-        print('{}. Filling up required fields in VDR...'.format(cur_trm.name))
+        print('{}. Filling up required fields in VDR...'.format(', '.join(trm.name for trm, _ in trm_list)))
 
-        for phase in list(set(cur_trm.phases)):
+        # Трансмиттелы пакета группируются по фазам, чтобы каждый VDR записывался один раз
+        phase_units = {}
+        for cur_trm, inventory_path in trm_list:
+            for phase in sorted(set(cur_trm.phases)):
+                unit_key = '{}/{}'.format(cur_trm.name, phase)
+                phase_units.setdefault(phase, []).append((cur_trm, inventory_path, unit_key))
+
+        failed = {}
+        for phase, units in phase_units.items():
 
             print('...for phase {}'.format(phase))
 
             vdr_tmp = self.__find_vdr(phase)
             if vdr_tmp is None:
                 print('ERROR: there is no VDR for phase {}!'.format(phase), file=sys.stderr)
+                for cur_trm, _, _ in units:
+                    failed[cur_trm.name] = 'there is no VDR for phase {}'.format(phase)
                 continue
 
-            # The win32com function to open Excel.
-            xlapp = client.Dispatch("Excel.Application")
-            xlapp.Visible = 0
-
-            # Open the file we want in Excel
-            workbook = xlapp.Workbooks.Open(vdr_tmp)
-
-            workbook.Saved = 0
-            workbook.Save()
-            workbook.Close(SaveChanges=True)
-            xlapp.Quit()
-
-            wb = load_workbook(vdr_tmp)
-            sheet = wb['VDR']
-            wb_data = load_workbook(vdr_tmp, data_only=True)
-            sheet_data = wb_data['VDR']
-
-            fill_doc_info(sheet, sheet_data, cur_trm.documents)
-
-            wb_data.close()
-            wb.save(vdr_tmp)
+            with self.__get_vdr_lock(vdr_tmp):
+                # Часть считается выполненной, только если VDR не изменён (например, не восстановлен) после записи
+                pending_units = []
+                for cur_trm, inventory_path, unit_key in units:
+                    if self.__receive_journal.is_done('vdr patched', unit_key, [inventory_path], [vdr_tmp]):
+                        print('{}: VDR was already filled up for phase {}, skipped'.format(cur_trm.name, phase))
+                    else:
+                        pending_units.append((cur_trm, inventory_path, unit_key))
+                units = pending_units
+                if not units:
+                    continue
 
-        print('Required fields were successfully filled up in VDR')
+                # The win32com function to open Excel.
+                xlapp = client.Dispatch("Excel.Application")
+                xlapp.Visible = 0
+
+                # Open the file we want in Excel
+                workbook = xlapp.Workbooks.Open(vdr_tmp)
+
+                workbook.Saved = 0
+                workbook.Save()
+                workbook.Close(SaveChanges=True)
+                xlapp.Quit()
+
+                patcher = XlsxPatcher(vdr_tmp)
+                sheet_data = self.__read_vdr_data(vdr_tmp)
+
+                self.__update_doc_history(vdr_tmp, sheet_data)
+                self.__update_search_names(vdr_tmp, sheet_data)
+                events = []
+                for cur_trm, _, _ in units:
+                    events.extend(fill_doc_info(patcher, sheet_data, cur_trm))
+
+                patcher.save()
+                # История документов дополняется записанными данными без повторного чтения VDR
+                for event in events:
+                    self.__doc_history.set_received(*event)
+                self.__doc_history.mark_source(vdr_tmp)
+                self.__doc_history.save()
+                for _, inventory_path, unit_key in units:
+                    self.__receive_journal.record('vdr patched', unit_key, [inventory_path], outputs=[vdr_tmp])
+
+        if failed:
+            print('Required fields were filled up in VDR except for {}'.format(', '.join(failed)))
+        else:
+            print('Required fields were successfully filled up in VDR')
+        return failed
 
     def process_received_transmittals(self, cur_trm: Transmittal):
         """
@@ -1252,15 +1620,45 @@ class TrmManager:
 
         Returns
         -------
-        None
+        failed : dict
+            The transmittal name mapped to the reason if it was not processed (see process_received_batch).
         """
-        print('Parsing documents info in {}...'.format(cur_trm.name))
-        self.__parse_received_trm(cur_trm)
+        return self.process_received_batch([cur_trm])
 
-        if not cur_trm.documents:
-            print(f'WARNING: there are no documents in {cur_trm.name}', file=sys.stderr)
-        else:
-            self.__fill_vdr_fields(cur_trm)
+    def process_received_batch(self, trm_list: list):
+        """
+        Parses documents in the transmittals and fills required fields in VDR, each VDR is written once
+        for the whole batch.
+
+        Parameters
+        ----------
+        trm_list : list
+            Received transmittals.
+
+        Returns
+        -------
+        failed : dict
+            Names of transmittals which were not processed (e.g. their inventory file cannot be parsed
+            or there is no VDR for their phase) mapped to the reason.
+        """
+        units = []
+        failed = {}
+        for cur_trm in trm_list:
+            print('Parsing documents info in {}...'.format(cur_trm.name))
+            inventory_path = self.__parse_received_trm(cur_trm, self.__receive_journal)
+
+            if inventory_path is None:
+                failed[cur_trm.name] = 'inventory file is not found or cannot be parsed'
+            elif not cur_trm.documents:
+                print(f'WARNING: there are no documents in {cur_trm.name}', file=sys.stderr)
+            else:
+                units.append((cur_trm, inventory_path))
+
+        if units:
+            failed.update(self.__fill_vdr_fields(units))
+            for cur_trm, _ in units:
+                self.__index_trm_documents(cur_trm)
+        return failed
 
     def __parse_all_docs_info_from_vdr(self, cur_vdr: Document):
         """
@@ -1280,19 +1678,20 @@ class TrmManager:
 
         print('Loading {}...'.format(cur_vdr.name))
         vdr_tmp = cur_vdr.path
-        wb_data = load_workbook(vdr_tmp, data_only=True)
-        sheet_data = wb_data['VDR']
+        sheet_data = self.__read_vdr_data(vdr_tmp)
 
         print('{} data was successfully read!'.format(cur_vdr.name))
+        self.__update_doc_history(vdr_tmp, sheet_data)
+        self.__update_search_names(vdr_tmp, sheet_data)
 
         issue_cols = self.__find_issued_cols(sheet_data, '00')
         req_cols = [col + 4 for col in issue_cols]
 
         print('Parsing VDR info...')
 
-        rng = range(13, sheet_data.max_row + 1)
+        rng = range(VDR_HEADER_ROWS + 1, sheet_data.max_row + 1)
         total = len(rng)
-        bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
+        bar = self.progress.stage('VDR parsing', total)
         for i in rng:
             cur_cell_value = sheet_data.cell(row=i, column=41).value
 
@@ -1320,13 +1719,83 @@ class TrmManager:
 
                 doc_dict[doc_number] = [trm_name, crs_code, status]
 
-            bar.print_progress_bar()
+            bar.advance()
 
         print('VDR info parsing was successfully ended!')
 
-        wb_data.close()
         return doc_dict
 
+    def __update_doc_history(self, vdr_path: str, sheet_data: SheetValues):
+        """
+        Rebuilds documents history from VDR values if VDR has been changed since the last update.
+
+        Parameters
+        ----------
+        vdr_path : str
+            Path to VDR file.
+        sheet_data : SheetValues
+            Values of VDR worksheet (see __read_vdr_data).
+
+        Returns
+        -------
+        None
+        """
+        if self.__doc_history.is_source_current(vdr_path):
+            return
+        ifr_cols = self.__find_issued_cols(sheet_data, 'A1')
+        ifu_cols = self.__find_issued_cols(sheet_data, '00')
+        self.__doc_history.update_from_vdr(vdr_path, sheet_data, ifr_cols, ifu_cols, self.__cfg.ifr_list,
+                                           self.__cfg.ifu_list)
+        self.__doc_history.save()
+
+    def __refresh_doc_history(self):
+        """
+        Updates documents history from all the VDRs in DB which have been changed since the last update.
+
+        Returns
+        -------
+        None
+        """
+        item_names_list = self.db.get_item_names()
+        for i in range(len(item_names_list)):
+            vdr = self.db.get_item(i)
+            if isinstance(vdr, Document) and not self.__doc_history.is_source_current(vdr.path):
+                with self.__get_vdr_lock(vdr.path):
+                    self.__update_doc_history(vdr.path, self.__read_vdr_data(vdr.path))
+
+    def get_doc_history(self, doc_number: str):
+        """
+        Gets history of the document: each revision sent and received with dates, transmittals and CRS code.
+
+        Parameters
+        ----------
+        doc_number : str
+            Document number or name of the document file.
+
+        Returns
+        -------
+        events : list
+            List of HistoryEvent in the order of issues.
+        """
+        self.__refresh_doc_history()
+        return self.__doc_history.get(self.__get_doc_number(doc_number))
+
+    def get_trm_history(self, trm_name: str):
+        """
+        Gets history events of all documents sent or received with the transmittal.
+
+        Parameters
+        ----------
+        trm_name : str
+
+        Returns
+        -------
+        events : list
+            Pairs (document number, HistoryEvent).
+        """
+        self.__refresh_doc_history()
+        return self.__doc_history.find_by_trm(trm_name)
+
     def __parse_docs_in_received_trms(self, doc_dict: dict):
         """
         Gets information about formats and pages number from each document (PDF-file) in received transmittal.
@@ -1351,13 +1820,20 @@ class TrmManager:
             print('No transmittals found!')
             return 0
 
-        bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
+        bar = self.progress.stage('Received TRMs parsing', total)
 
+        # Имена файлов документов в каждом трансмиттеле по номерам документов (первое вхождение)
+        trm_doc_names = {}
         for trm_name in trm_names_list:
             trm_id = item_names_list.index(trm_name)
             trm = self.db.get_item(trm_id)
-            self.__parse_received_trm(trm)
-            bar.print_progress_bar()
+            self.__parse_received_trm(trm, self.__print_journal)
+            doc_names = {}
+            for doc_name, record in trm.documents.items():
+                if record is not None:
+                    doc_names.setdefault(record.number, doc_name)
+            trm_doc_names[trm_name] = doc_names
+            bar.advance()
 
         print('Getting pages info from documents...')
         total = len(doc_dict)
@@ -1366,9 +1842,10 @@ class TrmManager:
             print('No documents found!')
             return 0
 
-        bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
+        bar = self.progress.stage('Pages info collecting', total)
 
         total_size = 0
+        summary = InspectionSummary()
 
         for doc_num in doc_dict:
             trm_name = doc_dict[doc_num][0]
@@ -1378,46 +1855,61 @@ class TrmManager:
                 trm_id = item_names_list.index(trm_name)
                 cur_trm = self.db.get_item(trm_id)
 
-                try:
-                    doc_index = [
-                        cur_trm.documents[doc][0]
-                        if cur_trm.documents[doc]
-                        else ''
-                        for doc in cur_trm.documents
-                    ].index(doc_num)
-                    doc_name = list(cur_trm.documents)[doc_index]
-                except ValueError:
+                doc_name = trm_doc_names[trm_name].get(doc_num)
+                if doc_name is None:
                     # print('ERROR: {} was not found in {}'.format(doc_num, cur_trm.name), file=sys.stderr)
-                    bar.print_progress_bar()
+                    bar.advance()
                     continue
 
-                pdf, file_path = self.__open_pdf(cur_trm, doc_name)
-                if not pdf:
-                    bar.print_progress_bar()
-                    continue
-
-                file_size = os.path.getsize(file_path)
+                # Файл может находиться в папке трансмиттела или в папке документа
+                pdf_paths = [
+                    os.path.join(cur_trm.path, doc_name + '.pdf'),
+                    os.path.join(cur_trm.path, doc_name, doc_name + '.pdf')
+                ]
+                pdf_info = self.__print_journal.get('document inspected', pdf_paths[0], pdf_paths)
+                if pdf_info is None:
+                    pages, file_path = self.__open_pdf(cur_trm, doc_name, summary=summary)
+                    if pages is None:
+                        bar.advance()
+                        continue
+                    pdf_info = {
+                        'file_size': os.path.getsize(file_path),
+                        'format_list': self.__get_sheet_format_from_pdf(pages, return_format_list=True)
+                    }
+                    self.__print_journal.record('document inspected', pdf_paths[0], pdf_paths, pdf_info)
+
+                file_size = pdf_info['file_size']
                 if status == 'Ок':
                     total_size += file_size
 
-                format_list = self.__get_sheet_format_from_pdf(pdf, return_format_list=True)
+                format_list = pdf_info['format_list']
 
-                cur_trm.documents[doc_name].extend([file_size, format_list, status])
+                record = cur_trm.documents[doc_name]
+                record.file_size = file_size
+                record.formats = format_list
+                record.status = status
                 doc_dict[doc_num].append(format_list)
 
-            bar.print_progress_bar()
+            bar.advance()
 
+        print(summary)
         print('Pages info was successfully collected!')
         return total_size
 
-    def __collect_docs_to_be_printed(self, target_dir: str):
+    def __collect_docs_to_be_printed(self, target_dir: str, total_size=0, hard_link=False):
         """
         Collects documents for printing in target directory.
+        Files are hashed while copying; files with identical content are stored once (the others are hard links),
+        files with the same name but different content in different transmittals are reported.
 
         Parameters
         ----------
         target_dir : str
             Path to a folder where documents are to be collected for printing.
+        total_size : int, default=0
+            Total size of files for printing in bytes.
+        hard_link : bool, default=False
+            Whether to create hard links instead of copies when possible.
 
         Returns
         -------
@@ -1428,27 +1920,156 @@ class TrmManager:
 
         print('Copying files from transmittals...')
 
-        total = len(trm_names_list)
-        bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
-
+        # Источники файлов с одним именем во всех трансмиттелах, копируется первый из них
+        sources = {}
         for trm_name in trm_names_list:
             trm_id = item_names_list.index(trm_name)
             trm = self.db.get_item(trm_id)
 
             for doc in trm.documents:
                 if trm.documents[doc] is not None:
-                    if trm.documents[doc][-1] == 'Ок':
+                    if trm.documents[doc].status == 'Ок':
                         file_path = os.path.join(trm.path, doc + '.pdf')
                         target_path = os.path.join(target_dir, doc + '.pdf')
+                        sources.setdefault(target_path, []).append((trm_name, file_path))
+
+        # Файлы, содержимое которых уже скопировано под другим именем, заменяются жёсткими ссылками
+        pairs = {}
+        links = {}
+        stored = {}
+        done_count = 0
+        done_size = 0
+        for target_path, trm_sources in sources.items():
+            file_path = trm_sources[0][1]
+            digest = self.__content_index.get_digest(file_path)
+            # Копия считается выполненной, пока целевой файл существует и имеет размер исходного
+            # (время изменения не сравнивается: одинаковые копии заменяются жёсткими ссылками друг на друга)
+            if self.__print_journal.is_done('file copied', target_path, [file_path]) and \
+                    os.path.isfile(target_path) and os.path.getsize(target_path) == os.path.getsize(file_path):
+                pairs[target_path] = None
+                done_count += 1
+                done_size += os.path.getsize(file_path)
+            elif digest is not None and digest in stored:
+                links[target_path] = stored[digest]
+                continue
+            else:
+                pairs[target_path] = file_path
+            if digest is not None:
+                stored.setdefault(digest, target_path)
+
+        bar = self.progress.stage('Files copying', len(pairs) + len(links), bytes_total=total_size)
+        bar.advance(done_count, done_size)
+
+        def on_done(src: str, dst: str):
+            self.__print_journal.record('file copied', dst, [src])
+
+        # Хэш вычисляется при копировании только для файлов, которых ещё нет в индексе содержимого,
+        # остальные файлы копируются ядром
+        engine = CopyEngine(hard_link=hard_link, hash_name=self.__content_index.hash_name)
+        result = engine.copy_files(
+            [(file_path, target_path) for target_path, file_path in pairs.items() if file_path is not None],
+            bar, on_done, self.__content_index.set_digest, lambda src: self.__content_index.get_digest(src) is None
+        )
+
+        linked_count = 0
+        linked_size = 0
+        for target_path, stored_path in links.items():
+            file_path = sources[target_path][0][1]
+            file_size = os.path.getsize(file_path)
+            if os.path.exists(target_path) and os.path.samefile(stored_path, target_path):
+                pass
+            elif CopyEngine.link_file(stored_path, target_path):
+                linked_count += 1
+                linked_size += file_size
+            else:
+                try:
+                    engine.copy_file(file_path, target_path)
+                except OSError as e:
+                    print('ERROR: cannot copy {}: {}'.format(os.path.split(file_path)[1], e), file=sys.stderr)
+                    bar.advance(1, file_size)
+                    continue
+            on_done(file_path, target_path)
+            bar.advance(1, file_size)
+        bar.finish()
+
+        # Одинаковые файлы под разными именами, содержимое которых стало известно только при копировании
+        count, size = self.__content_index.deduplicate(
+            {target_path: self.__content_index.get_digest(trm_sources[0][1])
+             for target_path, trm_sources in sources.items()}
+        )
+        linked_count += count
+        linked_size += size
+
+        # Файлы с одним именем, но разным содержимым в разных трансмиттелах
+        conflicts = []
+        for target_path, trm_sources in sources.items():
+            trm_name, file_path = trm_sources[0]
+            for other_trm_name, other_path in trm_sources[1:]:
+                try:
+                    if os.path.getsize(file_path) == os.path.getsize(other_path) and (
+                            self.__content_index.hash_file(file_path) == self.__content_index.hash_file(other_path)):
+                        continue
+                except OSError:
+                    continue
+                conflicts.append((os.path.split(target_path)[1], trm_name, other_trm_name))
+        self.__content_index.save()
 
-                        if os.path.exists(target_path):
-                            continue
-                        else:
-                            shutil.copy2(file_path, target_dir)
+        mb = 1024 ** 2
+        print('Files {}'.format(result))
+        print('Identical files replaced by links: {} ({:.2f} MB)'.format(linked_count, linked_size / mb))
+        for file_name, trm_name, other_trm_name in conflicts:
+            print('WARNING: {} in {} differs from the copied one from {}'.format(file_name, other_trm_name, trm_name))
+        print('Copying files was successfully completed!')
 
-            bar.print_progress_bar()
+    def __bundle_docs_to_be_printed(self, target_dir: str):
+        """
+        Merges pages of documents for printing into one pdf-file per format (A4.pdf, A3.pdf, ..., Other.pdf)
+        with a bookmark for each document.
 
-        print('Copying files was successfully completed!')
+        Parameters
+        ----------
+        target_dir : str
+            Path to a folder where documents are collected for printing.
+
+        Returns
+        -------
+        None
+        """
+        item_names_list = self.db.get_item_names()
+        trm_names_list = [item_name for item_name in item_names_list if 'TRM' in item_name]
+
+        print('Bundling files by formats...')
+
+        # Документы в том же порядке, что и при копировании: из первого трансмиттела, где они найдены
+        docs = {}
+        for trm_name in trm_names_list:
+            trm_id = item_names_list.index(trm_name)
+            trm = self.db.get_item(trm_id)
+
+            for doc in trm.documents:
+                record = trm.documents[doc]
+                if record is not None and record.status == 'Ок' and record.formats and doc not in docs:
+                    file_path = os.path.join(target_dir, doc + '.pdf')
+                    if not os.path.exists(file_path):
+                        file_path = self.__find_doc_pdf(trm, doc)
+                    if file_path is None:
+                        print('ERROR: {}.pdf was not found in {}'.format(doc, trm.name), file=sys.stderr)
+                        continue
+                    docs[doc] = (file_path, record.formats)
+
+        bar = self.progress.stage('Print bundles', len(docs))
+        bundler = PrintBundler(target_dir)
+        try:
+            for doc, (file_path, format_list) in docs.items():
+                bundler.add_document(file_path, doc, format_list)
+                bar.advance()
+        finally:
+            page_counts = bundler.close()
+        bar.finish()
+
+        for page_format, page_count in sorted(page_counts.items()):
+            print('{}.pdf: {} pages'.format(page_format, page_count))
+        print('Bundling files was successfully completed!')
 
     def __write_docs_info_to_be_printed(self, doc_dict: dict, target_dir: str):
         """
@@ -1466,10 +2087,10 @@ class TrmManager:
         -------
         None
         """
-        format_dict = self.__cfg[3]
+        format_dict = self.__cfg.formats
 
         print('Writing files info into sheet count file...')
-        template_path = os.path.join(self.__cfg[0]['templates_dir'], 'sheet_count_template.xlsx')
+        template_path = os.path.join(self.__cfg.templates_dir, 'sheet_count_template.xlsx')
         wb = load_workbook(template_path)
         xlsheet = wb['Sheet1']
 
@@ -1481,7 +2102,7 @@ class TrmManager:
         i_shifted = 0
 
         total = len(doc_dict)
-        bar = PrintProgressBar(start=0, total=total, prefix='Progress:', suffix='Complete', length=50)
+        bar = self.progress.stage('Sheet count writing', total)
 
         for i, doc_num in enumerate(doc_dict):
             i_shifted = i + 3
@@ -1497,7 +2118,7 @@ class TrmManager:
                     pages_total_dict[k] += pages_count_dict[k]
                     xlsheet.cell(row=i_shifted, column=j + 2).value = pages_count_dict[k]
 
-            bar.print_progress_bar()
+            bar.advance()
 
         xlsheet.cell(row=i_shifted + 1, column=1).value = 'Итого'
         for j, k in enumerate(pages_total_dict.keys()):
@@ -1507,7 +2128,7 @@ class TrmManager:
         wb.save(target_path)
         print('Writing files info was successfully completed!')
 
-    def prepare_docs_for_printing(self, cur_vdr: Document):
+    def prepare_docs_for_printing(self, cur_vdr: Document, hard_link=False, bundle=False):
         """
         Performs all preparations needed for printing documents from received transmittals.
 
@@ -1515,6 +2136,11 @@ class TrmManager:
         ----------
         cur_vdr : Document
             Current VDR.
+        hard_link : bool, default=False
+            Whether to create hard links to documents instead of copies when the print directory is located
+            on the same file system as transmittals.
+        bundle : bool, default=False
+            Whether to merge documents into one pdf-file per format in addition to copying them.
 
         Returns
         -------
@@ -1534,7 +2160,12 @@ class TrmManager:
         print('Required disk space: {:.2f} MB\tFree space: {:.2f} MB'.format(total_size / mb, target_free / mb))
 
         if target_free > total_size + 100 * mb:
-            self.__collect_docs_to_be_printed(target_dir)
+            self.__collect_docs_to_be_printed(target_dir, total_size, hard_link)
+            if bundle:
+                if target_free > 2 * total_size + 100 * mb:
+                    self.__bundle_docs_to_be_printed(target_dir)
+                else:
+                    print('ERROR: disk space is not enough for print bundles!', file=sys.stderr)
         else:
             print('ERROR: disk space is not enough for copying files!', file=sys.stderr)
         self.__write_docs_info_to_be_printed(doc_dict, target_dir)
@@ -1,7 +1,8 @@
 import sys
+import threading
 import traceback
 
-from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal, pyqtSlot
 
 
 class WorkerSignals(QObject):
@@ -43,3 +44,177 @@ class Worker(QRunnable):
             self.signals.result.emit(result)
         finally:
             self.signals.finish.emit()
+
+
+class JobScheduler(QObject):
+    """
+    The class is purposed to run independent jobs on a bounded thread pool and to track their status.
+    Inherits signals from PyQt5.QtCore.QObject.
+
+    Attributes
+    ----------
+    finish
+        Signal emitted when all jobs of the batch are finished or cancelled.
+    status_changed
+        Signal emitted with job name and its new status.
+    statuses : dict
+        Status of each job of the current batch.
+    threadpool : PyQt5.QtCore.QThreadPool
+        Bounded pool to run jobs.
+
+    Methods
+    -------
+    cancel()
+        Cancels all jobs which have not been started yet.
+    is_running()
+        Checks whether there are unfinished jobs or not.
+    submit(name: str, fn, *args, **kwargs)
+        Runs one job as a batch.
+    submit_batch(jobs)
+        Starts new batch of jobs.
+    """
+
+    status_changed = pyqtSignal(str, str)
+    finish = pyqtSignal()
+
+    class Status:
+        QUEUED = 'в очереди'
+        RUNNING = 'выполняется'
+        DONE = 'готово'
+        FAILED = 'ошибка'
+        CANCELLED = 'отменено'
+
+    def __init__(self, max_jobs=None):
+        super().__init__()
+
+        self.threadpool = QThreadPool()
+        if max_jobs is None:
+            max_jobs = min(4, QThread.idealThreadCount())
+        self.threadpool.setMaxThreadCount(max(1, max_jobs))
+
+        self.statuses = {}
+        self.__workers = {}
+        self.__lock = threading.Lock()
+        self.__cancelled = False
+        # Пока задания пакета ставятся в очередь, сигнал окончания не отправляется
+        self.__sealed = True
+
+    def __run_job(self, name: str, fn, *args, **kwargs):
+        with self.__lock:
+            if self.__cancelled:
+                self.statuses[name] = self.Status.CANCELLED
+                self.status_changed.emit(name, self.Status.CANCELLED)
+                return None
+            self.statuses[name] = self.Status.RUNNING
+        self.status_changed.emit(name, self.Status.RUNNING)
+        return fn(*args, **kwargs)
+
+    def __set_result_status(self, name: str, status: str):
+        with self.__lock:
+            if self.statuses.get(name) == self.Status.CANCELLED:
+                return
+            self.statuses[name] = status
+        self.status_changed.emit(name, status)
+
+    def __release(self, name: str):
+        with self.__lock:
+            self.__workers.pop(name, None)
+            is_finished = self.__sealed and not self.__workers
+        if is_finished:
+            self.finish.emit()
+
+    def submit(self, name: str, fn, *args, **kwargs):
+        """
+        Runs one job as a batch.
+
+        Parameters
+        ----------
+        name : str
+            Unique name of the job.
+        fn
+            Function to be run in the job.
+
+        Returns
+        -------
+        None
+        """
+        self.submit_batch([(name, fn, args, kwargs)])
+
+    def submit_batch(self, jobs):
+        """
+        Starts new batch of jobs: statuses of the previous batch are dropped, finish signal is emitted
+        once all the jobs of the batch are finished or cancelled.
+
+        Parameters
+        ----------
+        jobs : Iterable
+            Tuples (unique name of the job, function to be run in the job, args[, kwargs]).
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            self.__cancelled = False
+            self.__sealed = False
+            self.statuses.clear()
+        try:
+            for job in jobs:
+                name, fn, args = job[:3]
+                kwargs = job[3] if len(job) > 3 else {}
+                try:
+                    self.__submit(name, fn, *args, **kwargs)
+                except Exception as e:
+                    print(e, file=sys.stderr)
+        finally:
+            with self.__lock:
+                self.__sealed = True
+                is_finished = not self.__workers
+            if is_finished:
+                self.finish.emit()
+
+    def __submit(self, name: str, fn, *args, **kwargs):
+        worker = Worker(self.__run_job, name, fn, *args, **kwargs)
+        worker.signals.result.connect(lambda result: self.__set_result_status(name, self.Status.DONE))
+        worker.signals.error.connect(lambda error: self.__set_result_status(name, self.Status.FAILED))
+        worker.signals.finish.connect(lambda: self.__release(name))
+
+        with self.__lock:
+            self.__workers[name] = worker
+            self.statuses[name] = self.Status.QUEUED
+        self.status_changed.emit(name, self.Status.QUEUED)
+        self.threadpool.start(worker)
+
+    def cancel(self):
+        """
+        Cancels all jobs which have not been started yet. Running jobs are completed.
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            self.__cancelled = True
+            queued = [
+                (name, worker)
+                for name, worker in self.__workers.items()
+                if self.statuses.get(name) == self.Status.QUEUED
+            ]
+
+        for name, worker in queued:
+            if self.threadpool.tryTake(worker):
+                with self.__lock:
+                    self.statuses[name] = self.Status.CANCELLED
+                self.status_changed.emit(name, self.Status.CANCELLED)
+                self.__release(name)
+
+    def is_running(self):
+        """
+        Checks whether there are unfinished jobs or not.
+
+        Returns
+        -------
+        bool
+        """
+        with self.__lock:
+            return bool(self.__workers)
@@ -0,0 +1,404 @@
+import argparse
+import datetime
+import io
+import itertools
+import json
+import queue
+import sys
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from document import Document
+from transmittal import Transmittal
+from trm_client import HOST, PORT
+from trm_manager import TrmManager
+
+# Число завершённых заданий, которые хранятся для запросов клиентов
+MAX_FINISHED_JOBS = 100
+
+# Признак потока, обрабатывающего запрос клиента
+_request_thread = threading.local()
+
+
+def _to_json(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.strftime('%d.%m.%Y')
+    if hasattr(obj, '__slots__'):
+        return {name: getattr(obj, name) for name in obj.__slots__}
+    raise TypeError('{} is not JSON serializable'.format(type(obj).__name__))
+
+
+class _LogTee(io.TextIOBase):
+    """
+    Stream writing to the original stream and to the log of the running job (output of threads handling requests
+    is not written to the log).
+    """
+    def __init__(self, stream, server):
+        self.stream = stream
+        self.server = server
+
+    def write(self, text):
+        self.stream.write(text)
+        job = self.server.current_job
+        if job is not None and not getattr(_request_thread, 'is_set', False):
+            job.log.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class Job:
+    """
+    The class is purposed to keep state of an operation run by the server.
+
+    Attributes
+    ----------
+    error : str
+        Traceback of the exception if the job failed.
+    id : int
+    log : io.StringIO
+        Output of the job.
+    name : str
+        Name of the operation with its arguments.
+    status : {'queued', 'running', 'done', 'failed'}
+    """
+    def __init__(self, id_: int, name: str, fn, args: tuple):
+        self.id = id_
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.status = 'queued'
+        self.error = None
+        self.log = io.StringIO()
+
+    def to_dict(self, with_log=True):
+        """
+        Gets state of the job.
+
+        Returns
+        -------
+        dict
+        """
+        result = {'id': self.id, 'name': self.name, 'status': self.status, 'error': self.error}
+        if with_log:
+            result['log'] = self.log.getvalue()
+        return result
+
+
+class TrmServer(ThreadingHTTPServer):
+    """
+    The class is purposed to keep TrmManager with its database, VDR values and caches in memory and to give access
+    to it through local HTTP JSON API, so that repeated operations do not parse everything from scratch.
+    Operations (update, send, receive, print) are queued and run one by one in a background thread as jobs,
+    queries are answered at once.
+
+    API
+    ---
+    GET /status
+        Items of the database and states of the jobs.
+    GET /jobs/<id>
+        State and output of the job.
+    GET /search?q=<words>&limit=<n>
+        Documents found by words (see TrmManager.search_documents).
+    GET /history?number=<document number> or /history?trm=<transmittal name>
+        History of the document or of the transmittal (see TrmManager.get_doc_history).
+    POST /update {"is_received": false}
+        Updates the database.
+    POST /send {"trm": name, "send_date": "dd.mm.yyyy"}
+        Prepares the transmittal for sending.
+    POST /receive {"trm": name}
+        Processes the received transmittal.
+    POST /print {"vdr": name, "hard_link": false, "bundle": false}
+        Prepares documents of VDR phase for printing.
+    POST requests return the queued job.
+    Errors are returned as {"error": message} with status 400 (invalid request), 404 (not found)
+    or 500 (exception while handling the request).
+
+    Attributes
+    ----------
+    current_job : Job
+        Running job (None if there is no one).
+    mgr : TrmManager
+
+    Methods
+    -------
+    get_job(id_: int)
+        Gets the job.
+    submit(name: str, fn, *args)
+        Puts the operation in the queue.
+    """
+    daemon_threads = True
+
+    def __init__(self, mgr: TrmManager, host=HOST, port=PORT):
+        super().__init__((host, port), TrmRequestHandler)
+        self.mgr = mgr
+        self.current_job = None
+        self.__jobs = {}
+        self.__ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        self.__queue = queue.Queue()
+        threading.Thread(target=self.__run_jobs, daemon=True).start()
+
+    def __run_jobs(self):
+        while True:
+            job = self.__queue.get()
+            job.status = 'running'
+            self.current_job = job
+            try:
+                job.fn(*job.args)
+                job.status = 'done'
+            except Exception:
+                traceback.print_exc()
+                job.error = traceback.format_exc()
+                job.status = 'failed'
+            finally:
+                self.current_job = None
+
+    def submit(self, name: str, fn, *args):
+        """
+        Puts the operation in the queue.
+
+        Parameters
+        ----------
+        name : str
+            Name of the operation with its arguments.
+        fn : callable
+        args
+            Arguments of fn.
+
+        Returns
+        -------
+        Job
+        """
+        with self.__lock:
+            job = Job(next(self.__ids), name, fn, args)
+            self.__jobs[job.id] = job
+            finished = [id_ for id_, item in self.__jobs.items() if item.status in ('done', 'failed')]
+            for id_ in finished[:-MAX_FINISHED_JOBS]:
+                del self.__jobs[id_]
+        self.__queue.put(job)
+        return job
+
+    def get_job(self, id_: int):
+        """
+        Gets the job.
+
+        Parameters
+        ----------
+        id_ : int
+
+        Returns
+        -------
+        Job or None
+        """
+        with self.__lock:
+            return self.__jobs.get(id_)
+
+    def get_jobs(self):
+        """
+        Gets all the jobs kept by the server.
+
+        Returns
+        -------
+        list
+        """
+        with self.__lock:
+            return list(self.__jobs.values())
+
+    def find_item(self, name: str, item_type):
+        """
+        Finds transmittal or VDR in the database by name.
+
+        Parameters
+        ----------
+        name : str
+        item_type : type
+            Transmittal or Document.
+
+        Returns
+        -------
+        Transmittal or Document or None
+        """
+        item_names = self.mgr.db.get_item_names()
+        if name not in item_names:
+            return None
+        item = self.mgr.db.get_item(item_names.index(name))
+        return item if isinstance(item, item_type) else None
+
+    # Операции, выполняемые заданиями (как в ManagerGui.process_item_in_thread)
+
+    def send(self, trm: Transmittal, send_date: str):
+        if not trm.documents:
+            print(f'WARNING: there are no documents in {trm.name}', file=sys.stderr)
+            return
+        print('{} processing begins. It will takes some time...'.format(trm.name))
+        self.mgr.parse_trm_docs(trm, send_date)
+        self.mgr.create_crs(trm)
+        self.mgr.create_trm_inventory(trm, send_date)
+
+    def receive(self, trm: Transmittal):
+        failed = self.mgr.process_received_transmittals(trm)
+        if failed:
+            raise RuntimeError('{} was not processed ({})'.format(trm.name, failed[trm.name]))
+        # Журналы нужны только для продолжения прерванной обработки
+        self.mgr.clear_journals()
+
+    def prepare_print(self, vdr: Document, hard_link: bool, bundle: bool):
+        print('Phase {} documents preparation for printing begins. It will take some time...'.format(vdr.phase))
+        self.mgr.prepare_docs_for_printing(vdr, hard_link, bundle)
+        self.mgr.clear_journals()
+
+
+class TrmRequestHandler(BaseHTTPRequestHandler):
+    """
+    The class is purposed to handle requests to TrmServer.
+    """
+    server: TrmServer
+
+    def setup(self):
+        super().setup()
+        # Вывод запроса (например, обновление истории документов) не попадает в журнал выполняемого задания
+        _request_thread.is_set = True
+
+    def log_message(self, format_, *args):
+        # Запросы клиентов не выводятся в журнал заданий
+        pass
+
+    def __send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False, default=_to_json).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __send_error(self, status: int, message: str):
+        self.__send_json({'error': message}, status)
+
+    def __read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def do_GET(self):
+        try:
+            self.__handle_get()
+        except Exception as e:
+            traceback.print_exc()
+            self.__send_error(500, '{}: {}'.format(type(e).__name__, e))
+
+    def __handle_get(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip('/').split('/')
+        server = self.server
+
+        if parts == ['status']:
+            self.__send_json({
+                'items': server.mgr.db.get_item_names(),
+                'jobs': [job.to_dict(with_log=False) for job in server.get_jobs()]
+            })
+        elif len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+            job = server.get_job(int(parts[1]))
+            if job is None:
+                self.__send_error(404, 'job {} was not found'.format(parts[1]))
+            else:
+                self.__send_json(job.to_dict())
+        elif parts == ['search']:
+            try:
+                limit = int(params.get('limit', 50))
+            except ValueError:
+                self.__send_error(400, "'limit' must be an integer")
+                return
+            self.__send_json(server.mgr.search_documents(params.get('q', ''), limit))
+        elif parts == ['history']:
+            if 'number' in params:
+                self.__send_json(server.mgr.get_doc_history(params['number']))
+            elif 'trm' in params:
+                self.__send_json([{'number': number, 'event': event}
+                                  for number, event in server.mgr.get_trm_history(params['trm'])])
+            else:
+                self.__send_error(400, "'number' or 'trm' parameter is required")
+        else:
+            self.__send_error(404, 'unknown request {}'.format(url.path))
+
+    def do_POST(self):
+        try:
+            self.__handle_post()
+        except Exception as e:
+            traceback.print_exc()
+            self.__send_error(500, '{}: {}'.format(type(e).__name__, e))
+
+    def __handle_post(self):
+        url = urlparse(self.path)
+        operation = url.path.strip('/')
+        server = self.server
+        try:
+            body = self.__read_body()
+        except ValueError as e:
+            self.__send_error(400, 'invalid JSON ({})'.format(e))
+            return
+        if not isinstance(body, dict):
+            self.__send_error(400, 'JSON object is expected')
+            return
+
+        if operation == 'update':
+            job = server.submit('update', server.mgr.update_db, bool(body.get('is_received', False)))
+        elif operation in ('send', 'receive'):
+            trm = server.find_item(body.get('trm'), Transmittal)
+            if trm is None:
+                self.__send_error(404, 'transmittal {} was not found'.format(body.get('trm')))
+                return
+            if operation == 'send':
+                send_date = body.get('send_date') or datetime.date.today().strftime('%d.%m.%Y')
+                try:
+                    datetime.datetime.strptime(send_date, '%d.%m.%Y')
+                except (TypeError, ValueError):
+                    self.__send_error(400, "'send_date' must be in format dd.mm.yyyy")
+                    return
+                job = server.submit('send {}'.format(trm.name), server.send, trm, send_date)
+            else:
+                job = server.submit('receive {}'.format(trm.name), server.receive, trm)
+        elif operation == 'print':
+            vdr = server.find_item(body.get('vdr'), Document)
+            if vdr is None:
+                self.__send_error(404, 'VDR {} was not found'.format(body.get('vdr')))
+                return
+            job = server.submit('print {}'.format(vdr.name), server.prepare_print, vdr,
+                                bool(body.get('hard_link', False)), bool(body.get('bundle', False)))
+        else:
+            self.__send_error(404, 'unknown operation {}'.format(operation))
+            return
+        self.__send_json(job.to_dict(with_log=False), 202)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TRM manager server with local JSON API')
+    parser.add_argument('--trm', required=True, help='transmittals directory')
+    parser.add_argument('--vdr', required=True, help='VDR directory')
+    parser.add_argument('--print', dest='print_dir', default='', help='directory for documents to be printed')
+    parser.add_argument('--received', action='store_true', help='transmittals are received')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+
+    mgr = TrmManager(args.trm, args.vdr, args.print_dir)
+    mgr.update_db(args.received)
+    server = TrmServer(mgr, args.host, args.port)
+    sys.stdout = _LogTee(sys.stdout, server)
+    sys.stderr = _LogTee(sys.stderr, server)
+    print('Server is listening on http://{}:{}'.format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+import argparse
+import datetime
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import time
+
+import config
+from trm_manager import TrmManager
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+# Интервал проверки папки трансмиттелов, с
+POLL_INTERVAL = 10
+# Время, в течение которого состав папки трансмиттела не должен меняться перед обработкой, с
+SETTLE_TIME = 30
+
+
+def get_folder_signature(path: str):
+    """
+    Gets signature of the folder contents (relative paths, sizes and modification times of all the files).
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    signature : str
+        Hex digest or None if the folder cannot be read.
+    """
+    hasher = hashlib.sha1()
+    try:
+        for root, dirs, files in os.walk(path, onerror=_raise):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                stat = os.stat(file_path)
+                hasher.update('{}|{}|{}\n'.format(
+                    os.path.relpath(file_path, path), stat.st_size, stat.st_mtime_ns).encode('utf-8'))
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def _raise(error: OSError):
+    raise error
+
+
+def has_inventory(path: str, trm_name: str):
+    """
+    Checks whether the transmittal folder contains its inventory file.
+    """
+    mask = trm_name + '*.xls*'
+    for _, _, files in os.walk(path):
+        if any(fnmatch.fnmatch(name, mask) for name in files):
+            return True
+    return False
+
+
+class TrmWatcher:
+    """
+    The class is purposed to watch the transmittals directory and to process received transmittals automatically
+    as soon as they arrive. A new folder is processed when its contents have not been changed for the settle time
+    and it contains the inventory file. All the transmittals which became ready at the same time are processed
+    as one batch, so that each VDR is written once.
+    Processed folders are recorded in the state file and are not processed again; a folder which failed
+    is tried again only after its contents are changed.
+    The directory is polled; if inotify_simple is installed, the watcher also wakes up on file system events.
+
+    Attributes
+    ----------
+    poll_interval : float
+        Interval between checks of the directory in seconds.
+    settle_time : float
+        Time in seconds the folder contents must be unchanged before processing.
+    state_path : str
+        Path to the state file (JSON).
+    trm_dir : str
+        Transmittals directory.
+
+    Methods
+    -------
+    mark_existing()
+        Records all the transmittals present in the directory as processed.
+    poll()
+        Checks the directory once and processes transmittals which are ready.
+    run()
+        Watches the directory until interrupted.
+    """
+    def __init__(self, mgr: TrmManager, trm_dir: str, state_path: str, poll_interval=POLL_INTERVAL,
+                 settle_time=SETTLE_TIME):
+        self.trm_dir = trm_dir
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.__mgr = mgr
+        self.__cfg = config.get_project_config()
+        # Папки, ожидающие окончания копирования: путь -> (подпись, время её последнего изменения)
+        self.__pending = {}
+        self.__state = {'processed': {}, 'failed': {}}
+        self.__load_state()
+
+    def __load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                self.__state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print('WARNING: watcher state {} cannot be read ({})'.format(self.state_path, e))
+
+    def __save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.__state, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print('ERROR: watcher state cannot be saved ({})'.format(e), file=sys.stderr)
+
+    def __list_folders(self):
+        try:
+            entries = list(os.scandir(self.trm_dir))
+        except OSError as e:
+            print('ERROR: {} cannot be read ({})'.format(self.trm_dir, e), file=sys.stderr)
+            return []
+        matcher = self.__cfg.received_trm_matcher
+        return sorted(entry.path for entry in entries if entry.is_dir() and matcher.match(entry.name))
+
+    def __record(self, kind: str, path: str, signature: str, **extra):
+        self.__state[kind][os.path.basename(path)] = dict(
+            signature=signature, date=datetime.datetime.now().isoformat(timespec='seconds'), **extra)
+
+    def mark_existing(self):
+        """
+        Records all the transmittals present in the directory as processed (e.g. on the first start, when they
+        have been already processed manually).
+
+        Returns
+        -------
+        count : int
+            Number of recorded transmittals.
+        """
+        count = 0
+        for path in self.__list_folders():
+            if os.path.basename(path) not in self.__state['processed']:
+                self.__record('processed', path, get_folder_signature(path))
+                count += 1
+        self.__save_state()
+        return count
+
+    def __get_ready_folders(self):
+        """
+        Updates signatures of new folders and gets the ones which are ready to be processed.
+        """
+        now = time.monotonic()
+        folders = [path for path in self.__list_folders()
+                   if os.path.basename(path) not in self.__state['processed']]
+        for path in set(self.__pending) - set(folders):
+            del self.__pending[path]
+
+        ready = []
+        for path in folders:
+            signature = get_folder_signature(path)
+            if signature is None:
+                continue
+            failure = self.__state['failed'].get(os.path.basename(path))
+            if failure is not None and failure['signature'] == signature:
+                continue
+
+            prev = self.__pending.get(path)
+            if prev is None or prev[0] != signature:
+                if prev is None:
+                    print('{} has arrived, waiting for its contents to settle...'.format(os.path.basename(path)))
+                prev = self.__pending[path] = (signature, now)
+            # При нулевом времени ожидания папка готова сразу
+            if now - prev[1] >= self.settle_time:
+                if has_inventory(path, TrmManager.clear_item_name(os.path.basename(path))):
+                    ready.append(path)
+        return ready
+
+    def poll(self):
+        """
+        Checks the directory once and processes transmittals which are ready.
+
+        Returns
+        -------
+        count : int
+            Number of processed transmittals.
+        """
+        ready = self.__get_ready_folders()
+        if not ready:
+            return 0
+
+        signatures = {path: self.__pending.pop(path)[0] for path in ready}
+        try:
+            trm_list = self.__mgr.add_received_transmittals(ready)
+            failed = self.__mgr.process_received_batch(trm_list)
+        except Exception as e:
+            print('ERROR: {} cannot be processed ({}: {}), it will be tried again after the folder is changed'.format(
+                ', '.join(os.path.basename(path) for path in ready), type(e).__name__, e), file=sys.stderr)
+            for path in ready:
+                self.__record('failed', path, signatures[path], reason='{}: {}'.format(type(e).__name__, e))
+            self.__save_state()
+            return 0
+
+        if not failed:
+            # Журналы нужны только для продолжения прерванной обработки
+            self.__mgr.clear_journals()
+        count = 0
+        for path, trm in zip(ready, trm_list):
+            reason = failed.get(trm.name)
+            if reason is not None:
+                print('ERROR: {} was not processed ({}), it will be tried again after the folder is changed'.format(
+                    os.path.basename(path), reason), file=sys.stderr)
+                self.__record('failed', path, signatures[path], reason=reason)
+                continue
+            self.__state['failed'].pop(os.path.basename(path), None)
+            self.__record('processed', path, signatures[path])
+            count += 1
+        self.__save_state()
+        print('{} received transmittals were processed'.format(count))
+        return count
+
+    def __wait(self, inotify):
+        if inotify is None:
+            time.sleep(self.poll_interval)
+            return
+        # Событие файловой системы лишь прерывает ожидание, состояние папок определяется опросом
+        for path in self.__pending:
+            try:
+                inotify.add_watch(path, flags.CREATE | flags.MOVED_TO | flags.CLOSE_WRITE | flags.DELETE)
+            except OSError:
+                pass
+        inotify.read(timeout=int(self.poll_interval * 1000))
+        if self.__pending:
+            # Ждём окончания копирования, а не каждого записанного файла
+            time.sleep(min(self.poll_interval, self.settle_time))
+
+    def run(self):
+        """
+        Watches the directory until interrupted (Ctrl+C).
+
+        Returns
+        -------
+        None
+        """
+        inotify = None
+        if INotify is not None:
+            try:
+                inotify = INotify()
+                inotify.add_watch(self.trm_dir, flags.CREATE | flags.MOVED_TO | flags.DELETE)
+            except OSError as e:
+                print('WARNING: inotify cannot be used ({}), the directory will be polled'.format(e))
+                inotify = None
+        print('Watching {} for received transmittals...'.format(self.trm_dir))
+        try:
+            while True:
+                self.poll()
+                self.__wait(inotify)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Processes received transmittals as soon as they arrive')
+    parser.add_argument('--trm', required=True, help='transmittals directory')
+    parser.add_argument('--vdr', required=True, help='VDR directory')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='polling interval, s')
+    parser.add_argument('--settle', type=float, default=SETTLE_TIME,
+                        help='time the folder contents must be unchanged before processing, s')
+    parser.add_argument('--process-existing', action='store_true',
+                        help='on the first start process transmittals already present in the directory')
+    parser.add_argument('--once', action='store_true',
+                        help='check the directory, wait for new folders to settle, process them and exit')
+    args = parser.parse_args()
+
+    cfg = config.get_project_config()
+    state_path = os.path.join(cfg.process_dir, 'trm_watcher.json')
+    is_first_start = not os.path.exists(state_path)
+
+    mgr = TrmManager(args.trm, args.vdr, '')
+    mgr.update_db(True)
+    watcher = TrmWatcher(mgr, args.trm, state_path, args.interval, args.settle)
+    if is_first_start and not args.process_existing:
+        print('{} transmittals already present were recorded as processed'.format(watcher.mark_existing()))
+    if args.once:
+        # Новые папки проверяются повторно по истечении времени ожидания
+        if watcher.poll() == 0 and args.settle > 0:
+            time.sleep(args.settle)
+            watcher.poll()
+    else:
+        watcher.run()
+
+
+if __name__ == '__main__':
+    main()
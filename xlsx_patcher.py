@@ -0,0 +1,499 @@
+import datetime
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from xlsx_stream_reader import column_index, column_letters, read_date_styles, read_workbook, to_excel_date
+
+SHEET_DATA_RE = re.compile(r'<sheetData\s*/>|<sheetData\b[^>]*>(.*?)</sheetData>', re.S)
+ROW_RE = re.compile(r'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+CELL_RE = re.compile(r'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+ATTR_RE = re.compile(r'([\w:]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+DIMENSION_RE = re.compile(r'<dimension\b[^>]*?\bref="([^"]*)"[^>]*/>')
+REF_RE = re.compile(r'([A-Z]+)(\d+)')
+CELL_XFS_RE = re.compile(r'<cellXfs\b([^>]*)>(.*?)</cellXfs>', re.S)
+XF_RE = re.compile(r'<xf\b([^>]*?)(?:/>|>(.*?)</xf>)', re.S)
+FORMULA_RE = re.compile(r'<f\b([^>]*?)(?:/>|>(.*?)</f>)', re.S)
+# Ссылка на ячейку в формуле (не имя функции и не часть имени), строковые литералы пропускаются
+FORMULA_REF_RE = re.compile(r'"[^"]*"|(?<![\w.$])(\$?)([A-Z]{1,3})(\$?)(\d+)(?![\w(])')
+CALC_PR_RE = re.compile(r'<calcPr\b([^>]*?)/>')
+CALC_CHAIN_OVERRIDE_RE = re.compile(r'<Override\b[^>]*calcChain[^>]*/>')
+CALC_CHAIN_REL_RE = re.compile(r'<Relationship\b[^>]*calcChain[^>]*/>')
+# Элементы workbook.xml, перед которыми должен стоять calcPr
+AFTER_CALC_PR = ('<oleSize', '<customWorkbookViews', '<pivotCaches', '<smartTagPr', '<smartTagTypes',
+                 '<webPublishing', '<fileRecoveryPr', '<webPublishObjects', '<extLst', '</workbook>')
+# Формат даты по умолчанию (встроенный формат Excel 'mm-dd-yy', отображается в региональном формате)
+DEFAULT_DATE_FORMAT = 14
+
+
+def parse_attrs(attrs: str):
+    """
+    Parses attributes of XML element.
+
+    Parameters
+    ----------
+    attrs : str
+        Attributes part of the element start tag.
+
+    Returns
+    -------
+    dict
+        Attribute names mapped to values (without quotes).
+    """
+    return {name: value[1:-1] for name, value in ATTR_RE.findall(attrs)}
+
+
+def format_attrs(attrs: dict):
+    """
+    Formats attributes of XML element.
+
+    Parameters
+    ----------
+    attrs : dict
+
+    Returns
+    -------
+    str
+    """
+    return ''.join(' {}={}'.format(name, quoteattr(value)) for name, value in attrs.items())
+
+
+def shift_formula(formula: str, rows: int, columns: int):
+    """
+    Shifts relative cell references of the formula, as Excel does when the formula is copied to another cell.
+
+    Parameters
+    ----------
+    formula : str
+        Formula text without leading '='.
+    rows : int
+        Row offset.
+    columns : int
+        Column offset.
+
+    Returns
+    -------
+    str
+    """
+    def shift(match):
+        if match.group(2) is None:
+            return match.group(0)
+        col_abs, letters, row_abs, row = match.groups()
+        if not col_abs:
+            letters = column_letters(column_index(letters) + columns)
+        if not row_abs:
+            row = str(int(row) + rows)
+        return col_abs + letters + row_abs + row
+
+    return FORMULA_REF_RE.sub(shift, formula)
+
+
+class XlsxPatcher:
+    """
+    The class is purposed for writing values of separate cells to xlsx-file.
+    Only cells being edited are rewritten in worksheet XML, other parts of the file are copied unchanged,
+    so formatting, formulas and features unsupported by openpyxl are preserved
+    and saving time depends on the number of edits rather than on the workbook size.
+
+    Strings are written as inline strings, dates are written as numbers with the existing date style of the cell
+    (or with the default date style). If a formula is overwritten, the calculation chain is dropped
+    and the workbook is recalculated on the next open. If the overwritten cell holds the master formula
+    of a shared formula, the master is moved to the first of the remaining cells sharing it.
+
+    Attributes
+    ----------
+    path : str
+        Path to xlsx-file.
+
+    Methods
+    -------
+    edits()
+        Gets pending edits.
+    save(path=None)
+        Writes pending edits to the file.
+    set_value(sheet_name: str, row: int, column: int, value)
+        Adds edit of the cell value.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__edits = {}
+
+    def set_value(self, sheet_name: str, row: int, column: int, value):
+        """
+        Adds edit of the cell value. The last value is written if the cell is edited several times.
+
+        Parameters
+        ----------
+        sheet_name : str
+        row : int
+        column : int
+        value : str, int, float, bool, datetime.date, datetime.datetime or None
+
+        Returns
+        -------
+        None
+        """
+        self.__edits.setdefault(sheet_name, {}).setdefault(row, {})[column] = value
+
+    def edits(self):
+        """
+        Gets pending edits.
+
+        Returns
+        -------
+        list
+            Edits as tuples (sheet name, cell coordinate, value).
+        """
+        return [
+            (sheet_name, column_letters(column) + str(row), value)
+            for sheet_name, rows in self.__edits.items()
+            for row, cells in sorted(rows.items())
+            for column, value in sorted(cells.items())
+        ]
+
+    def save(self, path=None):
+        """
+        Writes pending edits to the file. The file is replaced only after the new one is completely written.
+
+        Parameters
+        ----------
+        path : str, default=None
+            Path to the resulting file, the source file is replaced if None.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        KeyError
+            If the worksheet does not exist.
+        """
+        path = path or self.path
+        if not self.__edits:
+            return
+
+        tmp_path = path + '.tmp'
+        try:
+            with zipfile.ZipFile(self.path) as zin:
+                sheets, date1904 = read_workbook(zin)
+                sheet_paths = {}
+                for sheet_name in self.__edits:
+                    if sheet_name not in sheets:
+                        raise KeyError('Worksheet {} does not exist.'.format(sheet_name))
+                    sheet_paths[sheets[sheet_name]] = sheet_name
+
+                styles = _StylesPatch(zin.read('xl/styles.xml') if 'xl/styles.xml' in zin.namelist() else None)
+                patched = {}
+                has_formulas = False
+                for sheet_path, sheet_name in sheet_paths.items():
+                    xml, overwritten = self.__patch_sheet(zin.read(sheet_path).decode('utf-8'),
+                                                          self.__edits[sheet_name], styles, date1904)
+                    patched[sheet_path] = xml.encode('utf-8')
+                    has_formulas = has_formulas or overwritten
+
+                with zipfile.ZipFile(tmp_path, 'w') as zout:
+                    for info in zin.infolist():
+                        name = info.filename
+                        if name in patched:
+                            data = patched[name]
+                        elif name == 'xl/styles.xml' and styles.changed:
+                            data = styles.xml.encode('utf-8')
+                        elif name == 'xl/calcChain.xml' and has_formulas:
+                            continue
+                        elif name == '[Content_Types].xml' and has_formulas:
+                            data = CALC_CHAIN_OVERRIDE_RE.sub('', zin.read(name).decode('utf-8')).encode('utf-8')
+                        elif name == 'xl/_rels/workbook.xml.rels' and has_formulas:
+                            data = CALC_CHAIN_REL_RE.sub('', zin.read(name).decode('utf-8')).encode('utf-8')
+                        elif name == 'xl/workbook.xml' and has_formulas:
+                            data = self.__set_full_calc_on_load(zin.read(name).decode('utf-8')).encode('utf-8')
+                        else:
+                            data = zin.read(name)
+                        zout.writestr(info, data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.__edits = {}
+
+    @staticmethod
+    def __set_full_calc_on_load(xml: str):
+        """
+        Makes Excel recalculate formulas on the next open, because cached values of formulas depending on
+        the overwritten formulas are not updated.
+        """
+        match = CALC_PR_RE.search(xml)
+        if match:
+            attrs = parse_attrs(match.group(1))
+            attrs['fullCalcOnLoad'] = '1'
+            return xml[:match.start()] + '<calcPr{}/>'.format(format_attrs(attrs)) + xml[match.end():]
+        positions = [xml.find(tag) for tag in AFTER_CALC_PR if tag in xml]
+        pos = min(positions)
+        return xml[:pos] + '<calcPr fullCalcOnLoad="1"/>' + xml[pos:]
+
+    def __patch_sheet(self, xml: str, edits: dict, styles, date1904: bool):
+        """
+        Rewrites rows with edited cells in worksheet XML.
+
+        Returns
+        -------
+        xml : str
+        overwritten : bool
+            Whether a formula was overwritten.
+        """
+        match = SHEET_DATA_RE.search(xml)
+        if match is None:
+            raise ValueError('Worksheet XML has no sheet data.')
+        if match.group(1) is None:
+            content, content_start = '', None
+        else:
+            content, content_start = match.group(1), match.start(1)
+
+        pending = sorted(edits)
+        parts = []
+        pos = 0
+        overwritten = False
+        # Главные ячейки общих формул, которые будут перезаписаны: индекс -> (ссылка, формула, строка, столбец)
+        masters = {}
+        last_row = 0
+        for row_match in ROW_RE.finditer(content):
+            if not pending:
+                break
+            attrs = parse_attrs(row_match.group(1))
+            row = int(attrs['r']) if 'r' in attrs else last_row + 1
+            last_row = row
+            # Новые строки перед текущей
+            while pending and pending[0] < row:
+                new_row = pending.pop(0)
+                parts.append(content[pos:row_match.start()])
+                pos = row_match.start()
+                row_xml, _ = self.__patch_row(new_row, {}, '', edits[new_row], styles, date1904)
+                parts.append(row_xml)
+            if pending and pending[0] == row:
+                pending.pop(0)
+                parts.append(content[pos:row_match.start()])
+                row_xml, row_overwritten = self.__patch_row(row, attrs, row_match.group(2) or '', edits[row],
+                                                            styles, date1904, masters)
+                parts.append(row_xml)
+                pos = row_match.end()
+                overwritten = overwritten or row_overwritten
+        parts.append(content[pos:])
+        for new_row in pending:
+            row_xml, _ = self.__patch_row(new_row, {}, '', edits[new_row], styles, date1904)
+            parts.append(row_xml)
+        new_content = ''.join(parts)
+        if masters:
+            new_content = self.__move_shared_masters(new_content, masters)
+
+        if content_start is None:
+            xml = xml[:match.start()] + '<sheetData>' + new_content + '</sheetData>' + xml[match.end():]
+        else:
+            xml = xml[:content_start] + new_content + xml[match.end(1):]
+        return self.__update_dimension(xml, edits), overwritten
+
+    def __patch_row(self, row: int, attrs: dict, content: str, edits: dict, styles, date1904: bool, masters=None):
+        """
+        Rewrites edited cells of the row and inserts missing ones in the order of columns.
+        Master formulas of shared formulas in the overwritten cells are added to masters.
+
+        Returns
+        -------
+        xml : str
+        overwritten : bool
+            Whether a formula was overwritten.
+        """
+        attrs = dict(attrs)
+        attrs['r'] = str(row)
+        # Диапазон столбцов строки может измениться, атрибут необязательный
+        attrs.pop('spans', None)
+
+        pending = sorted(edits)
+        parts = []
+        pos = 0
+        overwritten = False
+        last_col = 0
+        for cell_match in CELL_RE.finditer(content):
+            if not pending:
+                break
+            cell_attrs = parse_attrs(cell_match.group(1))
+            if 'r' in cell_attrs:
+                col = column_index(REF_RE.match(cell_attrs['r']).group(1))
+            else:
+                col = last_col + 1
+            last_col = col
+            while pending and pending[0] < col:
+                new_col = pending.pop(0)
+                parts.append(content[pos:cell_match.start()])
+                pos = cell_match.start()
+                parts.append(self.__format_cell(row, new_col, None, edits[new_col], styles, date1904))
+            if pending and pending[0] == col:
+                pending.pop(0)
+                parts.append(content[pos:cell_match.start()])
+                parts.append(self.__format_cell(row, col, cell_attrs.get('s'), edits[col], styles, date1904))
+                pos = cell_match.end()
+                formula = FORMULA_RE.search(cell_match.group(2) or '')
+                if formula is not None:
+                    overwritten = True
+                    f_attrs = parse_attrs(formula.group(1))
+                    if f_attrs.get('t') == 'shared' and 'ref' in f_attrs and masters is not None:
+                        masters[f_attrs['si']] = (f_attrs['ref'], formula.group(2) or '', row, col)
+        parts.append(content[pos:])
+        for new_col in pending:
+            parts.append(self.__format_cell(row, new_col, None, edits[new_col], styles, date1904))
+        return '<row{}>{}</row>'.format(format_attrs(attrs), ''.join(parts)), overwritten
+
+    @staticmethod
+    def __move_shared_masters(content: str, masters: dict):
+        """
+        Moves master formulas of the overwritten cells to the first remaining cell sharing each of them,
+        so that other cells do not refer to the missing master.
+
+        Raises
+        ------
+        ValueError
+            If the remaining cells cannot share the formula (the first of them is not the top left one).
+        """
+        # Оставшиеся ячейки общих формул: индекс -> список (строка, столбец, начало и конец элемента f)
+        dependents = {si: [] for si in masters}
+        for cell_match in CELL_RE.finditer(content):
+            cell_content = cell_match.group(2)
+            if not cell_content or '<f' not in cell_content:
+                continue
+            formula = FORMULA_RE.search(cell_content)
+            if formula is None:
+                continue
+            f_attrs = parse_attrs(formula.group(1))
+            if f_attrs.get('t') != 'shared' or f_attrs.get('si') not in dependents:
+                continue
+            ref = REF_RE.match(parse_attrs(cell_match.group(1)).get('r', ''))
+            if ref is None:
+                continue
+            start = cell_match.start(2) + formula.start()
+            dependents[f_attrs['si']].append((int(ref.group(2)), column_index(ref.group(1)),
+                                              start, start + len(formula.group(0)), f_attrs))
+
+        replacements = []
+        for si, (ref, text, row, col) in masters.items():
+            cells = dependents[si]
+            if not cells:
+                continue
+            min_row = min(cell[0] for cell in cells)
+            min_col = min(cell[1] for cell in cells)
+            new_row, new_col, start, end, f_attrs = min(cells)
+            if (new_row, new_col) != (min_row, min_col):
+                raise ValueError('Shared formula {} cannot be kept after {}{} is overwritten.'.format(
+                    ref, column_letters(col), row))
+            max_row = max(cell[0] for cell in cells)
+            max_col = max(cell[1] for cell in cells)
+            f_attrs['ref'] = '{}{}:{}{}'.format(column_letters(new_col), new_row, column_letters(max_col), max_row)
+            text = shift_formula(text, new_row - row, new_col - col)
+            replacements.append((start, end, '<f{}>{}</f>'.format(format_attrs(f_attrs), text)))
+
+        for start, end, xml in sorted(replacements, reverse=True):
+            content = content[:start] + xml + content[end:]
+        return content
+
+    @staticmethod
+    def __format_cell(row: int, column: int, style, value, styles, date1904: bool):
+        """
+        Formats cell XML keeping its style.
+
+        Returns
+        -------
+        str
+        """
+        attrs = {'r': column_letters(column) + str(row)}
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            style = styles.get_date_style(style)
+        if style is not None:
+            attrs['s'] = style
+
+        if value is None:
+            return '<c{}/>'.format(format_attrs(attrs))
+        elif isinstance(value, bool):
+            attrs['t'] = 'b'
+            content = '<v>{}</v>'.format(int(value))
+        elif isinstance(value, (int, float)):
+            content = '<v>{}</v>'.format(repr(value))
+        elif isinstance(value, (datetime.date, datetime.datetime)):
+            content = '<v>{}</v>'.format(repr(to_excel_date(value, date1904)))
+        else:
+            value = str(value)
+            attrs['t'] = 'inlineStr'
+            space = ' xml:space="preserve"' if value != value.strip() else ''
+            content = '<is><t{}>{}</t></is>'.format(space, escape(value))
+        return '<c{}>{}</c>'.format(format_attrs(attrs), content)
+
+    @staticmethod
+    def __update_dimension(xml: str, edits: dict):
+        """
+        Extends the used range of the worksheet to the edited cells.
+        """
+        match = DIMENSION_RE.search(xml)
+        if match is None:
+            return xml
+        refs = match.group(1).split(':')
+        first = REF_RE.match(refs[0])
+        last = REF_RE.match(refs[-1])
+        if first is None or last is None:
+            return xml
+        min_col, min_row = column_index(first.group(1)), int(first.group(2))
+        max_col, max_row = column_index(last.group(1)), int(last.group(2))
+        for row, cells in edits.items():
+            min_row, max_row = min(min_row, row), max(max_row, row)
+            min_col, max_col = min(min_col, min(cells)), max(max_col, max(cells))
+        ref = '{}{}:{}{}'.format(column_letters(min_col), min_row, column_letters(max_col), max_row)
+        start, end = match.span(1)
+        return xml[:start] + ref + xml[end:]
+
+
+class _StylesPatch:
+    """
+    Keeps 'xl/styles.xml' being patched: finds date styles and adds date copies of other styles if needed.
+    """
+    def __init__(self, xml):
+        self.xml = xml.decode('utf-8') if xml is not None else None
+        self.changed = False
+        self.__date_styles = read_date_styles(xml) if xml is not None else set()
+        # Копия стиля с форматом даты для каждого исходного стиля
+        self.__date_copies = {}
+
+    def get_date_style(self, style):
+        """
+        Gets style to be used for a date: the current one if it formats numbers as dates, otherwise its copy
+        with the default date format (font, fill, border and alignment are kept).
+        """
+        if style in self.__date_styles or self.xml is None:
+            return style
+        source = style if style is not None else '0'
+        if source not in self.__date_copies:
+            self.__date_copies[source] = self.__add_date_style(source)
+        return self.__date_copies[source]
+
+    def __add_date_style(self, source: str):
+        match = CELL_XFS_RE.search(self.xml)
+        if match is None:
+            return None
+        attrs = parse_attrs(match.group(1))
+        xfs = list(XF_RE.finditer(match.group(2)))
+        count = len(xfs)
+        if source.isdigit() and int(source) < count:
+            xf_attrs = parse_attrs(xfs[int(source)].group(1))
+            xf_content = xfs[int(source)].group(2)
+        else:
+            xf_attrs = {'numFmtId': '0', 'fontId': '0', 'fillId': '0', 'borderId': '0', 'xfId': '0'}
+            xf_content = None
+        xf_attrs['numFmtId'] = str(DEFAULT_DATE_FORMAT)
+        xf_attrs['applyNumberFormat'] = '1'
+        if xf_content is None:
+            xf = '<xf{}/>'.format(format_attrs(xf_attrs))
+        else:
+            xf = '<xf{}>{}</xf>'.format(format_attrs(xf_attrs), xf_content)
+        attrs['count'] = str(count + 1)
+        self.xml = '{}<cellXfs{}>{}{}</cellXfs>{}'.format(
+            self.xml[:match.start()], format_attrs(attrs), match.group(2), xf, self.xml[match.end():])
+        self.changed = True
+        self.__date_styles.add(str(count))
+        return str(count)
@@ -0,0 +1,548 @@
+import datetime
+import posixpath
+import re
+import sys
+import time
+import zipfile
+from xml.etree import ElementTree
+
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Встроенные форматы чисел Excel, которые являются датами
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | {27, 30, 36, 45, 46, 47, 50, 57}
+DATE_FORMAT_RE = re.compile(r'[dmyhs]', re.IGNORECASE)
+# Части формата, которые не влияют на то, является ли он датой: "текст", [цвет], \\символ
+FORMAT_NOISE_RE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+CELL_REF_RE = re.compile(r'([A-Z]+)(\d+)')
+# Excel хранит управляющие символы строк в виде _xHHHH_
+ESCAPED_CHAR_RE = re.compile(r'_x([0-9A-Fa-f]{4})_')
+
+
+def unescape(text: str):
+    """
+    Replaces characters escaped by Excel in the form '_xHHHH_'.
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    str
+    """
+    if '_x' not in text:
+        return text
+    return ESCAPED_CHAR_RE.sub(lambda m: chr(int(m.group(1), 16)), text)
+
+
+def column_index(letters: str):
+    """
+    Converts column letters to column index (e.g. 'A' -> 1, 'AB' -> 28).
+
+    Parameters
+    ----------
+    letters : str
+
+    Returns
+    -------
+    int
+    """
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def column_letters(index: int):
+    """
+    Converts column index to column letters (e.g. 1 -> 'A', 28 -> 'AB').
+
+    Parameters
+    ----------
+    index : int
+
+    Returns
+    -------
+    str
+    """
+    letters = ''
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def read_workbook(zip_file: zipfile.ZipFile):
+    """
+    Reads paths of worksheets and date system from xlsx-file.
+
+    Parameters
+    ----------
+    zip_file : zipfile.ZipFile
+        Opened xlsx-file.
+
+    Returns
+    -------
+    sheets : dict
+        Worksheet names mapped to paths of their XML in the archive.
+    date1904 : bool
+        Whether the workbook uses 1904 date system.
+    """
+    rels = {}
+    with zip_file.open('xl/_rels/workbook.xml.rels') as f:
+        for rel in ElementTree.parse(f).getroot().iter(NS_PKG_REL + 'Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            rels[rel.get('Id')] = target
+
+    with zip_file.open('xl/workbook.xml') as f:
+        root = ElementTree.parse(f).getroot()
+    date1904 = False
+    workbook_pr = root.find(NS_MAIN + 'workbookPr')
+    if workbook_pr is not None:
+        date1904 = workbook_pr.get('date1904') in ('1', 'true')
+    sheets = {}
+    for sheet in root.iter(NS_MAIN + 'sheet'):
+        sheets[sheet.get('name')] = rels.get(sheet.get(NS_REL + 'id'))
+    return sheets, date1904
+
+
+def read_date_styles(styles_xml: bytes):
+    """
+    Finds cell styles which format numbers as dates.
+
+    Parameters
+    ----------
+    styles_xml : bytes
+        Content of 'xl/styles.xml'.
+
+    Returns
+    -------
+    date_styles : set
+        Indices of cell styles (as strings, the same way as they are referenced by cells).
+    """
+    root = ElementTree.fromstring(styles_xml)
+    date_formats = set(BUILTIN_DATE_FORMATS)
+    num_fmts = root.find(NS_MAIN + 'numFmts')
+    if num_fmts is not None:
+        for num_fmt in num_fmts.iter(NS_MAIN + 'numFmt'):
+            code = FORMAT_NOISE_RE.sub('', num_fmt.get('formatCode', ''))
+            if DATE_FORMAT_RE.search(code):
+                date_formats.add(int(num_fmt.get('numFmtId')))
+    date_styles = set()
+    cell_xfs = root.find(NS_MAIN + 'cellXfs')
+    if cell_xfs is not None:
+        for i, xf in enumerate(cell_xfs.iter(NS_MAIN + 'xf')):
+            if int(xf.get('numFmtId', 0)) in date_formats:
+                date_styles.add(str(i))
+    return date_styles
+
+
+def from_excel_date(value: float, date1904=False):
+    """
+    Converts Excel date serial to datetime.
+
+    Parameters
+    ----------
+    value : float
+    date1904 : bool, default=False
+        Whether the workbook uses 1904 date system.
+
+    Returns
+    -------
+    datetime.datetime
+    """
+    if date1904:
+        epoch = datetime.datetime(1904, 1, 1)
+    elif value < 60:
+        # Excel считает 1900 год високосным, даты до 01.03.1900 смещены на день
+        epoch = datetime.datetime(1899, 12, 31)
+    else:
+        epoch = datetime.datetime(1899, 12, 30)
+    result = epoch + datetime.timedelta(days=value)
+    # Округлим до секунд, как это делает Excel
+    return result.replace(microsecond=0) + datetime.timedelta(seconds=round(result.microsecond / 1e6))
+
+
+def to_excel_date(value, date1904=False):
+    """
+    Converts date or datetime to Excel date serial.
+
+    Parameters
+    ----------
+    value : datetime.date or datetime.datetime
+    date1904 : bool, default=False
+        Whether the workbook uses 1904 date system.
+
+    Returns
+    -------
+    float
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if date1904:
+        epoch = datetime.datetime(1904, 1, 1)
+    elif value < datetime.datetime(1900, 3, 1):
+        epoch = datetime.datetime(1899, 12, 31)
+    else:
+        epoch = datetime.datetime(1899, 12, 30)
+    delta = value - epoch
+    return delta.days + delta.seconds / 86400
+
+
+class CellValue:
+    """
+    The class is purposed to represent a cell read by XlsxStreamReader in the same way as openpyxl cell.
+
+    Attributes
+    ----------
+    coordinate : str
+        Cell coordinate (e.g. 'AB12').
+    value
+        Cell value.
+    """
+    __slots__ = ('coordinate', 'value')
+
+    def __init__(self, coordinate: str, value):
+        self.coordinate = coordinate
+        self.value = value
+
+
+class SheetValues:
+    """
+    The class is purposed to keep values of selected cells of a worksheet.
+    It provides the part of openpyxl worksheet API used to read VDR: cell(row, column), max_row and max_column.
+
+    Attributes
+    ----------
+    max_column : int
+    max_row : int
+
+    Methods
+    -------
+    cell(row: int, column: int)
+        Gets cell with its value (None if the cell was not read or is empty).
+    find_row(column: int, value, min_row=1)
+        Finds the first row containing the value in the column.
+    """
+    def __init__(self):
+        self.max_row = 0
+        self.max_column = 0
+        self.__rows = {}
+        self.__column_index = {}
+
+    def set_row(self, row: int, values: dict):
+        """
+        Puts values of the row.
+
+        Parameters
+        ----------
+        row : int
+        values : dict
+            Column indices mapped to values.
+
+        Returns
+        -------
+        None
+        """
+        if values:
+            self.__rows[row] = values
+            self.max_column = max(self.max_column, max(values))
+        self.max_row = max(self.max_row, row)
+
+    def cell(self, row: int, column: int):
+        """
+        Gets cell with its value (None if the cell was not read or is empty).
+
+        Parameters
+        ----------
+        row : int
+        column : int
+
+        Returns
+        -------
+        CellValue
+        """
+        value = self.__rows.get(row, {}).get(column)
+        return CellValue(column_letters(column) + str(row), value)
+
+    def find_row(self, column: int, value, min_row=1):
+        """
+        Finds the first row containing the value in the column. The column index is built on the first call.
+
+        Parameters
+        ----------
+        column : int
+        value
+        min_row : int, default=1
+
+        Returns
+        -------
+        int or None
+        """
+        key = (column, min_row)
+        if key not in self.__column_index:
+            index = {}
+            for row in sorted(self.__rows):
+                if row < min_row:
+                    continue
+                cell_value = self.__rows[row].get(column)
+                if cell_value is not None and cell_value not in index:
+                    index[cell_value] = row
+            self.__column_index[key] = index
+        return self.__column_index[key].get(value)
+
+
+class XlsxStreamReader:
+    """
+    The class is purposed for fast reading of cell values from xlsx-file.
+    It reads worksheet XML directly from the zip archive with iterparse, so neither cell objects nor styles
+    are created; shared strings and date styles are loaded only when they are needed.
+
+    Methods
+    -------
+    close()
+        Closes the file.
+    iter_rows(sheet_name: str, columns=None, min_row=1, max_row=None)
+        Yields row numbers and values of the worksheet.
+    read_values(sheet_name: str, columns=None, min_row=1, max_row=None, sheet_values=None)
+        Reads values of the worksheet into SheetValues.
+    sheet_names()
+        Gets names of worksheets.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.__zip = zipfile.ZipFile(path)
+        self.__sheets = {}
+        self.__date1904 = False
+        self.__shared_strings = None
+        self.__date_styles = None
+        self.__read_workbook()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __read_workbook(self):
+        self.__sheets, self.__date1904 = read_workbook(self.__zip)
+
+    def __get_shared_strings(self):
+        if self.__shared_strings is None:
+            self.__shared_strings = []
+            try:
+                f = self.__zip.open('xl/sharedStrings.xml')
+            except KeyError:
+                return self.__shared_strings
+            with f:
+                for event, elem in ElementTree.iterparse(f):
+                    if elem.tag == NS_MAIN + 'si':
+                        # Текст может быть разбит на несколько фрагментов <r><t>, фонетика <rPh> не нужна
+                        phonetic = set(t for r_ph in elem.iter(NS_MAIN + 'rPh') for t in r_ph.iter(NS_MAIN + 't'))
+                        text = ''.join(t.text or '' for t in elem.iter(NS_MAIN + 't') if t not in phonetic)
+                        self.__shared_strings.append(unescape(text))
+                        elem.clear()
+        return self.__shared_strings
+
+    def __get_date_styles(self):
+        if self.__date_styles is None:
+            try:
+                f = self.__zip.open('xl/styles.xml')
+            except KeyError:
+                self.__date_styles = set()
+                return self.__date_styles
+            with f:
+                self.__date_styles = read_date_styles(f.read())
+        return self.__date_styles
+
+    def __get_value(self, c):
+        cell_type = c.get('t', 'n')
+        if cell_type == 'inlineStr':
+            return unescape(''.join(t.text or '' for t in c.iter(NS_MAIN + 't')))
+
+        v = c.find(NS_MAIN + 'v')
+        if v is None or v.text is None:
+            return None
+        text = v.text
+
+        if cell_type == 's':
+            return self.__get_shared_strings()[int(text)]
+        elif cell_type in ('str', 'e'):
+            return text
+        elif cell_type == 'b':
+            return text == '1'
+        elif cell_type == 'd':
+            return datetime.datetime.fromisoformat(text)
+
+        if '.' in text or 'E' in text or 'e' in text:
+            value = float(text)
+        else:
+            value = int(text)
+        style = c.get('s')
+        if style is not None and style in self.__get_date_styles():
+            return from_excel_date(value, self.__date1904)
+        return value
+
+    def sheet_names(self):
+        """
+        Gets names of worksheets.
+
+        Returns
+        -------
+        list
+        """
+        return list(self.__sheets)
+
+    def iter_rows(self, sheet_name: str, columns=None, min_row=1, max_row=None):
+        """
+        Yields row numbers and values of the worksheet.
+
+        Parameters
+        ----------
+        sheet_name : str
+        columns : Iterable, default=None
+            Indices of columns to be read (starting from 1). All the columns are read if None.
+        min_row : int, default=1
+        max_row : int, default=None
+            Reading stops after this row.
+
+        Returns
+        -------
+        Iterator
+            Pairs (row number, values). Values is a tuple corresponding to columns if columns are provided,
+            otherwise a dictionary with column indices mapped to non-empty values.
+        """
+        try:
+            sheet_path = self.__sheets[sheet_name]
+        except KeyError:
+            raise KeyError('Worksheet {} does not exist.'.format(sheet_name))
+
+        columns = list(columns) if columns is not None else None
+        column_set = set(columns) if columns is not None else None
+        sheet_data_tag = NS_MAIN + 'sheetData'
+        row_tag = NS_MAIN + 'row'
+        cell_tag = NS_MAIN + 'c'
+
+        with self.__zip.open(sheet_path) as f:
+            context = ElementTree.iterparse(f, events=('start', 'end'))
+            sheet_data = None
+            row_number = 0
+            for event, elem in context:
+                if event == 'start':
+                    if elem.tag == sheet_data_tag:
+                        sheet_data = elem
+                    continue
+                if elem.tag != row_tag:
+                    continue
+
+                r = elem.get('r')
+                row_number = int(r) if r else row_number + 1
+                if max_row is not None and row_number > max_row:
+                    break
+                if row_number < min_row:
+                    sheet_data.clear()
+                    continue
+
+                values = {}
+                col = 0
+                for c in elem.iter(cell_tag):
+                    ref = c.get('r')
+                    if ref:
+                        col = column_index(CELL_REF_RE.match(ref).group(1))
+                    else:
+                        col += 1
+                    if column_set is not None and col not in column_set:
+                        continue
+                    value = self.__get_value(c)
+                    if value is not None:
+                        values[col] = value
+                # Освободим память от уже обработанных строк
+                sheet_data.clear()
+
+                if columns is not None:
+                    yield row_number, tuple(values.get(col) for col in columns)
+                else:
+                    yield row_number, values
+
+    def read_values(self, sheet_name: str, columns=None, min_row=1, max_row=None, sheet_values=None):
+        """
+        Reads values of the worksheet into SheetValues.
+
+        Parameters
+        ----------
+        sheet_name : str
+        columns : Iterable, default=None
+            Indices of columns to be read (starting from 1). All the columns are read if None.
+        min_row : int, default=1
+        max_row : int, default=None
+        sheet_values : SheetValues, default=None
+            Values already read (e.g. header rows) to be supplemented.
+
+        Returns
+        -------
+        SheetValues
+        """
+        if sheet_values is None:
+            sheet_values = SheetValues()
+        columns = list(columns) if columns is not None else None
+        for row_number, values in self.iter_rows(sheet_name, columns, min_row, max_row):
+            if columns is not None:
+                values = {col: value for col, value in zip(columns, values) if value is not None}
+            sheet_values.set_row(row_number, values)
+        return sheet_values
+
+    def close(self):
+        """
+        Closes the file.
+
+        Returns
+        -------
+        None
+        """
+        self.__zip.close()
+
+
+def benchmark(path: str, sheet_name='VDR'):
+    """
+    Compares time of reading the worksheet values with XlsxStreamReader and openpyxl (data_only=True).
+
+    Parameters
+    ----------
+    path : str
+    sheet_name : str, default='VDR'
+
+    Returns
+    -------
+    None
+    """
+    from openpyxl import load_workbook
+
+    start = time.perf_counter()
+    with XlsxStreamReader(path) as reader:
+        rows = sum(1 for _ in reader.iter_rows(sheet_name))
+    stream_time = time.perf_counter() - start
+    print('XlsxStreamReader: {} rows in {:.2f} s'.format(rows, stream_time))
+
+    start = time.perf_counter()
+    wb = load_workbook(path, data_only=True)
+    sheet = wb[sheet_name]
+    rows = sum(1 for _ in sheet.iter_rows(values_only=True))
+    wb.close()
+    openpyxl_time = time.perf_counter() - start
+    print('openpyxl (data_only=True): {} rows in {:.2f} s'.format(rows, openpyxl_time))
+
+    if stream_time:
+        print('Speed-up: {:.1f}x'.format(openpyxl_time / stream_time))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python xlsx_stream_reader.py <path to xlsx> [sheet name]', file=sys.stderr)
+        sys.exit(1)
+    benchmark(*sys.argv[1:3])